@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+'''
+    feedgen.batch
+    ~~~~~~~~~~~~~
+
+    Render many feeds at once using a pool of worker processes. Feeds can be
+    passed as FeedGenerator objects, as functions creating them or as plain
+    data which is turned into feeds by the workers::
+
+        >>> from feedgen.batch import render_many
+        >>> results = render_many([
+        ...     {'feed': fg, 'format': 'rss', 'filename': 'news.rss'},
+        ...     {'feed': {'id': 'http://example.com', 'title': 'Feed',
+        ...               'link': {'href': 'http://example.com'},
+        ...               'description': 'Description',
+        ...               'entries': [{'title': 'Entry',
+        ...                            'description': 'Text'}]},
+        ...      'filename': 'other.rss'}])
+
+    Jobs can also be read from a file containing one JSON object per line::
+
+        python -m feedgen.batch jobs.jsonl --workers 4
+
+    :copyright: 2013-2020, Lars Kiesow <lkiesow@uos.de>
+
+    :license: FreeBSD and LGPL, see license.* for more details.
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from feedgen.feed import FeedGenerator
+from feedgen.util import call_setter, ensure_format
+
+
+'Formats feeds can be rendered in'
+FORMATS = ('atom', 'rss')
+
+'Result of rendering a feed as passed to callbacks of render_many(...)'
+RenderResult = namedtuple('RenderResult', ('name', 'format', 'filename',
+                                           'seconds', 'size', 'error',
+                                           'data'))
+
+# FeedGenerator methods which may be set by feed definitions
+_FEED_FIELDS = frozenset((
+    'author', 'category', 'cloud', 'contributor', 'copyright',
+    'description', 'docs', 'generator', 'icon', 'id', 'image', 'language',
+    'lastBuildDate', 'link', 'logo', 'managingEditor', 'pubDate', 'rating',
+    'rights', 'skipDays', 'skipHours', 'subtitle', 'textInput', 'title',
+    'ttl', 'updated', 'webMaster'))
+
+_JOB_KEYS = set(['name', 'feed', 'format', 'filename', 'options'])
+
+
+def build_feed(definition):
+    '''Create a feed from plain data.
+
+    The definition is a dictionary mapping names of FeedGenerator methods to
+    the values to set. Values are passed to the methods the same way
+    `FeedGenerator.add_entries(...)` does. The key `extensions` lists the
+    names of extensions to load. The names of loaded extensions map to
+    dictionaries of extension methods and values. The key `entries` holds a
+    list of entry dictionaries which are passed to
+    `FeedGenerator.add_entries(...)`, keeping their order.
+
+    :param definition: Dictionary describing the feed.
+    :returns: The FeedGenerator.
+    '''
+    fg = FeedGenerator()
+    extensions = definition.get('extensions', ())
+    for extension in extensions:
+        fg.load_extension(extension)
+    for name, value in definition.items():
+        if name in ('extensions', 'entries'):
+            continue
+        if name in extensions:
+            extension = getattr(fg, name)
+            for method, ext_value in value.items():
+                if method.startswith('_'):
+                    raise ValueError('Invalid method %s' % method)
+                call_setter(getattr(extension, method), ext_value)
+        elif name in _FEED_FIELDS:
+            call_setter(getattr(fg, name), value)
+        else:
+            raise ValueError('Invalid feed field %s' % name)
+    fg.add_entries(definition.get('entries', ()), order='append')
+    return fg
+
+
+def _error(exception):
+    return traceback.format_exception_only(type(exception),
+                                           exception)[-1].strip()
+
+
+def _render(job):
+    '''Render the feed of a job. This is run by the worker processes.
+
+    :param job: The job to render.
+    :returns: Tuple of the time used, the size of the feed in bytes, the
+              feed if it is not written to a file and an error message.
+    '''
+    start = time.perf_counter()
+    try:
+        job = ensure_format(dict(job), _JOB_KEYS, set(['feed']),
+                            {'format': FORMATS})[0]
+        feed = job['feed']
+        if isinstance(feed, dict):
+            feed = build_feed(feed)
+        elif not isinstance(feed, FeedGenerator):
+            feed = feed()
+        fmt = job.get('format') or 'rss'
+        options = job.get('options') or {}
+        filename = job.get('filename')
+        if filename:
+            getattr(feed, fmt + '_file')(filename, **options)
+            size, data = os.path.getsize(filename), None
+        else:
+            data = getattr(feed, fmt + '_str')(**options)
+            size = len(data)
+    except Exception as e:
+        return time.perf_counter() - start, None, None, _error(e)
+    return time.perf_counter() - start, size, data, None
+
+
+def _result(index, job, seconds=None, size=None, data=None, error=None):
+    if isinstance(job, dict):
+        return RenderResult(job.get('name', index), job.get('format') or 'rss',
+                            job.get('filename'), seconds, size, error, data)
+    return RenderResult(index, None, None, seconds, size, error, data)
+
+
+def render_many(jobs, workers=None, callback=None, max_pending=None,
+                executor=None):
+    '''Render many feeds in parallel using a pool of worker processes.
+
+    Each job is a dictionary with the following keys:
+
+    - *feed* (required): The feed to render. This is a FeedGenerator, a
+      function without arguments returning a FeedGenerator or a dictionary
+      describing the feed as accepted by `build_feed(...)`. The feed is
+      pickled to be passed to the workers. Functions therefore need to be
+      defined at the top level of a module.
+    - *format*: Either `atom` or `rss` (default: `rss`).
+    - *filename*: File the feed is written to by the worker. If not set, the
+      feed is passed back as bytes in the `data` field of the result.
+    - *options*: Dictionary of additional keyword arguments passed to
+      `atom_file(...)`, `rss_file(...)`, `atom_str(...)` or `rss_str(...)`,
+      e.g. `{'pretty': True}`.
+    - *name*: Name of the job used in the results (default: the position of
+      the job).
+
+    Jobs are taken from the iterable only as workers become available. Only
+    a limited number of jobs and their results are held in memory at once,
+    which allows rendering large numbers of feeds from a generator.
+
+    A failing job does not stop the batch. Its error is reported in the
+    `error` field of its result instead. If a worker process dies, the jobs
+    of the pool it belonged to fail and a new pool is started.
+
+    Results are RenderResult tuples with the fields `name`, `format`,
+    `filename`, `seconds` (time used by the worker), `size` (size of the
+    feed in bytes), `error` (None on success) and `data`.
+
+    :param jobs: Iterable of jobs.
+    :param workers: Number of worker processes (default: number of CPUs).
+    :param callback: Function called with the result of each job as soon as
+                     the job is finished.
+    :param max_pending: Maximum number of jobs submitted to the workers at
+                        once (default: twice the number of workers).
+    :param executor: Executor to use instead of a new process pool. It is not
+                     shut down afterwards.
+    :returns: List of results in the order in which the jobs finished. If a
+              callback is set, the data of the feeds is only passed to the
+              callback and not kept in the returned results.
+    '''
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(workers)
+    max_pending = max_pending or 2 * (workers or os.cpu_count() or 1)
+    jobs = enumerate(jobs)
+    pending = {}
+    results = []
+
+    def finish(result):
+        if callback:
+            callback(result)
+            result = result._replace(data=None)
+        results.append(result)
+
+    try:
+        while True:
+            for index, job in jobs:
+                try:
+                    future = executor.submit(_render, job)
+                except BrokenProcessPool as e:
+                    if not own_executor:
+                        finish(_result(index, job, error=_error(e)))
+                        continue
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(workers)
+                    future = executor.submit(_render, job)
+                pending[future] = (index, job, executor)
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, job, pool = pending.pop(future)
+                try:
+                    seconds, size, data, error = future.result()
+                except BrokenProcessPool as e:
+                    finish(_result(index, job, error=_error(e)))
+                    if own_executor and pool is executor:
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(workers)
+                except Exception as e:
+                    # The job could not be passed to the worker or its result
+                    # could not be passed back.
+                    finish(_result(index, job, error=_error(e)))
+                else:
+                    finish(_result(index, job, seconds, size, data, error))
+    finally:
+        if own_executor:
+            executor.shutdown()
+    return results
+
+
+def format_result(result):
+    '''Format the result of a job as human readable line.
+
+    :param result: Result as returned by `render_many(...)`.
+    :returns: Formatted result.
+    '''
+    name = result.filename or result.name
+    if result.error:
+        return '%-40s FAILED: %s' % (name, result.error)
+    return '%-40s %-4s %10.4f s %12d bytes' % (name, result.format,
+                                               result.seconds, result.size)
+
+
+def _read_jobs(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+            prog='python -m feedgen.batch',
+            description='Render many feeds in parallel. The jobs are read '
+                        'from a file containing one JSON object per line as '
+                        'accepted by feedgen.batch.render_many.')
+    parser.add_argument('jobs',
+                        help='file containing the jobs, - for stdin')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='number of worker processes '
+                             '(default: number of CPUs)')
+    parser.add_argument('-p', '--max-pending', type=int,
+                        help='maximum number of jobs submitted at once '
+                             '(default: twice the number of workers)')
+    args = parser.parse_args(args)
+
+    start = time.perf_counter()
+    failed = []
+
+    def report(result):
+        if result.error:
+            failed.append(result)
+        print(format_result(result), flush=True)
+
+    if args.jobs == '-':
+        results = render_many(_read_jobs(sys.stdin), args.workers, report,
+                              args.max_pending)
+    else:
+        with open(args.jobs) as f:
+            results = render_many(_read_jobs(f), args.workers, report,
+                                  args.max_pending)
+    print('%d feeds rendered, %d failed in %.2f s' % (
+          len(results) - len(failed), len(failed),
+          time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
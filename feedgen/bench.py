@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+'''
+    feedgen.bench
+    ~~~~~~~~~~~~~
+
+    Benchmarks for the hot paths of the feed generator. They do not need
+    network access. Run them with::
+
+        python -m feedgen.bench
+        python -m feedgen.bench --sizes 10,1000,1000000 --output bench.json
+
+    The results are printed and can be written to a JSON file to track
+    regressions between releases.
+
+    :copyright: 2013-2020, Lars Kiesow <lkiesow@uos.de>
+
+    :license: FreeBSD and LGPL, see license.* for more details.
+'''
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+
+import dateutil.tz
+
+from feedgen.entry import FeedEntry
+from feedgen.feed import FeedGenerator
+from feedgen.util import ensure_format, xml_cache
+from feedgen.version import version_str
+
+
+'Default feed sizes (number of entries) used for the benchmarks'
+SIZES = (10, 100, 1000, 10000)
+
+'Extensions measured by the extension benchmark'
+EXTENSIONS = ('podcast', 'dc', 'media', 'geo', 'torrent')
+
+# Functions setting one field of an extension
+_EXTENSION_DATA = {
+    'podcast': lambda fe: fe.podcast.itunes_duration('12:34'),
+    'dc': lambda fe: fe.dc.dc_creator('John Doe'),
+    'media': lambda fe: fe.media.content(url='http://example.com/media.mp4'),
+    'geo': lambda fe: fe.geo.point('42.36 -71.05'),
+    'torrent': lambda fe: fe.torrent.infohash('0123456789abcdef'),
+}
+
+_UPDATED = datetime(2020, 1, 1, tzinfo=dateutil.tz.tzutc())
+
+
+def create_feed(size, extensions=()):
+    '''Create a feed with some typical data for benchmarking.
+
+    :param size: Number of entries of the feed.
+    :param extensions: Names of extensions to load and set data for.
+    :returns: The FeedGenerator.
+    '''
+    fg = FeedGenerator()
+    fg.id('http://example.com/feed')
+    fg.title('Benchmark Feed')
+    fg.author(name='John Doe', email='jdoe@example.com')
+    fg.link(href='http://example.com', rel='alternate')
+    fg.description('A feed for benchmarking feedgen')
+    fg.updated(_UPDATED)
+    for extension in extensions:
+        fg.load_extension(extension)
+    for i in range(size):
+        fe = fg.add_entry(order='append')
+        fe.id('http://example.com/entry/%d' % i)
+        fe.title('Entry %d' % i)
+        fe.link(href='http://example.com/entry/%d' % i)
+        fe.author(name='John Doe', email='jdoe@example.com')
+        fe.content('<p>Content of entry %d</p>' % i, type='html')
+        fe.updated(_UPDATED)
+        fe.published(_UPDATED)
+        for extension in extensions:
+            _EXTENSION_DATA[extension](fe)
+    return fg
+
+
+def _timed(function, *args):
+    '''Call a function and measure the time it takes.
+
+    :returns: Tuple of the time in seconds and the result of the function.
+    '''
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_build(size):
+    '''Create a feed with entries using the setters.'''
+    seconds, _ = _timed(create_feed, size)
+    return {'seconds': seconds}
+
+
+def _bench_str(size, method):
+    fg = create_feed(size)
+    seconds, result = _timed(getattr(fg, method))
+    return {'seconds': seconds, 'bytes': len(result)}
+
+
+def bench_atom_str(size):
+    '''Generate an ATOM feed as string.'''
+    return _bench_str(size, 'atom_str')
+
+
+def bench_rss_str(size):
+    '''Generate an RSS feed as string.'''
+    return _bench_str(size, 'rss_str')
+
+
+def bench_render(size):
+    '''Generate ATOM and RSS feeds using all extensions in a single pass.'''
+    fg = create_feed(size, EXTENSIONS)
+    seconds, result = _timed(fg.render)
+    return {'seconds': seconds, 'bytes': sum(map(len, result.values()))}
+
+
+def _bench_file(size, method):
+    fg = create_feed(size)
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'feed.xml')
+        seconds, _ = _timed(getattr(fg, method), filename)
+        return {'seconds': seconds, 'bytes': os.path.getsize(filename)}
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_atom_file(size):
+    '''Write an ATOM feed to a file.'''
+    return _bench_file(size, 'atom_file')
+
+
+def bench_rss_file(size):
+    '''Write an RSS feed to a file.'''
+    return _bench_file(size, 'rss_file')
+
+
+def bench_ensure_format(size):
+    '''Validate link data once per entry.'''
+    def validate():
+        for i in range(size):
+            ensure_format(
+                {'href': 'http://example.com/%d' % i, 'type': 'text/html'},
+                set(['href', 'rel', 'type', 'hreflang', 'title', 'length']),
+                set(['href']),
+                {'rel': ['alternate', 'enclosure', 'related', 'self', 'via']},
+                {'rel': 'alternate'})
+    seconds, _ = _timed(validate)
+    return {'seconds': seconds}
+
+
+def bench_setters(size):
+    '''Set link, author and category of entries.'''
+    entries = [FeedEntry() for _ in range(size)]
+
+    def set_fields():
+        for fe in entries:
+            fe.link(href='http://example.com', rel='alternate')
+            fe.author(name='John Doe', email='jdoe@example.com')
+            fe.category(term='benchmark')
+    seconds, _ = _timed(set_fields)
+    return {'seconds': seconds}
+
+
+def _entry_data(i):
+    '''Get the data of an entry of the feeds created by `create_feed` as
+    passed to `FeedGenerator.add_entries`.
+    '''
+    return {'id': 'http://example.com/entry/%d' % i,
+            'title': 'Entry %d' % i,
+            'link': {'href': 'http://example.com/entry/%d' % i},
+            'author': {'name': 'John Doe', 'email': 'jdoe@example.com'},
+            'content': {'content': '<p>Content of entry %d</p>' % i,
+                        'type': 'html'},
+            'updated': _UPDATED,
+            'published': _UPDATED}
+
+
+def bench_add_entries(size):
+    '''Create entries from plain data at once. The time is compared to
+    creating the same entries using the setters.
+    '''
+    data = [_entry_data(i) for i in range(size)]
+    seconds, _ = _timed(FeedGenerator().add_entries, data, None, 'append')
+    setters, _ = _timed(create_feed, size)
+    return {'seconds': seconds, 'setters_seconds': setters}
+
+
+def _xhtml_feed(size):
+    '''Create a feed with large xhtml content and generate it.'''
+    fg = create_feed(0)
+    paragraph = '<p>Paragraph with <b>markup</b> &amp; <a href="%s">a link' \
+        '</a></p>' % 'http://example.com'
+    for i in range(size):
+        fe = fg.add_entry(order='append')
+        fe.id('http://example.com/entry/%d' % i)
+        fe.title('Entry %d' % i)
+        fe.content('<h1>Entry %d</h1>' % i + paragraph * 50, type='xhtml')
+        fe.updated(_UPDATED)
+    return fg.atom_str()
+
+
+def bench_xml_cache(size):
+    '''Create and generate feeds with large xhtml content using the XML
+    cache. The cache is filled by a first run. The time is compared to
+    creating and generating the same feed without the cache.
+    '''
+    maxsize = xml_cache()
+    try:
+        xml_cache(0)
+        uncached, _ = _timed(_xhtml_feed, size)
+        xml_cache(size)
+        _xhtml_feed(size)
+        seconds, _ = _timed(_xhtml_feed, size)
+    finally:
+        xml_cache(maxsize)
+    return {'seconds': seconds, 'uncached_seconds': uncached}
+
+
+def bench_date_parse(size):
+    '''Set dates of entries from strings.'''
+    entries = [FeedEntry() for _ in range(size)]
+
+    def set_dates():
+        for i, fe in enumerate(entries):
+            fe.updated('2020-01-01T12:%02d:%02d+01:00' % (i // 60 % 60,
+                                                          i % 60))
+            fe.published('Wed, 01 Jan 2020 12:00:00 +0100')
+    seconds, _ = _timed(set_dates)
+    return {'seconds': seconds}
+
+
+def bench_extensions(size):
+    '''Create and generate feeds using one extension each. The times are
+    compared to the same feed without extension.
+    '''
+    results = {}
+    for extension in (None,) + EXTENSIONS:
+        extensions = (extension,) if extension else ()
+        start = time.perf_counter()
+        fg = create_feed(size, extensions)
+        fg.atom_str()
+        fg.rss_str()
+        results[extension or 'none'] = time.perf_counter() - start
+    baseline = results['none']
+    return {'seconds': baseline,
+            'extensions': {name: {'seconds': seconds,
+                                  'overhead': seconds - baseline}
+                           for name, seconds in results.items()
+                           if name != 'none'}}
+
+
+def entry_memory(count=10000, extensions=()):
+    '''Measure the memory used by the entries of a feed.
+
+    :param count: Number of entries to create.
+    :param extensions: Names of extensions to load.
+    :returns: Average number of bytes allocated per entry.
+    '''
+    fg = FeedGenerator()
+    for extension in extensions:
+        fg.load_extension(extension)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            fe = fg.add_entry(order='append')
+            fe.id('http://example.com/entry/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.link(href='http://example.com/entry/%d' % i)
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return used // count
+
+
+def bench_memory(size):
+    '''Memory used per entry with and without extensions.'''
+    return {'bytes_per_entry': entry_memory(size),
+            'bytes_per_entry_extensions': entry_memory(size, EXTENSIONS)}
+
+
+'Available benchmarks by name'
+BENCHMARKS = OrderedDict([
+    ('build', bench_build),
+    ('atom_str', bench_atom_str),
+    ('rss_str', bench_rss_str),
+    ('render', bench_render),
+    ('atom_file', bench_atom_file),
+    ('rss_file', bench_rss_file),
+    ('ensure_format', bench_ensure_format),
+    ('setters', bench_setters),
+    ('date_parse', bench_date_parse),
+    ('add_entries', bench_add_entries),
+    ('xml_cache', bench_xml_cache),
+    ('extensions', bench_extensions),
+    ('memory', bench_memory),
+])
+
+
+def run(benchmarks=None, sizes=SIZES, repeat=3, report=None):
+    '''Run benchmarks. Each benchmark is repeated and the fastest run is
+    reported.
+
+    :param benchmarks: Names of the benchmarks to run (default: all).
+    :param sizes: Feed sizes to run the benchmarks with.
+    :param repeat: Number of times each benchmark is run.
+    :param report: Function called with each result when it is available.
+    :returns: Dictionary with information about the environment and a list
+              of results.
+    '''
+    results = []
+    for name in benchmarks or BENCHMARKS:
+        benchmark = BENCHMARKS[name]
+        for size in sizes:
+            best = None
+            for _ in range(repeat):
+                gc.collect()
+                result = benchmark(size)
+                if best is None or result.get('seconds', 0) < \
+                        best.get('seconds', 0):
+                    best = result
+            best = OrderedDict([('benchmark', name), ('size', size)],
+                               **best)
+            if 'seconds' in best:
+                best['per_entry'] = best['seconds'] / size
+            results.append(best)
+            if report:
+                report(best)
+    return OrderedDict([
+        ('feedgen', version_str),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('platform', platform.platform()),
+        ('date', datetime.now(dateutil.tz.tzutc()).isoformat()),
+        ('repeat', repeat),
+        ('results', results)])
+
+
+def format_result(result):
+    '''Format a benchmark result as human readable line.
+
+    :param result: Benchmark result as returned by `run(...)`.
+    :returns: Formatted result.
+    '''
+    line = '%-14s %8d entries' % (result['benchmark'], result['size'])
+    if 'seconds' in result:
+        line += ' %10.4f s %10.2f µs/entry' % (result['seconds'],
+                                               result['per_entry'] * 1e6)
+    if 'bytes' in result:
+        line += ' %12d bytes' % result['bytes']
+    if 'setters_seconds' in result:
+        line += ' (%.4f s using the setters)' % result['setters_seconds']
+    if 'uncached_seconds' in result:
+        line += ' (%.4f s without cache)' % result['uncached_seconds']
+    for name, data in sorted(result.get('extensions', {}).items()):
+        line += '\n    %-10s %10.4f s %+10.4f s' % (name, data['seconds'],
+                                                    data['overhead'])
+    if 'bytes_per_entry' in result:
+        line += ' %6d bytes/entry (%d with extensions)' % (
+                result['bytes_per_entry'],
+                result['bytes_per_entry_extensions'])
+    return line
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+            prog='python -m feedgen.bench',
+            description='Run feedgen benchmarks.')
+    parser.add_argument('-s', '--sizes', default=','.join(map(str, SIZES)),
+                        help='comma separated list of feed sizes '
+                             '(default: %(default)s)')
+    parser.add_argument('-b', '--benchmark', action='append',
+                        choices=list(BENCHMARKS),
+                        help='benchmark to run, can be used multiple times '
+                             '(default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='runs per benchmark, the fastest run is '
+                             'reported (default: %(default)s)')
+    parser.add_argument('-o', '--output',
+                        help='write the results as JSON to this file')
+    args = parser.parse_args(args)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = run(args.benchmark, sizes, args.repeat,
+                  lambda result: print(format_result(result), flush=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    main()
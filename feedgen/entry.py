@@ -8,20 +8,237 @@
     :license: FreeBSD and LGPL, see license.* for more details.
 '''
 
+import os
+from copy import deepcopy
 from datetime import datetime
 
-import dateutil.parser
 import dateutil.tz
 import warnings
 
 from lxml.etree import CDATA  # nosec - adding CDATA entry is safe
 
 from feedgen.compat import string_types
-from feedgen.util import ensure_format, formatRFC2822, xml_fromstring, xml_elem
+from feedgen.ext.base import BaseExtension, track
+from feedgen.util import (call_setter, ensure_format, fingerprint,
+                          formatRFC2822, parse_date, xml_cache, xml_elem,
+                          xml_fragment, xml_fromstring, xml_text)
+
+
+_inert_extensions = {}
+
+# Placeholder for raw content which is replaced after serialization. It
+# contains a random nonce so that it cannot occur in any other text.
+_RAW_MARKER = 'feedgen-raw-%s'
+
+# Elements wrapping raw entry fragments for parsing and the expected tag
+_RAW_ROOTS = {
+    'atom': ('<feed xmlns="http://www.w3.org/2005/Atom">', '</feed>',
+             '{http://www.w3.org/2005/Atom}entry'),
+    'rss': ('<channel>', '</channel>', 'item')}
+
+# Slots of a FeedEntry which are not part of its data
+_UNTRACKED = frozenset(('__updated_text', '__published_text', '__pubDate_text',
+                        '__extensions', '__fragments', '__trackers',
+                        '__digest', '__dict__', '__weakref__'))
+
+# Slots which are not restored by FeedEntry.__setstate__
+_NO_STATE = frozenset(('__dict__', '__weakref__'))
+
+# Formats of the fields which take dictionaries: Allowed and required keys,
+# allowed values and defaults as passed to ensure_format.
+_FORMATS = {
+    'author': (set(['name', 'email', 'uri']), set()),
+    'category': (set(['term', 'scheme', 'label']), set(['term'])),
+    'contributor': (set(['name', 'email', 'uri']), set(['name'])),
+    'link': (set(['href', 'rel', 'type', 'hreflang', 'title', 'length']),
+             set(['href']),
+             {'rel': ['alternate', 'enclosure', 'related', 'self', 'via']},
+             {'rel': 'alternate'}),
+}
+
+# Slots of the fields which FeedEntry._loader stores directly
+_LOADED_SLOTS = {
+    'title': '__title', 'rights': '__atom_rights',
+    'comments': '__rss_comments', 'id': '__id', 'guid': '__id',
+    'content': '__atom_content', 'updated': '__updated',
+    'published': '__published', 'pubDate': '__published',
+    'author': '__author', 'category': '__category',
+    'contributor': '__atom_contributor', 'link': '__link'}
+_DATE_SLOTS = frozenset(('_FeedEntry__updated', '_FeedEntry__published'))
+_CONTENT_KEYS = frozenset(('content', 'type'))
+
+# Registry of an entry without extensions. Registries may be shared between
+# entries and are therefore never modified in place.
+_NO_EXTENSIONS = {}
+
+
+def _is_inert(extension_class_entry):
+    '''Check if a new instance of an entry extension adds nothing to an entry.
+    Such extensions need not be instantiated or applied until data is set.
+
+    :param extension_class_entry: Class of the entry extension.
+    :returns: If a new instance of the extension adds nothing to an entry.
+    '''
+    inert = _inert_extensions.get(extension_class_entry)
+    if inert is None:
+        inert = True
+        try:
+            ext = extension_class_entry()
+            for name, method in (('entry', ext.extend_atom),
+                                 ('item', ext.extend_rss)):
+                elem = xml_elem(name)
+                method(elem)
+                if len(elem) or elem.attrib or elem.text:
+                    inert = False
+        except Exception:
+            inert = False
+        _inert_extensions[extension_class_entry] = inert
+    return inert
+
+
+def _is_empty(inst, extension_class_entry):
+    '''Check if an entry extension adds nothing to an entry since it was not
+    instantiated yet or no attribute was set since it was instantiated.
+
+    :param inst: Instance of the extension or None.
+    :param extension_class_entry: Class of the entry extension.
+    :returns: If the extension can be skipped.
+    '''
+    if inst is None:
+        return True
+    # Instances are created with a revision of 0. Extensions which do not
+    # support change tracking are always applied.
+    return isinstance(inst, BaseExtension) and not inst._revision and \
+        _is_inert(extension_class_entry)
+
+
+def _checked_date(value):
+    '''Parse a date if necessary and check that it has timezone information.
+
+    :param value: Date string or datetime.datetime object.
+    :returns: The datetime.datetime object.
+    '''
+    if isinstance(value, string_types):
+        value = parse_date(value)
+    if not isinstance(value, datetime):
+        raise ValueError('Invalid datetime format')
+    if value.tzinfo is None:
+        raise ValueError('Datetime object has no timezone info')
+    return value
+
+
+def _format_checker(name):
+    '''Create a function checking the dictionaries of a field like
+    ensure_format does. Every set of keys is checked only once.
+
+    :param name: Name of the field, e.g. `link`.
+    :returns: Function taking a dictionary or list of dictionaries and
+              returning a list of checked dictionaries.
+    '''
+    allowed, required, allowed_values, defaults = \
+        (_FORMATS[name] + (None, None))[:4]
+    checked = set()
+
+    def check(val):
+        if not isinstance(val, list):
+            val = [val]
+        for elem in val:
+            if not isinstance(elem, dict):
+                raise ValueError('Invalid data (value is no dictionary)')
+            if defaults:
+                for k, v in defaults.items():
+                    elem.setdefault(k, v)
+            keys = frozenset(elem)
+            if keys not in checked:
+                ensure_format(elem, allowed, required)
+                checked.add(keys)
+            if allowed_values:
+                for k, v in allowed_values.items():
+                    if elem.get(k) and not elem[k] in v:
+                        raise ValueError('Invalid value for %s' % k)
+        return val
+    return check
+
+
+def _xml_text(data, name):
+    '''Get the XML to parse for the content of a text element.
+
+    :param data: Dictionary containing the text and its type.
+    :param name: Name of the text element, e.g. `content` or `summary`.
+    :returns: The XML string or None if the text is not embedded as XML.
+    '''
+    type_ = data.get('type')
+    if type_ == 'xhtml':
+        # Surround xhtml with a div tag
+        return '<div xmlns="http://www.w3.org/1999/xhtml">' + data[name] + \
+            '</div>'
+    if type_ and (type_.endswith('/xml') or type_.endswith('+xml')):
+        return data[name]
+    return None
+
+
+def _cache_text(data, name):
+    '''Validate and cache the XML content of a text element when it is set if
+    the XML cache is enabled. This raises an error for invalid content.
+    '''
+    if data.get(name) and xml_cache():
+        xml = _xml_text(data, name)
+        if xml is not None:
+            xml_text(xml)
+
 
+def _raw_text(data, name, validate):
+    '''Prepare pre-serialized XML content of a text element.
 
-def _add_text_elm(entry, data, name):
-    """Add a text subelement to an entry"""
+    :param data: Dictionary containing the text and its type.
+    :param name: Name of the text element, e.g. `content` or `summary`.
+    :param validate: If the content should be checked to be well-formed.
+    '''
+    if isinstance(data[name], bytes):
+        data[name] = data[name].decode('utf-8')
+    xml = _xml_text(data, name)
+    if xml is None:
+        raise ValueError('Raw %s must be xhtml or XML' % name)
+    if validate:
+        xml_fromstring(xml)
+    data['raw'] = True
+
+
+def _spliced_text(data, name):
+    '''Check if a text element is inserted into serialized entries as text
+    since it is pre-serialized or cached by the XML cache.
+
+    :param data: Dictionary containing the text and its type or None.
+    :param name: Name of the text element, e.g. `content` or `summary`.
+    :returns: If the text is inserted after serialization.
+    '''
+    if not data or not data.get(name) or data.get('src'):
+        return False
+    return bool(data.get('raw')) or \
+        (bool(xml_cache()) and _xml_text(data, name) is not None)
+
+
+def _parse_raw_entry(fmt, fragment):
+    '''Parse a pre-serialized entry.
+
+    :param fmt: Format of the entry, either `atom` or `rss`.
+    :param fragment: The serialized entry.
+    :returns: The entry element.
+    '''
+    start, end, tag = _RAW_ROOTS[fmt]
+    root = xml_fromstring(start + fragment + end)
+    if len(root) != 1 or root[0].tag != tag or (root.text or '').strip() \
+            or (root[0].tail or '').strip():
+        raise ValueError('Fragment is not a single %s element' %
+                         tag.split('}')[-1])
+    return root[0]
+
+
+def _add_text_elm(entry, data, name, markers=None):
+    """Add a text subelement to an entry. If `markers` is set, raw content and
+    content from the XML cache is replaced by a placeholder to insert the
+    content after serialization. The placeholder is added to `markers`,
+    mapping it to the content."""
     if not data:
         return
 
@@ -33,16 +250,24 @@ def _add_text_elm(entry, data, name):
                              "contain a 'src' attribute")
         elm.attrib['src'] = data['src']
     elif data.get(name):
-        # Surround xhtml with a div tag, parse it and embed it
-        if type_ == 'xhtml':
-            xhtml = '<div xmlns="http://www.w3.org/1999/xhtml">' \
-                    + data.get(name) + '</div>'
-            elm.append(xml_fromstring(xhtml))
+        xml = _xml_text(data, name)
+        if xml is not None and markers is not None and data.get('raw'):
+            # Insert a placeholder which is replaced after serialization
+            marker = elm
+            if type_ == 'xhtml':
+                marker = xml_elem('{http://www.w3.org/1999/xhtml}div', elm,
+                                  nsmap={None: 'http://www.w3.org/1999/xhtml'})
+            marker.text = _RAW_MARKER % os.urandom(16).hex()
+            markers[marker.text] = data[name]
+        # Insert validated and serialized xhtml and XML from the cache
+        elif xml is not None and markers is not None and xml_cache():
+            elm.text = _RAW_MARKER % os.urandom(16).hex()
+            markers[elm.text] = xml_text(xml)
+        # Parse xhtml and XML and embed it
+        elif xml is not None:
+            elm.append(xml_fragment(xml))
         elif type_ == 'CDATA':
             elm.text = CDATA(data.get(name))
-        # Parse XML and embed it
-        elif type_ and (type_.endswith('/xml') or type_.endswith('+xml')):
-            elm.append(xml_fromstring(data[name]))
         # Embed the text in escaped form
         elif not type_ or type_.startswith('text') or type_ == 'html':
             elm.text = data.get(name)
@@ -60,67 +285,375 @@ def _add_text_elm(entry, data, name):
 class FeedEntry(object):
     '''FeedEntry call representing an ATOM feeds entry node or an RSS feeds
     item node.
+
+    The fields of an entry are stored in slots to keep the memory footprint
+    of large feeds small. Fields used by both ATOM and RSS are stored once and
+    converted to the format specific representation when the entry is
+    generated. Entry extensions are instantiated on first access.
     '''
 
+    __slots__ = ('__id', '__guid_permalink', '__title', '__updated',
+                 '__author', '__link', '__category', '__published',
+                 '__source', '__updated_text', '__published_text',
+                 '__pubDate_text', '__atom_content', '__atom_summary',
+                 '__atom_contributor', '__atom_rights', '__rss_comments',
+                 '__rss_description', '__rss_content', '__rss_ttl',
+                 '__extensions', '__fragments', '__raw', '__trackers',
+                 '__digest',
+                 '__dict__', '__weakref__')
+
     def __init__(self):
-        # ATOM
+        # Shared
         # required
-        self.__atom_id = None
-        self.__atom_title = None
-        self.__atom_updated = datetime.now(dateutil.tz.tzutc())
+        self.__id = None
+        self.__guid_permalink = False
+        self.__title = None
+        # The time of generation is used if not set
+        self.__updated = None
 
         # recommended
-        self.__atom_author = None
-        self.__atom_content = None
-        self.__atom_link = None
-        self.__atom_summary = None
+        self.__author = None
+        self.__link = None
 
         # optional
-        self.__atom_category = None
+        self.__category = None
+        self.__published = None
+        self.__source = None
+
+        # Formatted dates, set once the entry is generated
+        self.__updated_text = None
+        self.__published_text = None
+        self.__pubDate_text = None
+
+        # ATOM
+        # The content is shared with RSS unless it was set by description(...)
+        # or links to an external source.
+        self.__atom_content = None
+        self.__atom_summary = None
         self.__atom_contributor = None
-        self.__atom_published = None
-        self.__atom_source = None
         self.__atom_rights = None
 
         # RSS
-        self.__rss_author = None
-        self.__rss_category = None
         self.__rss_comments = None
         self.__rss_description = None
         self.__rss_content = None
-        self.__rss_enclosure = None
-        self.__rss_guid = {}
-        self.__rss_link = None
-        self.__rss_pubDate = None
-        self.__rss_source = None
-        self.__rss_title = None
+        self.__rss_ttl = None
+
+        # Extension registry. Instances of used extensions are bound to the
+        # entry like attributes.
+        self.__extensions = _NO_EXTENSIONS
+
+        # Cache for serialized fragments (disabled by default)
+        self.__fragments = None
+
+        # Pre-serialized entries by format
+        self.__raw = None
+
+        # Change trackers of the feeds containing this entry
+        self.__trackers = None
+
+        # Digest of the data and the revisions of the extensions it is based
+        # on. See _digest().
+        self.__digest = None
+
+    def __getstate__(self):
+        # The trackers refer to the feeds containing this entry and thereby
+        # to all of their entries. Drop them together with caches and
+        # formatted dates, so that pickling an entry, e.g. to serialize it in
+        # another process, does not copy whole feeds.
+        state = {name: getattr(self, '_FeedEntry' + name)
+                 for name in self.__slots__ if name not in _UNTRACKED}
+        state['__extensions'] = self.__extensions
+        state['__fragments'] = None if self.__fragments is None else {}
+        return state, self.__dict__
+
+    def __setstate__(self, state):
+        state, instances = state
+        for name in _UNTRACKED - _NO_STATE:
+            setattr(self, '_FeedEntry' + name, None)
+        for name, value in state.items():
+            setattr(self, '_FeedEntry' + name, value)
+        self.__dict__.update(instances)
+        for name in self.__extensions:
+            inst = self.__extension(name)
+            if isinstance(inst, BaseExtension):
+                track(inst, self._changed)
+
+    def __getattr__(self, name):
+        # Only called if the attribute was not found. Extensions which were
+        # registered lazily are instantiated on first access.
+        if name.startswith('_'):
+            raise AttributeError(name)
+        ext = self.__extensions.get(name)
+        if ext is None:
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (type(self).__name__, name))
+        # Bind the instance to the entry so that further lookups do not end
+        # up here
+        self.__modified()
+        inst = ext['extension_class_entry']()
+        if isinstance(inst, BaseExtension):
+            track(inst, self._changed)
+        self.__dict__[name] = inst
+        return inst
+
+    def __extension(self, name):
+        '''Get the instance of an extension if it was created already.
+
+        :param name: Namespace of the extension.
+        :returns: Instance of the extension or None.
+        '''
+        return self.__dict__.get(name)
+
+    def __modified(self):
+        '''Invalidate the cached fragments and digest. Called by all setters.
+        '''
+        if self.__fragments:
+            self.__fragments = {}
+        self.__digest = None
+        # Feeds only need to be notified while they are generated
+        # incrementally, which enables the fragment cache of their entries
+        if self.__trackers and self.__fragments is not None:
+            for tracker in self.__trackers:
+                tracker.changed()
+
+    def _changed(self):
+        '''Notify the feeds containing this entry about a modification of
+        one of its extensions. See __modified.
+        '''
+        if self.__trackers and self.__fragments is not None:
+            for tracker in self.__trackers:
+                tracker.changed()
+
+    def _track(self, tracker, track=True):
+        '''Add or remove the change tracker of a feed. The tracker is
+        notified about all modifications of this entry while it is part of
+        the feed.
+
+        :param tracker: The change tracker of the feed.
+        :param track: If the tracker should be added or removed.
+        '''
+        known = tracker in (self.__trackers or ())
+        if known == track:
+            return
+        trackers = tuple(t for t in self.__trackers or () if t is not tracker)
+        if track:
+            trackers += (tracker,)
+        self.__trackers = trackers or None
+        if track:
+            tracker.updated(None, self.__updated)
+            tracker.identified(self, None, self.__id)
+        else:
+            tracker.updated(self.__updated, None)
+            tracker.identified(self, self.__id, None)
+
+    def __extension_revisions(self):
+        '''Get the revisions of all extensions of this entry.
+
+        :returns: Tuple of revisions or None if an extension does not support
+                  change tracking.
+        '''
+        revisions = []
+        for name in self.__extensions:
+            inst = self.__extension(name)
+            if inst is None:
+                revisions.append(-1)
+            elif isinstance(inst, BaseExtension):
+                revisions.append(inst._revision)
+            else:
+                return None
+        return tuple(revisions)
 
-        # Extension list:
-        self.__extensions = {}
-        self.__extensions_register = {}
+    def _digest(self):
+        '''Get a digest of the data of this entry and its extensions. Equal
+        entries have the same digest in every process. It is cached until the
+        entry or one of its extensions is modified.
+
+        :returns: The digest as bytes.
+        '''
+        revisions = self.__extension_revisions()
+        if self.__digest is not None and revisions is not None and \
+                self.__digest[0] == revisions:
+            return self.__digest[1]
+        state = [(name, getattr(self, '_FeedEntry' + name))
+                 for name in self.__slots__ if name not in _UNTRACKED]
+        state = [item for item in state if item[1] is not None]
+        for name, ext in self.__extensions.items():
+            inst = self.__extension(name)
+            if _is_empty(inst, ext['extension_class_entry']):
+                inst = None
+            state.append((name, ext['atom'], ext['rss'], inst))
+        digest = fingerprint(state)
+        self.__digest = (revisions, digest)
+        return digest
+
+    def _cached_fragment(self, key):
+        '''Get a cached serialized fragment of this entry.
+
+        :param key: Identifies format and context of the fragment.
+        :returns: The fragment or None if it is not cached or outdated.
+        '''
+        if not self.__fragments:
+            return None
+        revisions, fragment = self.__fragments.get(key, (None, None))
+        if revisions is None or revisions != self.__extension_revisions():
+            return None
+        return fragment
+
+    def _cache_fragment(self, key, fragment):
+        '''Store a serialized fragment of this entry if caching is enabled.
+
+        :param key: Identifies format and context of the fragment.
+        :param fragment: The serialized fragment.
+        '''
+        if self.__fragments is not None:
+            revisions = self.__extension_revisions()
+            if revisions is not None:
+                self.__fragments[key] = (revisions, fragment)
+
+    def fragment_cache(self, enabled=None):
+        '''Get or set if the serialized XML of this entry is cached. If
+        enabled, the FeedGenerator will serialize the entry once and reuse the
+        result until the entry or one of its extensions is modified using
+        their setters. This speeds up the repeated generation of feeds in
+        which most entries do not change.
+
+        Note that data modified in place, e.g. by changing a dictionary
+        returned by one of the getters, will not invalidate the cache.
+
+        :param enabled: If fragments of this entry should be cached.
+        :returns: If fragments of this entry are cached.
+        '''
+        if enabled is not None:
+            self.__fragments = {} if enabled else None
+        return self.__fragments is not None
+
+    def _use_fragments(self):
+        '''Check if the entry needs to be serialized on its own since it
+        caches fragments or contains pre-serialized or cached XML.
+
+        :returns: If the entry needs to be serialized on its own.
+        '''
+        return self.__fragments is not None or bool(self.__raw) or \
+            _spliced_text(self.__atom_content, 'content') or \
+            _spliced_text(self.__atom_summary, 'summary')
+
+    def _raw_entry(self, fmt):
+        '''Get the pre-serialized entry of a format.
+
+        :param fmt: Format of the entry, either `atom` or `rss`.
+        :returns: The serialized entry or None.
+        '''
+        return self.__raw.get(fmt) if self.__raw else None
+
+    def _spliced_entry(self, fmt, default=None):
+        '''Create the element of the entry in a format with placeholders for
+        raw content. Serialize it and pass the result and the placeholders to
+        :meth:`_splice`. Placeholders are random for each call.
+
+        :param fmt: Format of the entry, either `atom` or `rss`.
+        :param default: Default modification date. See :meth:`_updated`.
+        :returns: Tuple of the entry element and a dictionary mapping the
+                  placeholders to the raw content.
+        '''
+        markers = {}
+        if fmt == 'atom':
+            return self.__atom_entry(markers=markers,
+                                     default=default), markers
+        return self.rss_entry(), markers
+
+    @staticmethod
+    def _splice(text, markers):
+        '''Replace the placeholders for raw content in a serialized entry.
+
+        :param text: Serialized entry created by :meth:`_spliced_entry`.
+        :param markers: Placeholders returned by :meth:`_spliced_entry`.
+        :returns: The serialized entry including the raw content.
+        '''
+        for marker, content in markers.items():
+            text = text.replace(marker, content, 1)
+        return text
+
+    def raw(self, atom=None, rss=None, validate=True):
+        '''Get or set pre-serialized XML of the whole entry, e.g. entries
+        rendered and sanitized by a content management system. If set for a
+        format, the fragment is inserted into feeds of that format as it is
+        instead of generating the entry from its fields. No XML tree is built
+        for it.
+
+        The fragment must be a single `entry` element for ATOM or `item`
+        element for RSS. The default namespace is inherited from the feed
+        while all other namespace prefixes used must be declared in the
+        fragment itself.
+
+        :param atom: The ATOM entry as text or UTF-8 encoded bytes. An empty
+                     string removes the fragment.
+        :param rss: The RSS item as text or UTF-8 encoded bytes. An empty
+                    string removes the fragment.
+        :param validate: If the fragments should be parsed once to make sure
+                         that they are well-formed entries. Disable this only
+                         for fragments from trusted sources.
+        :returns: Dictionary mapping the formats to the fragments.
+        '''
+        for fmt, fragment in (('atom', atom), ('rss', rss)):
+            if fragment is None:
+                continue
+            if isinstance(fragment, bytes):
+                fragment = fragment.decode('utf-8')
+            fragment = fragment.strip()
+            if fragment and validate:
+                _parse_raw_entry(fmt, fragment)
+            self.__modified()
+            raw = dict(self.__raw or {})
+            if fragment:
+                raw[fmt] = fragment
+            else:
+                raw.pop(fmt, None)
+            self.__raw = raw or None
+        return dict(self.__raw or {})
 
     def atom_entry(self, extensions=True):
         '''Create an ATOM entry and return it.'''
+        return self._atom_entry(extensions)
+
+    def _atom_entry(self, extensions=True, default=None):
+        '''Create an ATOM entry using a default modification date if none is
+        set. See :meth:`_updated`.
+        '''
+        if self.__raw and 'atom' in self.__raw:
+            return _parse_raw_entry('atom', self.__raw['atom'])
+        return self.__atom_entry(extensions, default=default)
+
+    def __atom_entry(self, extensions=True, markers=None, default=None):
+        '''Create an ATOM entry. If `markers` is set, raw content is replaced
+        by placeholders which are added to it. See :meth:`_splice`.
+        '''
         entry = xml_elem('entry')
-        if not (self.__atom_id and self.__atom_title and self.__atom_updated):
+        if not (self.__id and self.__title):
             raise ValueError('Required fields not set')
         id = xml_elem('id', entry)
-        id.text = self.__atom_id
+        id.text = self.__id
         title = xml_elem('title', entry)
-        title.text = self.__atom_title
+        title.text = self.__title
+        if self.__updated is None:
+            updated_text = self._updated(default).isoformat()
+        else:
+            if self.__updated_text is None:
+                self.__updated_text = self.__updated.isoformat()
+            updated_text = self.__updated_text
         updated = xml_elem('updated', entry)
-        updated.text = self.__atom_updated.isoformat()
+        updated.text = updated_text
 
         # An entry must contain an alternate link if there is no content
         # element.
         if not self.__atom_content:
-            links = self.__atom_link or []
+            links = self.__link or []
             if not [link for link in links if link.get('rel') == 'alternate']:
                 raise ValueError('Entry must contain an alternate link or '
                                  'a content element.')
 
         # Add author elements
-        for a in self.__atom_author or []:
+        for a in self.__author or []:
             # Atom requires a name. Skip elements without.
             if not a.get('name'):
                 continue
@@ -134,9 +667,9 @@ class FeedEntry(object):
                 uri = xml_elem('uri', author)
                 uri.text = a.get('uri')
 
-        _add_text_elm(entry, self.__atom_content, 'content')
+        _add_text_elm(entry, self.__atom_content, 'content', markers)
 
-        for link in self.__atom_link or []:
+        for link in self.__link or []:
             link = xml_elem('link', entry, href=link['href'])
             if link.get('rel'):
                 link.attrib['rel'] = link['rel']
@@ -149,9 +682,9 @@ class FeedEntry(object):
             if link.get('length'):
                 link.attrib['length'] = link['length']
 
-        _add_text_elm(entry, self.__atom_summary, 'summary')
+        _add_text_elm(entry, self.__atom_summary, 'summary', markers)
 
-        for c in self.__atom_category or []:
+        for c in self.__category or []:
             cat = xml_elem('category', entry, term=c['term'])
             if c.get('scheme'):
                 cat.attrib['scheme'] = c['scheme']
@@ -173,42 +706,49 @@ class FeedEntry(object):
                 uri = xml_elem('uri', contrib)
                 uri.text = c.get('uri')
 
-        if self.__atom_published:
+        if self.__published:
+            if self.__published_text is None:
+                self.__published_text = self.__published.isoformat()
             published = xml_elem('published', entry)
-            published.text = self.__atom_published.isoformat()
+            published.text = self.__published_text
 
         if self.__atom_rights:
             rights = xml_elem('rights', entry)
             rights.text = self.__atom_rights
 
-        if self.__atom_source:
+        if self.__source:
             source = xml_elem('source', entry)
-            if self.__atom_source.get('title'):
+            if self.__source.get('title'):
                 source_title = xml_elem('title', source)
-                source_title.text = self.__atom_source['title']
-            if self.__atom_source.get('link'):
-                xml_elem('link', source, href=self.__atom_source['link'])
+                source_title.text = self.__source['title']
+            if self.__source.get('url'):
+                xml_elem('link', source, href=self.__source['url'])
 
         if extensions:
-            for ext in self.__extensions.values() or []:
-                if ext.get('atom'):
-                    ext['inst'].extend_atom(entry)
+            for name, ext in self.__extensions.items():
+                inst = self.__extension(name)
+                if ext['atom'] and not _is_empty(
+                        inst, ext['extension_class_entry']):
+                    inst.extend_atom(entry)
 
         return entry
 
     def rss_entry(self, extensions=True):
         '''Create a RSS item and return it.'''
+        if self.__raw and 'rss' in self.__raw:
+            return _parse_raw_entry('rss', self.__raw['rss'])
         entry = xml_elem('item')
-        if not (self.__rss_title or
+        if not (self.__title or
                 self.__rss_description or
                 self.__rss_content):
             raise ValueError('Required fields not set')
-        if self.__rss_title:
+        if self.__title:
             title = xml_elem('title', entry)
-            title.text = self.__rss_title
-        if self.__rss_link:
+            title.text = self.__title
+        rss_link = self.__rss_link()
+        if rss_link:
             link = xml_elem('link', entry)
-            link.text = self.__rss_link
+            link.text = rss_link
         if self.__rss_description and self.__rss_content:
             description = xml_elem('description', entry)
             description.text = self.__rss_description
@@ -225,41 +765,86 @@ class FeedEntry(object):
             description.text = CDATA(self.__rss_content['content']) \
                 if self.__rss_content.get('type', '') == 'CDATA' \
                 else self.__rss_content['content']
-        for a in self.__rss_author or []:
-            author = xml_elem('author', entry)
-            author.text = a
-        if self.__rss_guid.get('guid'):
+        # RSS authors require an email address
+        for a in self.__author or []:
+            if a.get('email'):
+                author = xml_elem('author', entry)
+                if a.get('name'):
+                    author.text = '%(email)s (%(name)s)' % a
+                else:
+                    author.text = '%(email)s' % a
+        if self.__id:
             guid = xml_elem('guid', entry)
-            guid.text = self.__rss_guid['guid']
-            permaLink = str(self.__rss_guid.get('permalink', False)).lower()
+            guid.text = self.__id
+            permaLink = str(self.__guid_permalink).lower()
             guid.attrib['isPermaLink'] = permaLink
-        for cat in self.__rss_category or []:
+        # Use the atom:label as name or if not present the atom:term. The
+        # atom:scheme is the rss:domain.
+        for cat in self.__category or []:
             category = xml_elem('category', entry)
-            category.text = cat['value']
-            if cat.get('domain'):
-                category.attrib['domain'] = cat['domain']
+            category.text = cat.get('label', cat['term'])
+            if cat.get('scheme'):
+                category.attrib['domain'] = cat['scheme']
         if self.__rss_comments:
             comments = xml_elem('comments', entry)
             comments.text = self.__rss_comments
-        if self.__rss_enclosure:
+        rss_enclosure = self.enclosure()
+        if rss_enclosure:
             enclosure = xml_elem('enclosure', entry)
-            enclosure.attrib['url'] = self.__rss_enclosure['url']
-            enclosure.attrib['length'] = self.__rss_enclosure['length']
-            enclosure.attrib['type'] = self.__rss_enclosure['type']
-        if self.__rss_pubDate:
+            enclosure.attrib['url'] = rss_enclosure['url']
+            enclosure.attrib['length'] = rss_enclosure['length']
+            enclosure.attrib['type'] = rss_enclosure['type']
+        if self.__published:
+            if self.__pubDate_text is None:
+                self.__pubDate_text = formatRFC2822(self.__published)
             pubDate = xml_elem('pubDate', entry)
-            pubDate.text = formatRFC2822(self.__rss_pubDate)
-        if self.__rss_source:
-            source = xml_elem('source', entry, url=self.__rss_source['url'])
-            source.text = self.__rss_source['title']
+            pubDate.text = self.__pubDate_text
+        if self.__source:
+            source = xml_elem('source', entry, url=self.__source['url'])
+            source.text = self.__source['title']
 
         if extensions:
-            for ext in self.__extensions.values() or []:
-                if ext.get('rss'):
-                    ext['inst'].extend_rss(entry)
+            for name, ext in self.__extensions.items():
+                inst = self.__extension(name)
+                if ext['rss'] and not _is_empty(
+                        inst, ext['extension_class_entry']):
+                    inst.extend_rss(entry)
 
         return entry
 
+    def _create_entries(self, formats, share=True, default=None):
+        '''Create the entry in several formats at once. Elements of extensions
+        adding identical elements to all formats are created only once and
+        copied to the other formats.
+
+        :param formats: Sequence of formats, `atom` or `rss`.
+        :param share: If elements may be copied. This requires the namespaces
+                      of the extensions to be declared by the feed since
+                      generated namespace prefixes may differ otherwise.
+        :param default: Default modification date. See :meth:`_updated`.
+        :returns: List of the entry elements in the order of the formats.
+        '''
+        elements = [self._atom_entry(extensions=False, default=default)
+                    if fmt == 'atom'
+                    else self.rss_entry(extensions=False) for fmt in formats]
+        for name, ext in self.__extensions.items():
+            inst = self.__extension(name)
+            if _is_empty(inst, ext['extension_class_entry']):
+                continue
+            shared = None
+            for fmt, element in zip(formats, elements):
+                if not ext[fmt]:
+                    continue
+                if shared is not None:
+                    for child in shared:
+                        element.append(deepcopy(child))
+                    continue
+                start = len(element)
+                getattr(inst, 'extend_' + fmt)(element)
+                if share and getattr(inst, 'identical_atom_rss', False):
+                    shared = element[start:]
+        return elements
+
     def title(self, title=None):
         '''Get or set the title value of the entry. It should contain a human
         readable title for the entry. Title is mandatory for both ATOM and RSS
@@ -269,9 +854,9 @@ class FeedEntry(object):
         :returns: The entriess title.
         '''
         if title is not None:
-            self.__atom_title = title
-            self.__rss_title = title
-        return self.__atom_title
+            self.__modified()
+            self.__title = title
+        return self.__title
 
     def id(self, id=None):
         '''Get or set the entry id which identifies the entry using a
@@ -284,9 +869,19 @@ class FeedEntry(object):
         :returns: Id of the entry.
         '''
         if id is not None:
-            self.__atom_id = id
-            self.__rss_guid = {'guid': id, 'permalink': False}
-        return self.__atom_id
+            self.__set_id(id)
+            self.__guid_permalink = False
+        return self.__id
+
+    def __set_id(self, id):
+        '''Set the id and update the indexes of the feeds containing this
+        entry.
+        '''
+        self.__modified()
+        old, self.__id = self.__id, id
+        if self.__trackers and old != id:
+            for tracker in self.__trackers:
+                tracker.identified(self, old, id)
 
     def guid(self, guid=None, permalink=False):
         '''Get or set the entries guid which is a string that uniquely
@@ -297,9 +892,11 @@ class FeedEntry(object):
         :returns: Id and permalink setting of the entry.
         '''
         if guid is not None:
-            self.__atom_id = guid
-            self.__rss_guid = {'guid': guid, 'permalink': permalink}
-        return self.__rss_guid
+            self.__set_id(guid)
+            self.__guid_permalink = permalink
+        if self.__id is None:
+            return {}
+        return {'guid': self.__id, 'permalink': self.__guid_permalink}
 
     def updated(self, updated=None):
         '''Set or get the updated value which indicates the last time the entry
@@ -309,20 +906,48 @@ class FeedEntry(object):
         a datetime.datetime object. In any case it is necessary that the value
         include timezone information.
 
+        Default value
+            If not set, updated has as value the date and time at which the
+            feed is generated. It is determined anew for every generation and
+            never stored, so reading it returns the current time.
+
         :param updated: The modification date.
         :returns: Modification date as datetime.datetime
         '''
         if updated is not None:
-            if isinstance(updated, string_types):
-                updated = dateutil.parser.parse(updated)
-            if not isinstance(updated, datetime):
-                raise ValueError('Invalid datetime format')
-            if updated.tzinfo is None:
-                raise ValueError('Datetime object has no timezone info')
-            self.__atom_updated = updated
-            self.__rss_lastBuildDate = updated
+            updated = _checked_date(updated)
+            self.__modified()
+            old, self.__updated = self.__updated, updated
+            self.__updated_text = None
+            if self.__trackers:
+                for tracker in self.__trackers:
+                    tracker.updated(old, updated)
+        elif self.__updated is None:
+            return self._updated()
+
+        return self.__updated
+
+    def _has_updated(self):
+        '''Check if the modification date of the entry is set.
+
+        :returns: False if a default date is used when the entry is generated.
+        '''
+        return self.__updated is not None
 
-        return self.__atom_updated
+    def _updated(self, default=None):
+        '''Get the modification date used when generating the entry.
+
+        :param default: Tuple of the date to use if no modification date is
+            set and if the publication date takes precedence over it. The
+            current time is used if not given.
+        :returns: Modification date as datetime.datetime
+        '''
+        if self.__updated is not None:
+            return self.__updated
+        if default is None:
+            return datetime.now(dateutil.tz.tzutc())
+        date, published = default
+        return published and self.__published or date
 
     def author(self, author=None, replace=False, **kwargs):
         '''Get or set author data. An author element is a dict containing a
@@ -358,40 +983,51 @@ class FeedEntry(object):
         if author is None and kwargs:
             author = kwargs
         if author is not None:
-            if replace or self.__atom_author is None:
-                self.__atom_author = []
-            self.__atom_author += ensure_format(author,
-                                                set(['name', 'email', 'uri']),
-                                                set())
-            self.__rss_author = []
-            for a in self.__atom_author:
-                if a.get('email'):
-                    if a.get('name'):
-                        self.__rss_author.append('%(email)s (%(name)s)' % a)
-                    else:
-                        self.__rss_author.append('%(email)s' % a)
-        return self.__atom_author
-
-    def content(self, content=None, src=None, type=None):
+            self.__modified()
+            if replace or self.__author is None:
+                self.__author = []
+            self.__author += ensure_format(author, *_FORMATS['author'])
+        return self.__author
+
+    def content(self, content=None, src=None, type=None, raw=False,
+                validate=True):
         '''Get or set the content of the entry which contains or links to the
         complete content of the entry. Content must be provided for ATOM
         entries if there is no alternate link, and should be provided if there
         is no summary. If the content is set (not linked) it will also set
         rss:description.
 
+        If the XML cache is enabled (see :func:`feedgen.util.xml_cache`),
+        xhtml and XML content is parsed when it is set and an error is raised
+        if it is invalid.
+
+        Pre-serialized xhtml or XML content can be set using `raw`. It is
+        inserted into ATOM feeds as it is without being parsed again. Note
+        that it is not indented if the feed is pretty printed.
+
         :param content: The content of the feed entry.
         :param src: Link to the entries content.
         :param type: If type is CDATA content would not be escaped.
+        :param raw: If the content is pre-serialized xhtml or XML as text or
+                    UTF-8 encoded bytes.
+        :param validate: If raw content should be parsed once to make sure it
+                         is well-formed. Disable this only for content from
+                         trusted sources.
         :returns: Content element of the entry.
         '''
         if src is not None:
+            self.__modified()
             self.__atom_content = {'src': src}
         elif content is not None:
-            self.__atom_content = {'content': content}
-            self.__rss_content = {'content': content}
+            data = {'content': content}
             if type is not None:
-                self.__atom_content['type'] = type
-                self.__rss_content['type'] = type
+                data['type'] = type
+            if raw:
+                _raw_text(data, 'content', validate)
+            elif type is not None:
+                _cache_text(data, 'content')
+            self.__modified()
+            self.__atom_content = self.__rss_content = data
         return self.__atom_content
 
     def link(self, link=None, replace=False, **kwargs):
@@ -440,26 +1076,26 @@ class FeedEntry(object):
         if link is None and kwargs:
             link = kwargs
         if link is not None:
-            if replace or self.__atom_link is None:
-                self.__atom_link = []
-            self.__atom_link += ensure_format(
-                link,
-                set(['href', 'rel', 'type', 'hreflang', 'title', 'length']),
-                set(['href']),
-                {'rel': ['alternate', 'enclosure', 'related', 'self', 'via']},
-                {'rel': 'alternate'})
-            # RSS only needs one URL. We use the first link for RSS:
-            for link in self.__atom_link:
-                if link.get('rel') == 'alternate':
-                    self.__rss_link = link['href']
-                elif link.get('rel') == 'enclosure':
-                    self.__rss_enclosure = {'url': link['href']}
-                    self.__rss_enclosure['type'] = link.get('type')
-                    self.__rss_enclosure['length'] = link.get('length') or '0'
+            self.__modified()
+            if replace or self.__link is None:
+                self.__link = []
+            self.__link += ensure_format(link, *_FORMATS['link'])
         # return the set with more information (atom)
-        return self.__atom_link
+        return self.__link
+
+    def __rss_link(self):
+        '''Get the URL used as RSS link which is the last link with
+        rel=alternate.
 
-    def summary(self, summary=None, type=None):
+        :returns: URL of the link or None.
+        '''
+        rss_link = None
+        for link in self.__link or []:
+            if link.get('rel') == 'alternate':
+                rss_link = link['href']
+        return rss_link
+
+    def summary(self, summary=None, type=None, raw=False, validate=True):
         '''Get or set the summary element of an entry which conveys a short
         summary, abstract, or excerpt of the entry. Summary is an ATOM only
         element and should be provided if there either is no content provided
@@ -469,20 +1105,31 @@ class FeedEntry(object):
         contains the old value of summary.
 
         :param summary: Summary of the entries contents.
+        :param type: Type of the summary.
+        :param raw: If the summary is pre-serialized xhtml or XML which is
+                    inserted into ATOM feeds as it is (see :meth:`content`).
+        :param validate: If a raw summary should be parsed once to make sure
+                         it is well-formed.
         :returns: Summary of the entries contents.
         '''
         if summary is not None:
+            data = {'summary': summary}
+            if type is not None:
+                data['type'] = type
+            if raw:
+                _raw_text(data, 'summary', validate)
+            elif type is not None:
+                _cache_text(data, 'summary')
+            self.__modified()
             # Replace the RSS description with the summary if it was the
             # summary before. Not if it is the description.
             if not self.__rss_description or (
                 self.__atom_summary and
                 self.__rss_description == self.__atom_summary.get("summary")
             ):
-                self.__rss_description = summary
+                self.__rss_description = data['summary']
 
-            self.__atom_summary = {'summary': summary}
-            if type is not None:
-                self.__atom_summary['type'] = type
+            self.__atom_summary = data
         return self.__atom_summary
 
     def description(self, description=None, isSummary=False):
@@ -497,6 +1144,7 @@ class FeedEntry(object):
         :returns: The entries description.
         '''
         if description is not None:
+            self.__modified()
             self.__rss_description = description
             if isSummary:
                 self.__atom_summary = {'summary': description}
@@ -527,23 +1175,11 @@ class FeedEntry(object):
         if category is None and kwargs:
             category = kwargs
         if category is not None:
-            if replace or self.__atom_category is None:
-                self.__atom_category = []
-            self.__atom_category += ensure_format(
-                    category,
-                    set(['term', 'scheme', 'label']),
-                    set(['term']))
-            # Map the ATOM categories to RSS categories. Use the atom:label as
-            # name or if not present the atom:term. The atom:scheme is the
-            # rss:domain.
-            self.__rss_category = []
-            for cat in self.__atom_category:
-                rss_cat = {}
-                rss_cat['value'] = cat.get('label', cat['term'])
-                if cat.get('scheme'):
-                    rss_cat['domain'] = cat['scheme']
-                self.__rss_category.append(rss_cat)
-        return self.__atom_category
+            self.__modified()
+            if replace or self.__category is None:
+                self.__category = []
+            self.__category += ensure_format(category, *_FORMATS['category'])
+        return self.__category
 
     def contributor(self, contributor=None, replace=False, **kwargs):
         '''Get or set the contributor data of the feed. This is an ATOM only
@@ -567,10 +1203,11 @@ class FeedEntry(object):
         if contributor is None and kwargs:
             contributor = kwargs
         if contributor is not None:
+            self.__modified()
             if replace or self.__atom_contributor is None:
                 self.__atom_contributor = []
             self.__atom_contributor += ensure_format(
-                    contributor, set(['name', 'email', 'uri']), set(['name']))
+                    contributor, *_FORMATS['contributor'])
         return self.__atom_contributor
 
     def published(self, published=None):
@@ -585,16 +1222,13 @@ class FeedEntry(object):
         :returns: Creation date as datetime.datetime
         '''
         if published is not None:
-            if isinstance(published, string_types):
-                published = dateutil.parser.parse(published)
-            if not isinstance(published, datetime):
-                raise ValueError('Invalid datetime format')
-            if published.tzinfo is None:
-                raise ValueError('Datetime object has no timezone info')
-            self.__atom_published = published
-            self.__rss_pubDate = published
+            published = _checked_date(published)
+            self.__modified()
+            self.__published = published
+            self.__published_text = None
+            self.__pubDate_text = None
 
-        return self.__atom_published
+        return self.__published
 
     def pubDate(self, pubDate=None):
         '''Get or set the pubDate of the entry which indicates when the entry
@@ -624,6 +1258,7 @@ class FeedEntry(object):
         :returns: Rights information of the feed.
         '''
         if rights is not None:
+            self.__modified()
             self.__atom_rights = rights
         return self.__atom_rights
 
@@ -635,6 +1270,7 @@ class FeedEntry(object):
         :returns: URL to the comments page.
         '''
         if comments is not None:
+            self.__modified()
             self.__rss_comments = comments
         return self.__rss_comments
 
@@ -650,9 +1286,9 @@ class FeedEntry(object):
         :returns: Source element as dictionaries.
         '''
         if url is not None and title is not None:
-            self.__rss_source = {'url': url, 'title': title}
-            self.__atom_source = {'link': url, 'title': title}
-        return self.__rss_source
+            self.__modified()
+            self.__source = {'url': url, 'title': title}
+        return self.__source
 
     def enclosure(self, url=None, length=None, type=None):
         '''Get or set the value of enclosure which describes a media object
@@ -669,7 +1305,13 @@ class FeedEntry(object):
         '''
         if url is not None:
             self.link(href=url, rel='enclosure', type=type, length=str(length))
-        return self.__rss_enclosure
+        rss_enclosure = None
+        for link in self.__link or []:
+            if link.get('rel') == 'enclosure':
+                rss_enclosure = {'url': link['href'],
+                                 'type': link.get('type'),
+                                 'length': link.get('length') or '0'}
+        return rss_enclosure
 
     def ttl(self, ttl=None):
         '''Get or set the ttl value. It is an RSS only element. ttl stands for
@@ -680,6 +1322,7 @@ class FeedEntry(object):
         :returns: Time to live of of the entry.
         '''
         if ttl is not None:
+            self.__modified()
             self.__rss_ttl = int(ttl)
         return self.__rss_ttl
 
@@ -691,9 +1334,7 @@ class FeedEntry(object):
         :param rss: If the extension should be used for RSS feeds.
         '''
         # Check loaded extensions
-        if not isinstance(self.__extensions, dict):
-            self.__extensions = {}
-        if name in self.__extensions.keys():
+        if name in self.__extensions:
             raise ImportError('Extension already loaded')
 
         # Load extension
@@ -719,20 +1360,124 @@ class FeedEntry(object):
         '''
         # Check loaded extensions
         # `load_extension` ignores the "Extension" suffix.
-        if not isinstance(self.__extensions, dict):
-            self.__extensions = {}
-        if namespace in self.__extensions.keys():
+        if namespace in self.__extensions:
             raise ImportError('Extension already loaded')
         if not extension_class_entry:
             raise ImportError('No extension class')
 
-        extinst = extension_class_entry()
-        setattr(self, namespace, extinst)
-
         # `load_extension` registry
-        self.__extensions[namespace] = {
-                'inst': extinst,
+        self._add_extensions({namespace: {
                 'extension_class_entry': extension_class_entry,
                 'atom': atom,
                 'rss': rss
-                }
+                }})
+        getattr(self, namespace)
+
+    def _add_extensions(self, extensions):
+        '''Register extensions without instantiating them. The extension
+        instance is created on first access unless a new instance of the
+        extension already adds data to the entry. Extensions already loaded
+        for this entry are skipped.
+
+        The registry is shared with other entries if possible and must not be
+        modified afterwards.
+
+        :param extensions: Dictionary mapping namespaces to dictionaries
+                           containing the entry extension class and the atom
+                           and rss flags.
+        '''
+        if not extensions:
+            return
+        self.__modified()
+        if not self.__extensions or all(
+                extensions.get(namespace) == ext
+                for namespace, ext in self.__extensions.items()):
+            # All extensions of this entry are part of the new registry
+            self.__extensions = extensions
+        else:
+            registry = dict(self.__extensions)
+            for namespace, ext in extensions.items():
+                registry.setdefault(namespace, ext)
+            self.__extensions = registry
+        for namespace, ext in extensions.items():
+            if not _is_inert(ext['extension_class_entry']):
+                getattr(self, namespace)
+
+    @staticmethod
+    def _loader(name):
+        '''Get a function setting a field of entries created by
+        :meth:`FeedGenerator.add_entries`. Common fields are stored directly
+        instead of calling the setter: The entries are new and not part of a
+        feed yet, so no caches need to be invalidated and no feeds need to be
+        notified. Dictionaries are checked once for each set of keys and
+        date strings are parsed once. Values of other forms are passed to the
+        setter.
+
+        A new loader should be used for every batch of entries.
+
+        :param name: Name of the field, i.e. of the setter.
+        :returns: Function taking a new entry and the value.
+        '''
+        def setter(entry, value):
+            call_setter(getattr(entry, name), value)
+
+        slot = _LOADED_SLOTS.get(name)
+        if slot is None:
+            return setter
+        slot = '_FeedEntry' + slot
+
+        if name in _FORMATS:
+            check = _format_checker(name)
+
+            def load(entry, value):
+                if isinstance(value, tuple) or (
+                        isinstance(value, dict) and
+                        (name in value or 'replace' in value)):
+                    # Arguments of the setter
+                    return setter(entry, value)
+                if not value:
+                    return
+                if isinstance(value, dict):
+                    # The setter gets a copy as keyword arguments
+                    value = dict(value)
+                value = check(value)
+                existing = getattr(entry, slot)
+                if existing is None:
+                    setattr(entry, slot, list(value))
+                else:
+                    existing += value
+            return load
+
+        # Parsed dates by string. Batches often contain identical dates.
+        dates = {}
+
+        def load(entry, value):
+            if slot == '_FeedEntry__atom_content' and \
+                    isinstance(value, dict) and value.get('content') and \
+                    set(value) <= _CONTENT_KEYS:
+                # Text content with an optional type
+                data = {'content': value['content']}
+                if value.get('type') is not None:
+                    data['type'] = value['type']
+                    _cache_text(data, 'content')
+                entry.__atom_content = entry.__rss_content = data
+                return
+            if isinstance(value, (dict, tuple)):
+                return setter(entry, value)
+            if value is None:
+                return
+            if slot in _DATE_SLOTS:
+                date = dates.get(value) \
+                    if isinstance(value, string_types) else None
+                if date is None:
+                    date = _checked_date(value)
+                    if isinstance(value, string_types):
+                        dates[value] = date
+                value = date
+            elif slot == '_FeedEntry__atom_content':
+                # Shared with RSS
+                value = entry.__rss_content = {'content': value}
+            elif slot == '_FeedEntry__id':
+                entry.__guid_permalink = False
+            setattr(entry, slot, value)
+        return load
@@ -14,7 +14,38 @@
 
 class BaseExtension(object):
     '''Basic FeedGenerator extension.
+
+    Once an extension is used by a feed or an entry, it gets a `_listener`
+    (see :func:`track`). From then on, every assignment to one of its
+    attributes increases its `_revision` and calls the listener. This is used
+    to detect if an extension was modified, e.g. to invalidate cached
+    fragments of a feed entry or the entity tag of a feed.
+
+    Entry extensions whose `extend_atom` and `extend_rss` add the same
+    elements should set `identical_atom_rss` to True. If a feed is generated
+    in both formats at once, these elements are then created only once and
+    copied. The namespaces of the elements must be declared by the
+    `extend_ns` method of the feed extension.
     '''
+    _revision = 0
+    _listener = None
+    identical_atom_rss = False
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Only extensions used by a feed or an entry have a listener
+        if self._listener is not None and \
+                name not in ('_revision', '_listener'):
+            object.__setattr__(self, '_revision', self._revision + 1)
+            self._listener()
+
+    def __getstate__(self):
+        # The listener belongs to the feed or entry using the extension. It
+        # is set again when they are unpickled.
+        state = self.__dict__.copy()
+        state.pop('_listener', None)
+        return state
+
     def extend_ns(self):
         '''Returns a dict that will be used in the namespace map for the feed.
         '''
@@ -42,3 +73,16 @@ class BaseExtension(object):
 class BaseEntryExtension(BaseExtension):
     '''Basic FeedEntry extension.
     '''
+
+
+def track(inst, listener):
+    '''Count the assignments to the attributes of an extension from now on
+    and call a listener after each of them. Assignments made before, e.g. by
+    the constructor, are not counted. The listener is not pickled.
+
+    :param inst: Instance of an extension derived from `BaseExtension`.
+    :param listener: Function without arguments.
+    :returns: The instance.
+    '''
+    object.__setattr__(inst, '_listener', listener)
+    return inst
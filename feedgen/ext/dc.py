@@ -388,6 +388,8 @@ class DcExtension(DcBaseExtension):
 class DcEntryExtension(DcBaseExtension):
     '''Dublin Core Elements extension for podcasts.
     '''
+    identical_atom_rss = True
+
     def extend_atom(self, entry):
         '''Add dc elements to an atom item. Alters the item itself.
 
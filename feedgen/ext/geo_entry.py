@@ -56,6 +56,7 @@ class GeoRSSGeometryError(ValueError):
 class GeoEntryExtension(BaseEntryExtension):
     '''FeedEntry extension for Simple GeoRSS.
     '''
+    identical_atom_rss = True
 
     def __init__(self):
         '''Simple GeoRSS tag'''
@@ -27,6 +27,7 @@ class MediaExtension(BaseExtension):
 class MediaEntryExtension(BaseEntryExtension):
     '''FeedEntry extension for media tags.
     '''
+    identical_atom_rss = True
 
     def __init__(self):
         self.__media_content = []
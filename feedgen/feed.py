@@ -9,34 +9,645 @@
 
 '''
 
-import sys
+import codecs
+import contextlib
+import hashlib
+import itertools
+import lzma
+import os
+import stat
+import threading
+import warnings
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
 from datetime import datetime
 
-import dateutil.parser
 import dateutil.tz
 from lxml import etree  # nosec - not using this for parsing
 
 import feedgen.version
 from feedgen.compat import string_types
 from feedgen.entry import FeedEntry
-from feedgen.util import ensure_format, formatRFC2822, xml_elem
+from feedgen.ext.base import BaseExtension, track
+from feedgen.util import (call_setter, ensure_format, fingerprint,
+                          formatRFC2822, parse_date, xml_elem)
 
 _feedgen_version = feedgen.version.version_str
 
+_SPLIT_MARKER = 'feedgen-split-marker'
+
+# Number of entries serialized by a worker at once if serialized in parallel
+_PARALLEL_CHUNK = 1000
+
+# Compressors for generated feeds. Gzip and deflate (zlib format as used by
+# HTTP) use the default compression level and do not store a timestamp.
+_COMPRESSORS = {
+    'gzip': lambda: zlib.compressobj(wbits=31),
+    'deflate': zlib.compressobj,
+    'xz': lzma.LZMACompressor,
+}
+
+# Attributes of a FeedGenerator which are not part of the feed header
+_UNTRACKED = ('_FeedGenerator__revision', '_FeedGenerator__feed_entries',
+              '_FeedGenerator__serializers', '_FeedGenerator__entry_registry',
+              '_FeedGenerator__tracker', '_FeedGenerator__entry_list')
+
+# Default date of deterministic feeds without any dates
+_EPOCH = datetime(1970, 1, 1, tzinfo=dateutil.tz.tzutc())
+
+# Feed history namespace and link relations of paged and archived feeds
+# (RFC 5005)
+_FH_NS = 'http://purl.org/syndication/history/1.0'
+_PAGE_RELS = frozenset(('self', 'first', 'last', 'previous', 'next',
+                        'current', 'prev-archive', 'next-archive'))
+
+
+def _split_at_end(root, container, pretty):
+    '''Serialize an XML tree and split the result at the end of the content of
+    the container element.
+
+    :param root: Root element of the tree to serialize.
+    :param container: Element whose end is used to split the output.
+    :param pretty: If the output should be pretty printed.
+    :returns: Tuple containing the text before and after the split position.
+    '''
+    marker = xml_elem(_SPLIT_MARKER, container)
+    try:
+        text = etree.tostring(root, pretty_print=pretty, encoding='unicode')
+    finally:
+        container.remove(marker)
+    head, tail = text.split('<%s/>' % _SPLIT_MARKER)
+    if pretty:
+        # Indentation and line break belong to the elements inserted here
+        head = head[:head.rindex('\n') + 1]
+        tail = tail[1:]
+    return head, tail
+
+
+class _TextEncoder(object):
+    '''Incremental encoder returning the text unchanged.
+    '''
+
+    def encode(self, text, final=False):
+        return text
+
+
+class _Serializer(object):
+    '''Serializes a feed incrementally. The result is identical to
+    serializing the whole document with all entries at once.
+
+    The header and footer of the feed are serialized once when the serializer
+    is created. Entries are serialized one by one inside of an empty copy of
+    the feed root (and channel) which declares the same namespaces and
+    results in the same indentation as the whole document would. Every thread
+    uses its own copy, so a serializer can be used by several threads at once.
+    Serializers can be pickled to serialize entries in other processes.
+
+    :param fmt: Format of the feed, either `atom` or `rss`.
+    :param root: Root element of the feed without entries.
+    :param container: Element the entries belong to.
+    :param pretty: If the output should be pretty printed.
+    '''
+
+    def __init__(self, fmt, root, container, pretty):
+        self.__fmt = fmt
+        self.__pretty = pretty
+        self.head, self.tail = _split_at_end(root, container, pretty)
+        self.__root_spec = (root.tag, dict(root.attrib), root.nsmap)
+        self.__container_spec = None
+        if container is not root:
+            self.__container_spec = (container.tag, dict(container.attrib))
+        self.__local = threading.local()
+        root, container = self.__scratch()
+        head, tail = _split_at_end(root, container, pretty)
+        # Entries serialized with a different key may differ
+        self.key = (fmt, pretty, head)
+        self.__start = len(head)
+        self.__end = len(tail)
+        # Indentation around pre-serialized entries
+        probe = self.element(xml_elem(_SPLIT_MARKER))
+        self.__raw_format = probe.replace('<%s/>' % _SPLIT_MARKER, '%s')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_Serializer__local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__local = threading.local()
+
+    def __scratch(self):
+        '''Get the empty copy of the feed root and the entry container of
+        the current thread.
+
+        :returns: Tuple of root and container element.
+        '''
+        try:
+            return self.__local.scratch
+        except AttributeError:
+            tag, attrib, nsmap = self.__root_spec
+            root = container = xml_elem(tag, attrib=attrib, nsmap=nsmap)
+            if self.__container_spec is not None:
+                tag, attrib = self.__container_spec
+                container = xml_elem(tag, root, attrib=attrib)
+            self.__local.scratch = (root, container)
+            return root, container
+
+    def element(self, element):
+        '''Serialize a single entry element.
+
+        :param element: The entry element to serialize.
+        :returns: The serialized entry as text.
+        '''
+        root, container = self.__scratch()
+        container.append(element)
+        try:
+            text = etree.tostring(root, pretty_print=self.__pretty,
+                                  encoding='unicode')
+        finally:
+            container.remove(element)
+        return text[self.__start:len(text) - self.__end]
+
+    def entry(self, entry, default=None):
+        '''Serialize a FeedEntry using its cached fragment if available.
+
+        :param entry: The FeedEntry object to serialize.
+        :param default: Default modification date of the entry. See
+                        :meth:`FeedEntry._updated`.
+        :returns: The serialized entry as text.
+        '''
+        fragment = entry._cached_fragment(self.key)
+        if fragment is None:
+            fragment = self.__create(entry, default)
+            self.__cache(entry, fragment)
+        return fragment
+
+    def __cache(self, entry, fragment):
+        '''Cache a fragment unless it contains a default date which may be
+        different for the next generation.
+        '''
+        if self.__fmt == 'rss' or entry._has_updated():
+            entry._cache_fragment(self.key, fragment)
+
+    def __create(self, entry, default):
+        '''Serialize a FeedEntry. Pre-serialized entries and content are
+        inserted as they are.
+        '''
+        raw = entry._raw_entry(self.__fmt)
+        if raw is not None:
+            return self.__raw_format % raw
+        element, markers = entry._spliced_entry(self.__fmt, default)
+        return entry._splice(self.element(element), markers)
+
+    def fragments(self, entries, default=None):
+        '''Serialize entries without using or filling their fragment cache.
+        This is called by the workers if entries are serialized in parallel.
+
+        :param entries: List of FeedEntry objects.
+        :param default: Default modification date of the entries.
+        :returns: List of the serialized entries.
+        '''
+        return [self.__create(entry, default) for entry in entries]
+
+    def encoder(self, encoding, xml_declaration):
+        '''Get an encoder for the output and the feed header to start with.
+
+        :param encoding: Encoding of the output. Use `unicode` to get text.
+        :param xml_declaration: If an XML declaration should be added.
+        :returns: Tuple of the incremental encoder and the header.
+        '''
+        if encoding is str or encoding == 'unicode':
+            if xml_declaration:
+                raise ValueError('Serialisation to unicode must not request '
+                                 'an XML declaration')
+            encoder = _TextEncoder()
+        else:
+            encoder = codecs.getincrementalencoder(encoding)(
+                    'xmlcharrefreplace')
+        head = self.head
+        if xml_declaration:
+            head = "<?xml version='1.0' encoding='%s'?>\n" % encoding + head
+        return encoder, head
+
+    def serialize(self, entries, encoding, xml_declaration, workers=None,
+                  default=None):
+        '''Serialize the feed piece by piece.
+
+        :param entries: Iterable of FeedEntry objects.
+        :param encoding: Encoding of the output. Use `unicode` to get text.
+        :param xml_declaration: If an XML declaration should be added.
+        :param workers: Number of processes or an executor to serialize the
+                        entries in parallel (default: serialize serially).
+        :param default: Default modification date of the entries. See
+                        :meth:`FeedEntry._updated`.
+        :returns: Generator yielding the encoded feed piece by piece.
+        '''
+        encoder, head = self.encoder(encoding, xml_declaration)
+        if workers:
+            return self.__serialize_parallel(encoder, head, entries, workers,
+                                             default)
+        return self.__serialize(encoder, head, entries, default)
+
+    def __serialize(self, encoder, head, entries, default):
+        yield encoder.encode(head)
+        for entry in entries:
+            yield encoder.encode(self.entry(entry, default))
+        yield encoder.encode(self.tail, True)
+
+    def __serialize_parallel(self, encoder, head, entries, workers, default):
+        if isinstance(workers, Executor):
+            executor, pending = workers, 2 * (os.cpu_count() or 1)
+        else:
+            executor, pending = ProcessPoolExecutor(workers), 2 * workers
+        try:
+            yield encoder.encode(head)
+            for fragments in self.__chunks(executor, pending, entries,
+                                           default):
+                yield encoder.encode(''.join(fragments))
+            yield encoder.encode(self.tail, True)
+        finally:
+            if executor is not workers:
+                executor.shutdown()
+
+    def __chunks(self, executor, pending, entries, default):
+        '''Serialize chunks of entries using an executor. Only a limited
+        number of chunks are processed at once. Cached fragments are used and
+        filled but entries are serialized without their cache by the workers
+        since they may operate on copies of the entries.
+
+        :returns: Generator yielding the lists of fragments of the chunks in
+                  the order of the entries.
+        '''
+        entries = iter(entries)
+        submitted = deque()
+
+        def submit():
+            chunk = list(itertools.islice(entries, _PARALLEL_CHUNK))
+            if chunk:
+                fragments = [entry._cached_fragment(self.key)
+                             for entry in chunk]
+                missing = [entry for entry, fragment in zip(chunk, fragments)
+                           if fragment is None]
+                future = executor.submit(self.fragments, missing, default) \
+                    if missing else None
+                submitted.append((chunk, fragments, future))
+
+        for _ in range(pending):
+            submit()
+        while submitted:
+            chunk, fragments, future = submitted.popleft()
+            submit()
+            if future is not None:
+                serialized = iter(future.result())
+                for i, entry in enumerate(chunk):
+                    if fragments[i] is None:
+                        fragments[i] = next(serialized)
+                        self.__cache(entry, fragments[i])
+            yield fragments
+
+
+def _serialize_formats(streams, entries, default=None):
+    '''Serialize a feed in several formats at once. Every entry is visited
+    once and serialized to all formats before the next one is processed.
+
+    :param streams: List of tuples of the format, the serializer, the encoder
+                    and the header of each output.
+    :param entries: Iterable of FeedEntry objects.
+    :param default: Default modification date of the entries.
+    :returns: Generator yielding tuples of the format and an encoded piece of
+              the feed in that format.
+    '''
+    for fmt, _, encoder, head in streams:
+        yield fmt, encoder.encode(head)
+    for entry in entries:
+        for fmt, serializer, encoder, _ in streams:
+            yield fmt, encoder.encode(serializer.entry(entry, default))
+    for fmt, serializer, encoder, _ in streams:
+        yield fmt, encoder.encode(serializer.tail, True)
+
+
+def _join(pieces):
+    '''Join the pieces of a serialized feed.
+
+    :param pieces: Iterable of either byte strings or text.
+    :returns: The whole feed.
+    '''
+    pieces = list(pieces)
+    return pieces[0][:0].join(pieces)
+
+
+def _compressor(compression):
+    '''Create a compressor.
+
+    :param compression: Name of the compression method or None.
+    :returns: The compressor or None if the output is not compressed.
+    '''
+    if not compression:
+        return None
+    if compression not in _COMPRESSORS:
+        raise ValueError('Invalid compression %s' % compression)
+    return _COMPRESSORS[compression]()
+
+
+def _compressed(pieces, compressor):
+    for piece in pieces:
+        if not isinstance(piece, bytes):
+            raise ValueError('Only encoded feeds can be compressed')
+        piece = compressor.compress(piece)
+        if piece:
+            yield piece
+    yield compressor.flush()
+
+
+def _compress(pieces, compression):
+    '''Compress the pieces of a serialized feed while they are generated.
+
+    :param pieces: Iterable of byte strings.
+    :param compression: Compression method (`gzip`, `deflate` or `xz`) or
+        None to pass the pieces through.
+    :returns: Iterable of compressed byte strings.
+    '''
+    compressor = _compressor(compression)
+    if compressor is None:
+        return pieces
+    return _compressed(pieces, compressor)
+
+
+def _sinks(filename, compression):
+    '''Get the outputs a feed is written to.
+
+    :param filename: Name of file to write or a file-like object or a
+        dictionary mapping several of them to their compression methods.
+    :param compression: Compression method used if a single file is passed.
+    :returns: List of tuples of files and compression methods.
+    '''
+    if isinstance(filename, dict):
+        return list(filename.items())
+    return [(filename, compression)]
+
+
+def _write(pieces, sinks, publish=False):
+    '''Write the pieces of a serialized feed to several files at once. Each
+    piece is compressed and written to all files before the next one is
+    generated.
+
+    :param pieces: Iterable of byte strings.
+    :param sinks: List of tuples of files and compression methods.
+    :param publish: If the files are replaced atomically and only if their
+        content changed. See :class:`_PublishedFile`.
+    :returns: If publishing, if any of the files changed.
+    '''
+    compressors = [_compressor(compression) for _, compression in sinks]
+    if publish:
+        for filename, _ in sinks:
+            if hasattr(filename, 'write'):
+                raise ValueError('Only files given by name can be published')
+    opener = _PublishedFile if publish else _open
+    with contextlib.ExitStack() as stack:
+        files = [stack.enter_context(opener(filename))
+                 for filename, _ in sinks]
+        outputs = [(f.write, compressor)
+                   for f, compressor in zip(files, compressors)]
+        for piece in pieces:
+            for write, compressor in outputs:
+                write(compressor.compress(piece) if compressor else piece)
+        for write, compressor in outputs:
+            if compressor:
+                write(compressor.flush())
+    if publish:
+        return any(f.changed for f in files)
+
+
+@contextlib.contextmanager
+def _open(filename):
+    '''Open a file for writing in binary mode. File-like objects are passed
+    through and not closed.
+
+    :param filename: Name of file to write or a file-like object.
+    '''
+    if hasattr(filename, 'write'):
+        yield filename
+    else:
+        with open(filename, 'wb') as f:
+            yield f
+
+
+class _PublishedFile(object):
+    '''File which is written to a temporary file in the same directory
+    first. When it is closed, the SHA-256 digest of the new content is
+    compared to the digest of the existing file. If the content is
+    identical, the existing file is left untouched. Otherwise, the temporary
+    file is synced to disk and atomically renamed, so readers never see a
+    partially written file.
+    '''
+
+    def __init__(self, filename):
+        self.filename = os.fspath(filename)
+        self.changed = False
+        self.__digest = hashlib.sha256()
+        self.__size = 0
+        directory, name = os.path.split(os.path.abspath(self.filename))
+        self.__directory = directory
+        self.__tmp = os.path.join(directory, '.%s.%s.tmp' % (
+            name, os.urandom(6).hex()))
+        self.__file = os.fdopen(os.open(
+            self.__tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL |
+            getattr(os, 'O_BINARY', 0), 0o666), 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.__publish()
+        finally:
+            self.__file.close()
+            if os.path.exists(self.__tmp):
+                os.remove(self.__tmp)
+
+    def write(self, data):
+        self.__file.write(data)
+        self.__digest.update(data)
+        self.__size += len(data)
+
+    def __unchanged(self):
+        '''Check if the existing file has the same content.'''
+        try:
+            if os.path.getsize(self.filename) != self.__size:
+                return False
+            digest = hashlib.sha256()
+            with open(self.filename, 'rb') as f:
+                for block in iter(lambda: f.read(65536), b''):
+                    digest.update(block)
+        except OSError:
+            return False
+        return digest.digest() == self.__digest.digest()
+
+    def __publish(self):
+        if self.__unchanged():
+            return
+        # The content has to be on disk and the file closed before it is
+        # renamed. Otherwise, a crash could leave an empty or truncated file
+        # and some platforms do not allow renaming open files.
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__file.close()
+        try:
+            mode = stat.S_IMODE(os.stat(self.filename).st_mode)
+        except OSError:
+            pass
+        else:
+            os.chmod(self.__tmp, mode)
+        os.replace(self.__tmp, self.filename)
+        self.changed = True
+        # Make sure the rename itself is persisted. Not all platforms allow
+        # opening directories.
+        try:
+            fd = os.open(self.__directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def _chunked(pieces, chunk_size):
+    '''Combine the pieces of a serialized feed into larger chunks.
+
+    :param pieces: Iterable of byte strings or, if the feed is not encoded,
+        of strings.
+    :param chunk_size: Minimum size of a chunk in bytes or characters. Only
+        the last chunk may be smaller. If it evaluates to false, pieces are
+        passed through.
+    :returns: Generator yielding strings of the same type as the pieces.
+    '''
+    buf = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= (chunk_size or 0):
+            # Empty string of the type of the pieces
+            yield piece[:0].join(buf)
+            buf = []
+            size = 0
+    if buf:
+        yield buf[0][:0].join(buf)
+
+
+class _ChangeTracker(object):
+    '''Keeps track of the modifications of a feed, of the newest
+    modification date of its entries and of the ids of its entries. The feed,
+    its entries and extensions notify the tracker about every modification.
+    '''
+
+    def __init__(self):
+        # Entity tag of the feed. Reset by every modification.
+        self.etag = None
+        # Newest modification date of the entries. Recomputed if outdated.
+        self.newest = None
+        self.outdated = False
+        # Entries by id. Ids are usually unique, but several entries may
+        # share one.
+        self.ids = {}
+
+    def changed(self):
+        self.etag = None
+
+    def updated(self, old, new):
+        '''Register that the modification date of an entry changed.
+
+        :param old: The previous date or None.
+        :param new: The new date or None if the entry was removed.
+        '''
+        self.changed()
+        if new is not None and (self.newest is None or new >= self.newest):
+            self.newest = new
+        elif old is not None and self.newest is not None and \
+                old >= self.newest:
+            self.outdated = True
+
+    def identified(self, entry, old, new):
+        '''Register that the id of an entry changed.
+
+        :param entry: The entry.
+        :param old: The previous id or None.
+        :param new: The new id or None if the entry was removed.
+        '''
+        if old is not None:
+            entries = self.ids.get(old)
+            if entries is not None:
+                if len(entries) == 1:
+                    del self.ids[old]
+                else:
+                    entries.remove(entry)
+        if new is not None:
+            self.ids.setdefault(new, []).append(entry)
+
+
+class _EntryList(list):
+    '''List of the entries of a feed as returned by
+    :meth:`FeedGenerator.entry`. The feed stores its entries in a different
+    structure. Modifying the list in place is deprecated but still applied to
+    the feed, which takes time proportional to the number of entries. Once
+    the feed was modified otherwise, modifying a list returned before has no
+    effect.
+    '''
+
+    def __init__(self, entries, apply):
+        list.__init__(self, entries)
+        # Function applying a modification to the feed or None if detached
+        self._apply = apply
+
+
+def _entry_list_mutator(name):
+    method = getattr(list, name)
+
+    def mutator(self, *args, **kwargs):
+        warnings.warn('Modifying the list returned by entry() is deprecated. '
+                      'Use entry(…, replace=True) or remove_entry(…) '
+                      'instead.', DeprecationWarning, stacklevel=2)
+        result = method(self, *args, **kwargs)
+        if self._apply is not None:
+            self._apply(self)
+        return result
+    mutator.__name__ = name
+    return mutator
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__', 'append',
+              'extend', 'insert', 'pop', 'remove', 'reverse', 'sort',
+              'clear'):
+    setattr(_EntryList, _name, _entry_list_mutator(_name))
+
 
 class FeedGenerator(object):
     '''FeedGenerator for generating ATOM and RSS feeds.
     '''
 
     def __init__(self):
-        self.__feed_entries = []
+        # Notified about all modifications to maintain the entity tag
+        self.__tracker = _ChangeTracker()
+
+        # Entries in order of the feed. Mapping entries to None allows
+        # inserting at both ends and removing entries in constant time.
+        self.__feed_entries = OrderedDict()
+        # List of the entries returned by entry(). Created on demand.
+        self.__entry_list = None
 
         # ATOM
         # https://tools.ietf.org/html/rfc4287
         # required
         self.__atom_id = None
         self.__atom_title = None
-        self.__atom_updated = datetime.now(dateutil.tz.tzutc())
+        # The time of generation is used if not set
+        self.__atom_updated = None
 
         # recommended
         self.__atom_author = None  # {name*, uri, email}
@@ -70,7 +681,7 @@ class FeedGenerator(object):
         self.__rss_generator = 'python-feedgen'
         self.__rss_image = None
         self.__rss_language = None
-        self.__rss_lastBuildDate = datetime.now(dateutil.tz.tzutc())
+        self.__rss_lastBuildDate = None
         self.__rss_managingEditor = None
         self.__rss_pubDate = None
         self.__rss_rating = None
@@ -82,6 +693,261 @@ class FeedGenerator(object):
 
         # Extension list:
         self.__extensions = {}
+        self.__entry_registry = None
+
+        # Cache for serialized feed headers (disabled by default)
+        self.__serializers = None
+
+        # Deterministic mode
+        self.__deterministic = False
+
+    # Number of modifications of the feed header
+    __revision = 0
+    # Serialized feed headers, see incremental()
+    __serializers = None
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        # Modifications are only tracked while the feed is generated
+        # incrementally, see incremental()
+        if name not in _UNTRACKED and self.__serializers is not None:
+            object.__setattr__(self, '_FeedGenerator__revision',
+                               self.__revision + 1)
+            self.__tracker.changed()
+
+    def __getstate__(self):
+        # Serialized feed headers are bound to the current process and cheap
+        # to recreate. Drop them when pickling the feed.
+        state = self.__dict__.copy()
+        if self.__serializers is not None:
+            state['_FeedGenerator__serializers'] = {}
+        state['_FeedGenerator__entry_list'] = None
+        # Entries and extensions do not pickle their references to the
+        # tracker. It is recreated from the entries.
+        state['_FeedGenerator__tracker'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        tracker = self.__tracker = _ChangeTracker()
+        for entry in self.__feed_entries:
+            entry._track(tracker)
+        for ext in self.__extensions.values():
+            if isinstance(ext['inst'], BaseExtension):
+                track(ext['inst'], tracker.changed)
+
+    def __header_revisions(self):
+        '''Get the revisions of the feed header and all feed extensions.
+
+        :returns: Tuple of revisions or None if an extension does not support
+                  change tracking.
+        '''
+        revisions = [self.__revision]
+        for ext in self.__extensions.values():
+            if not isinstance(ext['inst'], BaseExtension):
+                return None
+            revisions.append(ext['inst']._revision)
+        return tuple(revisions)
+
+    def __use_fragments(self):
+        '''Check if the feed should be assembled from serialized fragments of
+        its entries instead of being serialized as a whole.
+
+        :returns: True if the feed is generated incrementally or if at least
+                  one entry has its fragment cache enabled or contains
+                  pre-serialized XML.
+        '''
+        return self.__serializers is not None or \
+            any(entry._use_fragments() for entry in self.__feed_entries)
+
+    def _serializer(self, fmt, extensions=True, pretty=False, updated=None):
+        '''Get a serializer for this feed. If the feed is generated
+        incrementally, the serializer including the serialized feed header
+        is reused as long as neither the feed nor a feed extension has been
+        modified and the modification date of the feed is the same.
+
+        :param fmt: Format of the feed, either `atom` or `rss`.
+        :param extensions: If the loaded extensions should be used.
+        :param pretty: If the output should be pretty printed.
+        :param updated: Modification date of the feed (default:
+                        :meth:`updated`).
+        :returns: Serializer for the feed.
+        '''
+        if updated is None:
+            updated = self.updated()
+        key = (fmt, extensions, pretty)
+        revisions = None
+        if self.__serializers is not None:
+            revisions = self.__header_revisions()
+            if revisions is not None:
+                revisions += (updated,)
+            cached_revisions, serializer = \
+                self.__serializers.get(key, (None, None))
+            if revisions is not None and revisions == cached_revisions:
+                return serializer
+        if fmt == 'atom':
+            root = container = self._create_atom_head(extensions=extensions,
+                                                      updated=updated)
+        else:
+            root, container = self._create_rss_head(extensions=extensions,
+                                                    updated=updated)
+        serializer = _Serializer(fmt, root, container, pretty)
+        if revisions is not None:
+            self.__serializers[key] = (revisions, serializer)
+        return serializer
+
+    def incremental(self, incremental=None):
+        '''Get or set if the feed is generated incrementally. If enabled, the
+        feed keeps track of modifications and a new generation of the feed
+        only rebuilds the parts which have changed since the last one: The
+        feed header is rebuilt only if the feed or one of its extensions has
+        been modified and the fragment cache of all entries is enabled (see
+        :meth:`FeedEntry.fragment_cache`).
+
+        Changes are detected by tracking calls to the setters of the feed,
+        the entries and extensions derived from `BaseExtension`. Data modified
+        in place, e.g. by changing a dictionary returned by a getter, is not
+        detected.
+
+        :param incremental: If the feed should be generated incrementally.
+        :returns: If the feed is generated incrementally.
+        '''
+        if incremental is not None:
+            self.__serializers = {} if incremental else None
+            self.__tracker.changed()
+            for entry in self.__feed_entries:
+                entry.fragment_cache(incremental)
+        return self.__serializers is not None
+
+    def etag(self):
+        '''Get an entity tag for the current state of the feed, e.g. to
+        answer conditional HTTP requests with `304 Not Modified` without
+        generating the feed.
+
+        The tag is derived from the data of the feed, its entries and
+        extensions. Feeds with the same data get the same tag, even in
+        different processes, and setting a value which does not change the
+        data keeps the tag. Default dates are not part of it.
+
+        The cost depends on :meth:`incremental`. By default, every call
+        hashes the data of the feed and combines the digests of all entries,
+        so it takes time linear in the number of entries. Digests of the
+        entries are cached until they are modified, but unmodified entries
+        are still visited on every call. Only if the feed is generated
+        incrementally, the tag itself is cached and returned in constant time
+        until something changes. Enable it for feeds which answer many
+        conditional requests. Modifications are detected the same way as for
+        :meth:`incremental`, so data modified in place is not detected.
+
+        :returns: Weak entity tag, e.g. `W/"2a7c9e0b41f3c5d8a1b07e6f4d2c9a18"`.
+        '''
+        tracker = self.__tracker
+        if tracker.etag is not None and self.__serializers is not None:
+            return tracker.etag
+        state = {name: value for name, value in self.__dict__.items()
+                 if name not in _UNTRACKED}
+        digest = hashlib.sha256(fingerprint(state))
+        for entry in self.__feed_entries:
+            digest.update(entry._digest())
+        etag = 'W/"%s"' % digest.hexdigest()[:32]
+        if self.__serializers is not None:
+            tracker.etag = etag
+        return etag
+
+    def last_modified(self):
+        '''Get the newest modification date of the feed and its entries,
+        e.g. for the `Last-Modified` header of HTTP responses. The date is
+        maintained while entries are added, modified and removed. Only if
+        the newest entry is removed or its date is set to an earlier one, the
+        dates of all entries are compared again on the next call.
+
+        Only dates which are set explicitly are taken into account. Default
+        dates are determined anew whenever the feed is generated.
+
+        :returns: Newest modification date as datetime.datetime or None if
+            no date is set.
+        '''
+        dates = [date for date in (self.__atom_updated, self.__newest_entry())
+                 if date is not None]
+        return max(dates) if dates else None
+
+    def deterministic(self, deterministic=None):
+        '''Get or set if the feed is generated deterministically. If enabled,
+        generating the same data results in byte-identical output which can
+        be cached and compared by hash:
+
+        - Modification dates of entries which are not set explicitly are set
+          to their publication date or, if it is not set either, to the
+          explicitly set modification date of the feed.
+        - The modification date of the feed defaults to the newest
+          modification date of its entries. It follows the entries as they
+          change until it is set explicitly.
+        - If there is no date at all, the start of the Unix epoch is used.
+        - Namespaces are declared and extensions are applied in the order of
+          their names instead of the order in which they were loaded.
+
+        :param deterministic: If the feed should be generated
+            deterministically.
+        :returns: If the feed is generated deterministically.
+        '''
+        if deterministic is not None:
+            self.__deterministic = bool(deterministic)
+            self.__entry_registry = None
+            extensions = self.__entry_extensions()
+            for entry in self.__feed_entries:
+                entry._add_extensions(extensions)
+        return self.__deterministic
+
+    def __loaded_extensions(self):
+        '''Get the loaded extensions in the order in which they are applied.
+
+        :returns: List of tuples of the namespaces and dictionaries
+            describing the extensions.
+        '''
+        if self.__deterministic:
+            return sorted(self.__extensions.items(), key=lambda item: item[0])
+        return list(self.__extensions.items())
+
+    def __sorted_nsmap(self, nsmap):
+        '''Sort a namespace map by prefix if the feed is deterministic.'''
+        if not self.__deterministic:
+            return nsmap
+        return OrderedDict(sorted(nsmap.items(),
+                                  key=lambda item: item[0] or ''))
+
+    def __newest_entry(self):
+        '''Get the newest modification date of the entries.
+
+        :returns: The date or None if no entry has a modification date.
+        '''
+        tracker = self.__tracker
+        if tracker.outdated:
+            tracker.newest = max((entry.updated()
+                                  for entry in self.__feed_entries
+                                  if entry._has_updated()), default=None)
+            tracker.outdated = False
+        return tracker.newest
+
+    def __dates(self):
+        '''Determine the modification dates used for a generation of the feed
+        if they are not set explicitly. They are not stored since they may
+        differ for the next generation. The clock is read only once so that
+        the feed and all entries get the same timestamp. Deterministic feeds
+        derive the dates from their data instead. See :meth:`deterministic`.
+
+        :returns: Tuple of the modification date of the feed and the default
+                  modification date of the entries as passed to
+                  :meth:`FeedEntry._updated`.
+        '''
+        explicit = self.__atom_updated
+        if not self.__deterministic:
+            now = datetime.now(dateutil.tz.tzutc())
+            return explicit or now, (now, False)
+        default = (explicit or _EPOCH, True)
+        if explicit is None:
+            explicit = max((entry._updated(default)
+                            for entry in self.__feed_entries), default=_EPOCH)
+        return explicit, default
 
     def _create_atom(self, extensions=True):
         '''Create a ATOM feed xml structure containing all previously set
@@ -89,31 +955,48 @@ class FeedGenerator(object):
 
         :returns: Tuple containing the feed root element and the element tree.
         '''
+        updated, default = self.__dates()
+        feed = self._create_atom_head(extensions=extensions, updated=updated)
+
+        for entry in self.__feed_entries:
+            entry = entry._atom_entry(default=default)
+            feed.append(entry)
+
+        doc = etree.ElementTree(feed)
+        return feed, doc
+
+    def _create_atom_head(self, extensions=True, updated=None):
+        '''Create the ATOM feed xml structure without any entries.
+
+        :param updated: Modification date of the feed (default:
+                        :meth:`updated`).
+        :returns: The feed root element.
+        '''
+        if updated is None:
+            updated = self.updated()
         nsmap = dict()
         if extensions:
-            for ext in self.__extensions.values() or []:
+            for _, ext in self.__loaded_extensions():
                 if ext.get('atom'):
                     nsmap.update(ext['inst'].extend_ns())
 
         feed = xml_elem('feed',
                         xmlns='http://www.w3.org/2005/Atom',
-                        nsmap=nsmap)
+                        nsmap=self.__sorted_nsmap(nsmap))
         if self.__atom_feed_xml_lang:
             feed.attrib['{http://www.w3.org/XML/1998/namespace}lang'] = \
                     self.__atom_feed_xml_lang
 
-        if not (self.__atom_id and self.__atom_title and self.__atom_updated):
+        if not (self.__atom_id and self.__atom_title):
             missing = ([] if self.__atom_title else ['title']) + \
-                      ([] if self.__atom_id else ['id']) + \
-                      ([] if self.__atom_updated else ['updated'])
+                      ([] if self.__atom_id else ['id'])
             missing = ', '.join(missing)
             raise ValueError('Required fields not set (%s)' % missing)
         id = xml_elem('id', feed)
         id.text = self.__atom_id
         title = xml_elem('title', feed)
         title.text = self.__atom_title
-        updated = xml_elem('updated', feed)
-        updated.text = self.__atom_updated.isoformat()
+        xml_elem('updated', feed).text = updated.isoformat()
 
         # Add author elements
         for a in self.__atom_author or []:
@@ -190,19 +1073,14 @@ class FeedGenerator(object):
             subtitle.text = self.__atom_subtitle
 
         if extensions:
-            for ext in self.__extensions.values() or []:
+            for _, ext in self.__loaded_extensions():
                 if ext.get('atom'):
                     ext['inst'].extend_atom(feed)
 
-        for entry in self.__feed_entries:
-            entry = entry.atom_entry()
-            feed.append(entry)
-
-        doc = etree.ElementTree(feed)
-        return feed, doc
+        return feed
 
     def atom_str(self, pretty=False, extensions=True, encoding='UTF-8',
-                 xml_declaration=True):
+                 xml_declaration=True, workers=None, compression=None):
         '''Generates an ATOM feed and returns the feed XML as string.
 
         :param pretty: If the feed should be split into multiple lines and
@@ -212,6 +1090,12 @@ class FeedGenerator(object):
         :param encoding: Encoding used in the  XML file (default: UTF-8).
         :param xml_declaration: If an XML declaration should be added to the
             output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz` while it is generated (default: no compression).
         :returns: String representation of the ATOM feed.
 
         **Return type:** The return type may vary between different Python
@@ -219,15 +1103,30 @@ class FeedGenerator(object):
         details have a look at the `lxml documentation
         <https://docs.python.org/3/library/xml.etree.elementtree.html#xml.etree.ElementTree.tostring>`_
         '''
+        if workers or self.__use_fragments():
+            pieces = self._iter_atom(extensions=extensions, pretty=pretty,
+                                     encoding=encoding,
+                                     xml_declaration=xml_declaration,
+                                     workers=workers)
+            return _join(_compress(pieces, compression))
         feed, doc = self._create_atom(extensions=extensions)
-        return etree.tostring(doc, pretty_print=pretty, encoding=encoding,
+        data = etree.tostring(doc, pretty_print=pretty, encoding=encoding,
                               xml_declaration=xml_declaration)
+        if compression:
+            return _join(_compress([data], compression))
+        return data
 
     def atom_file(self, filename, extensions=True, pretty=False,
-                  encoding='UTF-8', xml_declaration=True):
+                  encoding='UTF-8', xml_declaration=True, workers=None,
+                  compression=None, publish=False):
         '''Generates an ATOM feed and write the resulting XML to a file.
 
         :param filename: Name of file to write or a file-like object or a URL.
+            To write the feed to several files at once, pass a dictionary
+            mapping names of files or file-like objects to the compression
+            method used for each of them, e.g.
+            `{'feed.xml': None, 'feed.xml.gz': 'gzip'}`. The feed is
+            generated only once.
         :param extensions: Enable or disable the loaded extensions for the xml
             generation (default: enabled).
         :param pretty: If the feed should be split into multiple lines and
@@ -235,27 +1134,146 @@ class FeedGenerator(object):
         :param encoding: Encoding used in the  XML file (default: UTF-8).
         :param xml_declaration: If an XML declaration should be added to the
             output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz` while it is written (default: no compression).
+        :param publish: Write the feed to a temporary file next to the
+            target file first and atomically replace the target file only if
+            the content changed. Unchanged files are not touched. This only
+            works for files given by name (default: write files directly).
+        :returns: If publishing, True if any of the files changed, False
+            otherwise.
         '''
+        sinks = _sinks(filename, compression)
+        if workers or self.__use_fragments():
+            return _write(self._iter_atom(extensions=extensions, pretty=pretty,
+                                          encoding=encoding,
+                                          xml_declaration=xml_declaration,
+                                          workers=workers), sinks, publish)
         feed, doc = self._create_atom(extensions=extensions)
+        if isinstance(filename, dict) or compression or publish:
+            return _write([etree.tostring(doc, pretty_print=pretty,
+                                          encoding=encoding,
+                                          xml_declaration=xml_declaration)],
+                          sinks, publish)
         doc.write(filename, pretty_print=pretty, encoding=encoding,
                   xml_declaration=xml_declaration)
 
+    def _iter_atom(self, extensions=True, pretty=False, encoding='UTF-8',
+                   xml_declaration=True, workers=None):
+        '''Generates an ATOM feed piece by piece. Entries are created and
+        serialized one at a time.
+
+        :returns: Generator yielding the encoded parts of the feed.
+        '''
+        updated, default = self.__dates()
+        serializer = self._serializer('atom', extensions=extensions,
+                                      pretty=pretty, updated=updated)
+        return serializer.serialize(self.__feed_entries, encoding,
+                                    xml_declaration, workers, default)
+
+    def iter_atom(self, chunk_size=16384, extensions=True, pretty=False,
+                  encoding='UTF-8', xml_declaration=True, compression=None):
+        '''Generates an ATOM feed and returns an iterator over the encoded
+        XML. Entries are serialized only when the iterator advances, making
+        this suitable e.g. as body of a WSGI response::
+
+            >>> def application(environ, start_response):
+            ...     start_response('200 OK', [('Content-Type',
+            ...                                'application/atom+xml')])
+            ...     return fg.iter_atom()
+
+        Required fields are checked when this method is called, not on the
+        first iteration. Concatenating all chunks results in the same output
+        as :meth:`atom_str`.
+
+        :param chunk_size: Minimum size of the returned chunks in bytes. Only
+            the last chunk may be smaller. If set to `None` or `0`, the feed
+            header and every single entry are returned as separate chunks.
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz`, e.g. to send it with a matching `Content-Encoding`
+            (default: no compression).
+        :returns: Iterator yielding the feed as byte strings or, if the
+            encoding is `unicode`, as strings.
+        '''
+        pieces = self._iter_atom(extensions=extensions, pretty=pretty,
+                                 encoding=encoding,
+                                 xml_declaration=xml_declaration)
+        return _chunked(_compress(pieces, compression), chunk_size)
+
+    def atom_stream(self, fileobj, extensions=True, pretty=False,
+                    encoding='UTF-8', xml_declaration=True, workers=None):
+        '''Generates an ATOM feed and writes the resulting XML to a file-like
+        object while it is generated. Unlike :meth:`atom_file`, this does not
+        build the whole XML tree in memory. Instead, each entry is serialized
+        and discarded before the next one is created.
+
+        The output is identical to the output of :meth:`atom_str`.
+
+        :param fileobj: File-like object opened in binary mode.
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        '''
+        for chunk in self._iter_atom(extensions=extensions, pretty=pretty,
+                                     encoding=encoding,
+                                     xml_declaration=xml_declaration,
+                                     workers=workers):
+            fileobj.write(chunk)
+
     def _create_rss(self, extensions=True):
         '''Create an RSS feed xml structure containing all previously set
         fields.
 
         :returns: Tuple containing the feed root element and the element tree.
         '''
+        feed, channel = self._create_rss_head(extensions=extensions)
+
+        for entry in self.__feed_entries:
+            item = entry.rss_entry()
+            channel.append(item)
+
+        doc = etree.ElementTree(feed)
+        return feed, doc
+
+    def _create_rss_head(self, extensions=True, updated=None):
+        '''Create the RSS feed xml structure without any items.
+
+        :param updated: Modification date of the feed (default:
+                        :meth:`updated`).
+        :returns: Tuple containing the feed root element and the channel.
+        '''
+        if updated is None:
+            updated = self.updated()
         nsmap = dict()
         if extensions:
-            for ext in self.__extensions.values() or []:
+            for _, ext in self.__loaded_extensions():
                 if ext.get('rss'):
                     nsmap.update(ext['inst'].extend_ns())
 
         nsmap.update({'atom':  'http://www.w3.org/2005/Atom',
                       'content': 'http://purl.org/rss/1.0/modules/content/'})
 
-        feed = xml_elem('rss', version='2.0', nsmap=nsmap)
+        feed = xml_elem('rss', version='2.0',
+                        nsmap=self.__sorted_nsmap(nsmap))
         channel = xml_elem('channel', feed)
         if not (self.__rss_title and
                 self.__rss_link and
@@ -328,10 +1346,8 @@ class FeedGenerator(object):
         if self.__rss_language:
             language = xml_elem('language', channel)
             language.text = self.__rss_language
-        if self.__rss_lastBuildDate:
-            lastBuildDate = xml_elem('lastBuildDate', channel)
-
-            lastBuildDate.text = formatRFC2822(self.__rss_lastBuildDate)
+        lastBuildDate = xml_elem('lastBuildDate', channel)
+        lastBuildDate.text = formatRFC2822(updated)
         if self.__rss_managingEditor:
             managingEditor = xml_elem('managingEditor', channel)
             managingEditor.text = self.__rss_managingEditor
@@ -366,19 +1382,14 @@ class FeedGenerator(object):
             webMaster.text = self.__rss_webMaster
 
         if extensions:
-            for ext in self.__extensions.values() or []:
+            for _, ext in self.__loaded_extensions():
                 if ext.get('rss'):
                     ext['inst'].extend_rss(feed)
 
-        for entry in self.__feed_entries:
-            item = entry.rss_entry()
-            channel.append(item)
-
-        doc = etree.ElementTree(feed)
-        return feed, doc
+        return feed, channel
 
     def rss_str(self, pretty=False, extensions=True, encoding='UTF-8',
-                xml_declaration=True):
+                xml_declaration=True, workers=None, compression=None):
         '''Generates an RSS feed and returns the feed XML as string.
 
         :param pretty: If the feed should be split into multiple lines and
@@ -388,6 +1399,12 @@ class FeedGenerator(object):
         :param encoding: Encoding used in the  XML file (default: UTF-8).
         :param xml_declaration: If an XML declaration should be added to the
             output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz` while it is generated (default: no compression).
         :returns: String representation of the RSS feed.
 
         **Return type:** The return type may vary between different Python
@@ -395,15 +1412,30 @@ class FeedGenerator(object):
         details have a look at the `lxml documentation
         <https://docs.python.org/3/library/xml.etree.elementtree.html#xml.etree.ElementTree.tostring>`_
         '''
+        if workers or self.__use_fragments():
+            pieces = self._iter_rss(extensions=extensions, pretty=pretty,
+                                    encoding=encoding,
+                                    xml_declaration=xml_declaration,
+                                    workers=workers)
+            return _join(_compress(pieces, compression))
         feed, doc = self._create_rss(extensions=extensions)
-        return etree.tostring(doc, pretty_print=pretty, encoding=encoding,
+        data = etree.tostring(doc, pretty_print=pretty, encoding=encoding,
                               xml_declaration=xml_declaration)
+        if compression:
+            return _join(_compress([data], compression))
+        return data
 
     def rss_file(self, filename, extensions=True, pretty=False,
-                 encoding='UTF-8', xml_declaration=True):
+                 encoding='UTF-8', xml_declaration=True, workers=None,
+                 compression=None, publish=False):
         '''Generates an RSS feed and write the resulting XML to a file.
 
         :param filename: Name of file to write or a file-like object or a URL.
+            To write the feed to several files at once, pass a dictionary
+            mapping names of files or file-like objects to the compression
+            method used for each of them, e.g.
+            `{'feed.xml': None, 'feed.xml.gz': 'gzip'}`. The feed is
+            generated only once.
         :param extensions: Enable or disable the loaded extensions for the xml
             generation (default: enabled).
         :param pretty: If the feed should be split into multiple lines and
@@ -411,11 +1443,338 @@ class FeedGenerator(object):
         :param encoding: Encoding used in the  XML file (default: UTF-8).
         :param xml_declaration: If an XML declaration should be added to the
             output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz` while it is written (default: no compression).
+        :param publish: Write the feed to a temporary file next to the
+            target file first and atomically replace the target file only if
+            the content changed. Unchanged files are not touched. This only
+            works for files given by name (default: write files directly).
+        :returns: If publishing, True if any of the files changed, False
+            otherwise.
         '''
+        sinks = _sinks(filename, compression)
+        if workers or self.__use_fragments():
+            return _write(self._iter_rss(extensions=extensions, pretty=pretty,
+                                         encoding=encoding,
+                                         xml_declaration=xml_declaration,
+                                         workers=workers), sinks, publish)
         feed, doc = self._create_rss(extensions=extensions)
+        if isinstance(filename, dict) or compression or publish:
+            return _write([etree.tostring(doc, pretty_print=pretty,
+                                          encoding=encoding,
+                                          xml_declaration=xml_declaration)],
+                          sinks, publish)
         doc.write(filename, pretty_print=pretty, encoding=encoding,
                   xml_declaration=xml_declaration)
 
+    def _iter_rss(self, extensions=True, pretty=False, encoding='UTF-8',
+                  xml_declaration=True, workers=None):
+        '''Generates an RSS feed piece by piece. Items are created and
+        serialized one at a time.
+
+        :returns: Generator yielding the encoded parts of the feed.
+        '''
+        serializer = self._serializer('rss', extensions=extensions,
+                                      pretty=pretty)
+        return serializer.serialize(self.__feed_entries, encoding,
+                                    xml_declaration, workers)
+
+    def iter_rss(self, chunk_size=16384, extensions=True, pretty=False,
+                 encoding='UTF-8', xml_declaration=True, compression=None):
+        '''Generates an RSS feed and returns an iterator over the encoded XML.
+        Items are serialized only when the iterator advances, making this
+        suitable e.g. as body of a WSGI response.
+
+        Required fields are checked when this method is called, not on the
+        first iteration. Concatenating all chunks results in the same output
+        as :meth:`rss_str`.
+
+        :param chunk_size: Minimum size of the returned chunks in bytes. Only
+            the last chunk may be smaller. If set to `None` or `0`, the feed
+            header and every single item are returned as separate chunks.
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :param compression: Compress the feed using `gzip`, `deflate` or
+            `xz`, e.g. to send it with a matching `Content-Encoding`
+            (default: no compression).
+        :returns: Iterator yielding the feed as byte strings or, if the
+            encoding is `unicode`, as strings.
+        '''
+        pieces = self._iter_rss(extensions=extensions, pretty=pretty,
+                                encoding=encoding,
+                                xml_declaration=xml_declaration)
+        return _chunked(_compress(pieces, compression), chunk_size)
+
+    def rss_stream(self, fileobj, extensions=True, pretty=False,
+                   encoding='UTF-8', xml_declaration=True, workers=None):
+        '''Generates an RSS feed and writes the resulting XML to a file-like
+        object while it is generated. Unlike :meth:`rss_file`, this does not
+        build the whole XML tree in memory. Instead, each item is serialized
+        and discarded before the next one is created.
+
+        The output is identical to the output of :meth:`rss_str`.
+
+        :param fileobj: File-like object opened in binary mode.
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :param workers: Number of worker processes or a
+            `concurrent.futures.Executor` used to serialize the entries in
+            parallel. The output is identical to the serial output
+            (default: serialize serially).
+        '''
+        for chunk in self._iter_rss(extensions=extensions, pretty=pretty,
+                                    encoding=encoding,
+                                    xml_declaration=xml_declaration,
+                                    workers=workers):
+            fileobj.write(chunk)
+
+    def render(self, formats=('atom', 'rss'), extensions=True, pretty=False,
+               encoding='UTF-8', xml_declaration=True):
+        '''Generates the feed in several formats in a single pass. Default
+        dates are determined once and every entry is visited once and
+        serialized to all formats before the next one, so formatted dates and
+        other data cached by the entry are shared by all formats. This is
+        considerably faster than generating the formats one after another.
+        The output is identical to the output of :meth:`atom_str` and
+        :meth:`rss_str`::
+
+            >>> feeds = fg.render()
+            >>> fg.render({'atom': 'feed.atom', 'rss': 'feed.rss'})
+
+        :param formats: Formats to generate, `atom` and/or `rss`. If this is
+            a dictionary mapping the formats to names of files or file-like
+            objects, the feeds are written to these files while they are
+            generated.
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :returns: Dictionary mapping the formats to the feeds as strings or
+            None if the feeds are written to files.
+        '''
+        for fmt in formats:
+            if fmt not in ('atom', 'rss'):
+                raise ValueError('Invalid format %s' % fmt)
+        updated, default = self.__dates()
+        if self.__use_fragments():
+            return self.__render_fragments(formats, extensions, pretty,
+                                           encoding, xml_declaration, updated,
+                                           default)
+
+        fmts = list(formats)
+        roots = []
+        containers = []
+        for fmt in fmts:
+            if fmt == 'atom':
+                root = container = self._create_atom_head(
+                        extensions=extensions, updated=updated)
+            else:
+                root, container = self._create_rss_head(
+                        extensions=extensions, updated=updated)
+            roots.append(root)
+            containers.append(container)
+        for entry in self.__feed_entries:
+            elements = entry._create_entries(fmts, share=extensions,
+                                             default=default)
+            for container, element in zip(containers, elements):
+                container.append(element)
+
+        if not isinstance(formats, dict):
+            return OrderedDict(
+                    (fmt, etree.tostring(etree.ElementTree(root),
+                                         pretty_print=pretty,
+                                         encoding=encoding,
+                                         xml_declaration=xml_declaration))
+                    for fmt, root in zip(fmts, roots))
+        for fmt, root in zip(fmts, roots):
+            etree.ElementTree(root).write(formats[fmt], pretty_print=pretty,
+                                          encoding=encoding,
+                                          xml_declaration=xml_declaration)
+
+    def __render_fragments(self, formats, extensions, pretty, encoding,
+                           xml_declaration, updated, default):
+        '''Generate the feed in several formats at once from the serialized
+        fragments of the entries. See :meth:`render`.
+        '''
+        streams = []
+        for fmt in formats:
+            serializer = self._serializer(fmt, extensions=extensions,
+                                          pretty=pretty, updated=updated)
+            encoder, head = serializer.encoder(encoding, xml_declaration)
+            streams.append((fmt, serializer, encoder, head))
+        pieces = _serialize_formats(streams, self.__feed_entries, default)
+
+        if not isinstance(formats, dict):
+            feeds = OrderedDict((fmt, []) for fmt in formats)
+            for fmt, piece in pieces:
+                feeds[fmt].append(piece)
+            return OrderedDict((fmt, _join(feed))
+                               for fmt, feed in feeds.items())
+        with contextlib.ExitStack() as stack:
+            files = {fmt: stack.enter_context(_open(filename))
+                     for fmt, filename in formats.items()}
+            for fmt, piece in pieces:
+                files[fmt].write(piece)
+
+    def paged_files(self, filename, url, page_size=100, fmt='atom',
+                    archive=False, current_filename=None, current_url=None,
+                    skip_archived=True, extensions=True, pretty=False,
+                    encoding='UTF-8', xml_declaration=True, compression=None,
+                    publish=False):
+        '''Split the feed into several documents as described in RFC 5005
+        and write them to files. The documents are written one after
+        another and entries are serialized one at a time, so only a single
+        entry is held as XML in memory at once.
+
+        Paged feeds (default) split the entries in the order of the feed
+        into pages of `page_size` entries. The first page contains the first
+        entries of the feed. Every page links to the `first`, `last`,
+        `previous` and `next` pages.
+
+        Archived feeds (`archive=True`) expect the newest entries first, as
+        :meth:`add_entry` adds them. The oldest entries are put into archive
+        documents of exactly `page_size` entries, numbered from the oldest.
+        The remaining newest entries form the subscription document which
+        links to the newest archive using `prev-archive`. Archive documents
+        contain an `fh:archive` element and link to the subscription
+        document using `current` and to the previous archive using
+        `prev-archive`. They link to no newer archive, so they never change
+        once written and existing archive files are skipped unless
+        `skip_archived` is disabled.
+
+        Links of the feed with the relations used for paging and `self` are
+        replaced by the links of each document::
+
+            >>> fg.paged_files('archive/{page}.xml',
+            ...                'http://example.com/archive/{page}.xml',
+            ...                archive=True, current_filename='feed.xml',
+            ...                current_url='http://example.com/feed.xml')
+
+        :param filename: Name of the file of each page. The placeholder
+            `{page}` is replaced by the page number, starting with 1.
+        :param url: URL of each page containing the placeholder `{page}`.
+        :param page_size: Number of entries per page (default: 100).
+        :param fmt: Format of the documents, `atom` or `rss`.
+        :param archive: Write an archived feed instead of a paged feed.
+        :param current_filename: Name of the file of the subscription
+            document of an archived feed.
+        :param current_url: URL of the subscription document of an archived
+            feed.
+        :param skip_archived: If archive documents whose files already exist
+            are skipped (default: enabled).
+        :param extensions: Enable or disable the loaded extensions for the xml
+            generation (default: enabled).
+        :param pretty: If the feed should be split into multiple lines and
+            properly indented.
+        :param encoding: Encoding used in the  XML file (default: UTF-8).
+        :param xml_declaration: If an XML declaration should be added to the
+            output (Default: enabled).
+        :param compression: Compress the documents using `gzip`, `deflate`
+            or `xz` (default: no compression).
+        :param publish: Replace files atomically and only if their content
+            changed. See :meth:`atom_file`.
+        :returns: List of the names of the files which were written. If
+            publishing, only the files which changed are listed.
+        '''
+        if fmt not in ('atom', 'rss'):
+            raise ValueError('Invalid format %s' % fmt)
+        if page_size < 1:
+            raise ValueError('Invalid page size %s' % page_size)
+        if archive and not (current_filename and current_url):
+            raise ValueError('Archived feeds need a subscription document')
+        updated, default = self.__dates()
+        entries = list(self.__feed_entries)
+        pages = []
+        if archive:
+            count = max(0, (len(entries) - 1) // page_size)
+            for page in range(1, count + 1):
+                end = len(entries) - (page - 1) * page_size
+                links = [('current', current_url)]
+                if page > 1:
+                    links.append(('prev-archive', url.format(page=page - 1)))
+                pages.append((filename.format(page=page),
+                              url.format(page=page), links, True,
+                              entries[end - page_size:end]))
+            links = [('prev-archive', url.format(page=count))] if count else []
+            pages.append((current_filename, current_url, links, False,
+                          entries[:len(entries) - count * page_size]))
+        else:
+            count = max(1, -(-len(entries) // page_size))
+            for page in range(1, count + 1):
+                links = [('first', url.format(page=1)),
+                         ('last', url.format(page=count))]
+                if page > 1:
+                    links.append(('previous', url.format(page=page - 1)))
+                if page < count:
+                    links.append(('next', url.format(page=page + 1)))
+                pages.append((filename.format(page=page),
+                              url.format(page=page), links, False,
+                              entries[(page - 1) * page_size:
+                                      page * page_size]))
+
+        written = []
+        for name, page_url, links, archived, page_entries in pages:
+            if archived and skip_archived and os.path.exists(name):
+                continue
+            serializer = self.__page_serializer(fmt, page_url, links,
+                                                archived, extensions, pretty,
+                                                updated)
+            changed = _write(serializer.serialize(page_entries, encoding,
+                                                  xml_declaration,
+                                                  default=default),
+                             [(name, compression)], publish)
+            if changed or not publish:
+                written.append(name)
+        return written
+
+    def __page_serializer(self, fmt, url, links, archived, extensions,
+                          pretty, updated):
+        '''Create a serializer for a document of a paged or archived feed.
+        See :meth:`paged_files`.
+
+        :param fmt: Format of the feed, either `atom` or `rss`.
+        :param url: URL of the document.
+        :param links: List of tuples of relations and URLs to link to.
+        :param archived: If the document is an archive document.
+        :param extensions: If the loaded extensions should be used.
+        :param pretty: If the output should be pretty printed.
+        :param updated: Modification date of the feed.
+        :returns: Serializer for the document.
+        '''
+        if fmt == 'atom':
+            root = container = self._create_atom_head(extensions=extensions,
+                                                      updated=updated)
+            tag = 'link'
+        else:
+            root, container = self._create_rss_head(extensions=extensions,
+                                                    updated=updated)
+            tag = '{http://www.w3.org/2005/Atom}link'
+        for link in container.findall(tag):
+            if link.get('rel') in _PAGE_RELS:
+                container.remove(link)
+        for rel, href in [('self', url)] + links:
+            xml_elem(tag, container, href=href, rel=rel)
+        if archived:
+            xml_elem('{%s}archive' % _FH_NS, container, nsmap={'fh': _FH_NS})
+        return _Serializer(fmt, root, container, pretty)
+
     def title(self, title=None):
         '''Get or set the title value of the feed. It should contain a human
         readable title for the feed. Often the same as the title of the
@@ -455,20 +1814,25 @@ class FeedGenerator(object):
         This will set both atom:updated and rss:lastBuildDate.
 
         Default value
-            If not set, updated has as value the current date and time.
+            If not set, updated has as value the date and time at which the
+            feed is generated. It is determined anew for every generation and
+            never stored, so reading it returns the current time. Feeds which
+            are generated deterministically derive it from their entries.
 
         :param updated: The modification date.
         :returns: Modification date as datetime.datetime
         '''
         if updated is not None:
             if isinstance(updated, string_types):
-                updated = dateutil.parser.parse(updated)
+                updated = parse_date(updated)
             if not isinstance(updated, datetime):
                 raise ValueError('Invalid datetime format')
             if updated.tzinfo is None:
                 raise ValueError('Datetime object has no timezone info')
             self.__atom_updated = updated
             self.__rss_lastBuildDate = updated
+        elif self.__atom_updated is None:
+            return self.__dates()[0]
 
         return self.__atom_updated
 
@@ -483,7 +1847,8 @@ class FeedGenerator(object):
         This will set both atom:updated and rss:lastBuildDate.
 
         Default value
-            If not set, lastBuildDate has as value the current date and time.
+            If not set, lastBuildDate has as value the date and time at which
+            the feed is generated. See :meth:`updated`.
 
         :param lastBuildDate: The modification date.
         :returns: Modification date as datetime.datetime
@@ -887,7 +2252,7 @@ class FeedGenerator(object):
         '''
         if pubDate is not None:
             if isinstance(pubDate, string_types):
-                pubDate = dateutil.parser.parse(pubDate)
+                pubDate = parse_date(pubDate)
             if not isinstance(pubDate, datetime):
                 raise ValueError('Invalid datetime format')
             if pubDate.tzinfo is None:
@@ -1017,29 +2382,135 @@ class FeedGenerator(object):
         if feedEntry is None:
             feedEntry = FeedEntry()
 
-        version = sys.version_info[0]
+        # Register extensions. They are instantiated once they are used.
+        feedEntry._add_extensions(self.__entry_extensions())
 
-        if version == 2:
-            items = self.__extensions.iteritems()
-        else:
-            items = self.__extensions.items()
-
-        # Try to load extensions:
-        for extname, ext in items:
-            try:
-                feedEntry.register_extension(extname,
-                                             ext['extension_class_entry'],
-                                             ext['atom'],
-                                             ext['rss'])
-            except ImportError:
-                pass
+        if self.__serializers is not None:
+            feedEntry.fragment_cache(True)
 
-        if order == 'prepend':
-            self.__feed_entries.insert(0, feedEntry)
-        else:
-            self.__feed_entries.append(feedEntry)
+        self.__feed_entries[feedEntry] = None
+        self.__feed_entries.move_to_end(feedEntry, last=order != 'prepend')
+        feedEntry._track(self.__tracker)
+        self.__entries_modified()
         return feedEntry
 
+    def add_entries(self, entries, fields=None, order='prepend'):
+        '''Create and add several entries at once from plain data, e.g. from
+        the result set of a database query. This is faster than calling the
+        setters: Common fields like ids, titles, dates, links and authors are
+        stored directly, dictionaries are validated once for each set of keys
+        and the feed is updated once for all entries. Other fields are passed
+        to their setters. See the `add_entries` benchmark of `feedgen.bench`.
+
+        Each entry is described by a dictionary mapping names of FeedEntry
+        methods to the values to set. A value is passed to the method as
+        keyword arguments if it is a dictionary, as positional arguments if it
+        is a tuple and as single argument otherwise. The names of loaded
+        extensions map to dictionaries of extension methods and values which
+        are handled in the same way.
+
+        Loaded extensions are registered for all new entries at once. Their
+        instances are created only if the extension is used by an entry.
+
+        All entries are created before any of them is added to the feed. If
+        the data of an entry is invalid, a ValueError is raised and the feed
+        stays unchanged.
+
+        :param entries: Iterable of dictionaries or, if `fields` is set, of
+                        sequences of values.
+        :param fields: Names of the methods the values of each sequence in
+                       `entries` are passed to.
+        :param order: If `append` is chosen, the entries are appended to the
+                      feed. If `prepend` is chosen, the entries are inserted
+                      at the beginning of the feed. The order of the entries
+                      themselves is retained in both cases (default:
+                      `prepend`).
+        :returns: List of the created FeedEntry objects.
+
+        Example::
+
+            >>> fg.add_entries([
+            ...     {'id': 'http://example.com/1', 'title': 'First',
+            ...      'link': {'href': 'http://example.com/1'},
+            ...      'enclosure': ('http://example.com/1.mp3', 0,
+            ...                    'audio/mpeg'),
+            ...      'podcast': {'itunes_duration': '12:34'}}])
+
+            >>> fg.add_entries(cursor.execute('SELECT id, title FROM x'),
+            ...                fields=('id', 'title'))
+        '''
+        extensions = self.__entry_extensions()
+        setters = {}
+        created = []
+        for data in entries:
+            if fields is not None:
+                data = zip(fields, data)
+            elif isinstance(data, dict):
+                data = data.items()
+            feedEntry = FeedEntry()
+            feedEntry._add_extensions(extensions)
+            for name, value in data:
+                setter = setters.get(name)
+                if setter is None:
+                    setter = setters[name] = self.__entry_setter(name)
+                try:
+                    setter(feedEntry, value)
+                except (AttributeError, TypeError, ValueError) as e:
+                    raise ValueError('Invalid %s of entry %d: %s' %
+                                     (name, len(created), e))
+            if self.__serializers is not None:
+                feedEntry.fragment_cache(True)
+            created.append(feedEntry)
+
+        # The new entries are not part of the feed yet, so they need to be
+        # moved only to prepend them
+        self.__feed_entries.update(dict.fromkeys(created))
+        if order == 'prepend':
+            for feedEntry in reversed(created):
+                self.__feed_entries.move_to_end(feedEntry, last=False)
+        for feedEntry in created:
+            feedEntry._track(self.__tracker)
+        self.__entries_modified()
+        return created
+
+    def __entry_extensions(self):
+        '''Get the registry of entry extensions for new entries. It is shared
+        by all entries until an extension is loaded.
+
+        :returns: Dictionary mapping namespaces to dictionaries containing the
+                  entry extension class and the atom and rss flags.
+        '''
+        if self.__entry_registry is None:
+            self.__entry_registry = {}
+            for name, ext in self.__loaded_extensions():
+                extension_class_entry = ext['extension_class_entry']
+                if extension_class_entry:
+                    self.__entry_registry[name] = {
+                            'extension_class_entry': extension_class_entry,
+                            'atom': ext['atom'],
+                            'rss': ext['rss']}
+        return self.__entry_registry
+
+    def __entry_setter(self, name):
+        '''Get a function setting a value of an entry by the name of a
+        FeedEntry method or an extension.
+
+        :param name: Name of the FeedEntry method or the extension.
+        :returns: Function taking the entry and the value to set.
+        '''
+        if name in self.__extensions:
+            def setter(entry, values):
+                extension = getattr(entry, name)
+                for method, value in values.items():
+                    if method.startswith('_'):
+                        raise ValueError('Invalid method %s' % method)
+                    call_setter(getattr(extension, method), value)
+            return setter
+        if name.startswith('_') or not callable(getattr(FeedEntry, name,
+                                                        None)):
+            raise ValueError('Invalid entry field %s' % name)
+        return FeedEntry._loader(name)
+
     def add_item(self, item=None):
         '''This method will add a new item to the feed. If the item argument is
         omitted a new FeedEntry object is created automatically. This is just
@@ -1052,6 +2523,14 @@ class FeedGenerator(object):
         automatically create the FeedEntry objects.
 
         This method takes both a single FeedEntry object or a list of objects.
+        Entries are appended to the feed. An entry can be part of a feed only
+        once. Adding it again moves it to the end of the feed.
+
+        The returned list is reused until entries are added, moved or removed,
+        so indexing it repeatedly is cheap. Modifying it in place, e.g. by
+        sorting it, is deprecated. Such modifications are still applied to the
+        feed, but take time proportional to the number of entries. Use
+        `entry(entries, replace=True)` and :meth:`remove_entry` instead.
 
         :param entry: FeedEntry object or list of FeedEntry objects.
         :returns: List ob all feed entries.
@@ -1060,43 +2539,91 @@ class FeedGenerator(object):
             if not isinstance(entry, list):
                 entry = [entry]
             if replace:
-                self.__feed_entries = []
-
-            version = sys.version_info[0]
-
-            if version == 2:
-                items = self.__extensions.iteritems()
-            else:
-                items = self.__extensions.items()
+                for e in self.__feed_entries:
+                    e._track(self.__tracker, False)
+                self.__feed_entries = OrderedDict()
 
-            # Try to load extensions:
+            # Register extensions. They are instantiated once they are used.
+            extensions = self.__entry_extensions()
             for e in entry:
-                for extname, ext in items:
-                    try:
-                        e.register_extension(extname,
-                                             ext['extension_class_entry'],
-                                             ext['atom'], ext['rss'])
-                    except ImportError:
-                        pass
+                e._add_extensions(extensions)
+                if self.__serializers is not None:
+                    e.fragment_cache(True)
+                self.__feed_entries[e] = None
+                self.__feed_entries.move_to_end(e)
+                e._track(self.__tracker)
+            self.__entries_modified()
+        entries = self.__entry_list
+        if entries is None:
+            entries = self.__entry_list = _EntryList(self.__feed_entries,
+                                                     self.__apply_entry_list)
+        return entries
+
+    def __entries_modified(self):
+        '''Called whenever entries were added, moved or removed.
+        '''
+        # Entries may have been moved
+        self.__tracker.changed()
+        if self.__entry_list is not None:
+            self.__entry_list._apply = None
+            self.__entry_list = None
+
+    def __apply_entry_list(self, entries):
+        '''Apply an in-place modification of the list returned by entry() to
+        the feed.
 
-            self.__feed_entries += entry
-        return self.__feed_entries
+        :param entries: The modified list.
+        '''
+        self.entry(list(entries), replace=True)
+        if len(entries) != len(self.__feed_entries):
+            # Entries were added twice. They are part of the feed only once.
+            list.__setitem__(entries, slice(None), self.__feed_entries)
+        entries._apply = self.__apply_entry_list
+        self.__entry_list = entries
 
     def item(self, item=None, replace=False):
         '''Get or set feed items. This is just another name for entry(...)
         '''
         return self.entry(item, replace)
 
+    def __entry_by_id(self, id):
+        '''Find the first entry with a given id.
+
+        :param id: Id of the entry.
+        :returns: The entry or None if no entry has this id.
+        '''
+        entries = self.__tracker.ids.get(id)
+        if not entries:
+            return None
+        if len(entries) == 1:
+            return entries[0]
+        # Several entries share the id. Find the first one in the feed.
+        entries = set(entries)
+        return next(e for e in self.__feed_entries if e in entries)
+
     def remove_entry(self, entry):
-        '''Remove a single entry from the feed. This method accepts both the
-        FeedEntry object to remove or the index of the entry as argument.
+        '''Remove a single entry from the feed. This method accepts the
+        FeedEntry object to remove, the id of the entry or the index of the
+        entry as argument. If several entries have the same id, the first one
+        is removed.
 
-        :param entry: Entry or index of entry to remove.
+        Removing an entry by object or by id takes constant time on average
+        while removing an entry by index takes time proportional to the number
+        of entries in the feed.
+
+        :param entry: Entry, id of entry or index of entry to remove.
         '''
-        if isinstance(entry, FeedEntry):
-            self.__feed_entries.remove(entry)
-        else:
-            self.__feed_entries.pop(entry)
+        if isinstance(entry, string_types):
+            entry = self.__entry_by_id(entry)
+            if entry is None:
+                raise ValueError('No entry with this id')
+        elif not isinstance(entry, FeedEntry):
+            entry = self.entry()[entry]
+        if entry not in self.__feed_entries:
+            raise ValueError('Entry is not part of the feed')
+        del self.__feed_entries[entry]
+        entry._track(self.__tracker, False)
+        self.__entries_modified()
 
     def remove_item(self, item):
         '''Remove a single item from the feed. This is another name for
@@ -1154,6 +2681,8 @@ class FeedGenerator(object):
 
         # Load extension
         extinst = extension_class_feed()
+        if isinstance(extinst, BaseExtension):
+            track(extinst, self.__tracker.changed)
         setattr(self, namespace, extinst)
 
         # `load_extension` registry
@@ -1165,12 +2694,15 @@ class FeedGenerator(object):
                 'rss': rss
                 }
 
-        # Try to load the extension for already existing entries:
-        for entry in self.__feed_entries:
-            try:
-                entry.register_extension(namespace,
-                                         extension_class_entry,
-                                         atom,
-                                         rss)
-            except ImportError:
-                pass
+        self.__entry_registry = None
+
+        # Register the extension for already existing entries:
+        if extension_class_entry:
+            extensions = {namespace: {
+                    'extension_class_entry': extension_class_entry,
+                    'atom': atom,
+                    'rss': rss}}
+            if self.__deterministic:
+                extensions = self.__entry_extensions()
+            for entry in self.__feed_entries:
+                entry._add_extensions(extensions)
@@ -8,12 +8,21 @@
     :copyright: 2013, Lars Kiesow <lkiesow@uos.de>
     :license: FreeBSD and LGPL, see license.* for more details.
 '''
-import locale
-import sys
-import lxml  # nosec - we configure a safe parser below
+import functools
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime
 
-# Configure a safe parser which does not allow XML entity expansion
-parser = lxml.etree.XMLParser(
+import dateutil.parser
+import dateutil.tz
+import lxml.etree  # nosec - we configure a safe parser below
+
+
+def _create_parser():
+    # Configure a safe parser which does not allow XML entity expansion
+    return lxml.etree.XMLParser(
         attribute_defaults=False,
         dtd_validation=False,
         load_dtd=False,
@@ -24,8 +33,82 @@ parser = lxml.etree.XMLParser(
         huge_tree=False)
 
 
+# Parser kept for compatibility. It must not be used by several threads at
+# once. Use xml_parser() instead.
+parser = _create_parser()
+
+_local = threading.local()
+
+
+def xml_parser():
+    '''Get the safe XML parser of the current thread. lxml parsers must not
+    be used by several threads at once, so every thread gets its own one.
+
+    :returns: The XML parser.
+    '''
+    try:
+        return _local.parser
+    except AttributeError:
+        _local.parser = _create_parser()
+        return _local.parser
+
+
 def xml_fromstring(xmlstring):
-    return lxml.etree.fromstring(xmlstring, parser)  # nosec - safe parser
+    safe = xml_parser()
+    return lxml.etree.fromstring(xmlstring, safe)  # nosec - safe parser
+
+
+_cached_xml_text = None
+
+
+def xml_fragment(xmlstring):
+    '''Parse XML content which is embedded into a feed, e.g. xhtml content of
+    an entry.
+
+    :param xmlstring: The XML to parse.
+    :returns: The parsed element.
+    '''
+    return xml_fromstring(xmlstring)
+
+
+def _serialized_fragment(xmlstring):
+    '''Parse XML content and serialize the parsed element again.'''
+    return lxml.etree.tostring(xml_fromstring(xmlstring), encoding='unicode')
+
+
+def xml_text(xmlstring):
+    '''Get XML content which is embedded into a feed in the form it is
+    serialized in. If the XML cache is enabled, the string is parsed and
+    serialized only once and the cached text is returned afterwards.
+
+    :param xmlstring: The XML to embed.
+    :returns: The serialized element or None if the cache is disabled.
+    '''
+    if _cached_xml_text is None:
+        return None
+    return _cached_xml_text(xmlstring)
+
+
+def xml_cache(maxsize=None):
+    '''Get or set the size of the cache for XML content. If enabled, xhtml
+    and XML content and summaries of entries are parsed and validated when
+    they are set. The serialized content is cached and inserted as text
+    whenever an ATOM feed is generated instead of parsing it and serializing
+    the parsed tree again. This speeds up generating feeds with large xhtml
+    content repeatedly. Note that cached content is not indented if the feed
+    is pretty printed. The cache is disabled by default.
+
+    :param maxsize: Maximum number of cached XML strings, 0 disables the
+                    cache.
+    :returns: Maximum number of cached XML strings.
+    '''
+    global _cached_xml_text
+    if maxsize is not None:
+        _cached_xml_text = functools.lru_cache(maxsize)(
+            _serialized_fragment) if maxsize > 0 else None
+    if _cached_xml_text is None:
+        return 0
+    return _cached_xml_text.cache_info().maxsize
 
 
 def xml_elem(name, parent=None, **kwargs):
@@ -49,10 +132,6 @@ def ensure_format(val, allowed, required, allowed_values=None, defaults=None):
     '''
     if not val:
         return []
-    if allowed_values is None:
-        allowed_values = {}
-    if defaults is None:
-        defaults = {}
     # Make sure that we have a list of dicts. Even if there is only one.
     if not isinstance(val, list):
         val = [val]
@@ -60,37 +139,213 @@ def ensure_format(val, allowed, required, allowed_values=None, defaults=None):
         if not isinstance(elem, dict):
             raise ValueError('Invalid data (value is no dictionary)')
         # Set default values
+        if defaults:
+            for k, v in defaults.items():
+                elem.setdefault(k, v)
+        keys = set(elem)
+        if not keys <= allowed:
+            raise ValueError('Data contains invalid keys')
+        if not keys >= required:
+            raise ValueError('Data contains not all required keys')
+        if allowed_values:
+            for k, v in allowed_values.items():
+                if elem.get(k) and not elem[k] in v:
+                    raise ValueError('Invalid value for %s' % k)
+    return val
 
-        version = sys.version_info[0]
 
-        if version == 2:
-            items = defaults.iteritems()
-        else:
-            items = defaults.items()
+def call_setter(method, value):
+    '''Call a setter with a value. Dictionaries are passed as keyword
+    arguments, tuples as positional arguments.
 
-        for k, v in items:
-            elem[k] = elem.get(k, v)
-        if not set(elem.keys()) <= allowed:
-            raise ValueError('Data contains invalid keys')
-        if not set(elem.keys()) >= required:
-            raise ValueError('Data contains not all required keys')
+    :param method: The method to call.
+    :param value: The value to pass to the method.
+    :returns: The return value of the method.
+    '''
+    if isinstance(value, dict):
+        return method(**value)
+    if isinstance(value, tuple):
+        return method(*value)
+    return method(value)
 
-        if version == 2:
-            values = allowed_values.iteritems()
-        else:
-            values = allowed_values.items()
 
-        for k, v in values:
-            if elem.get(k) and not elem[k] in v:
-                raise ValueError('Invalid value for %s' % k)
-    return val
+# Attributes of extensions which are not part of their data
+_IGNORED_ATTRIBUTES = frozenset(('_revision', '_listener'))
+
+# Types whose representation is already canonical
+_SCALAR_TYPES = frozenset((str, bytes, int, float, bool, type(None)))
+
+
+def _scalar(value):
+    return repr(value) if type(value) in _SCALAR_TYPES else _canonical(value)
+
+
+def _canonical(value):
+    '''Get a text representation of data which is the same for equal data
+    in every process. See :func:`fingerprint`.
+    '''
+    if type(value) in _SCALAR_TYPES:
+        return repr(value)
+    # Most keys and items are scalars, spare the calls for them
+    if isinstance(value, dict):
+        return '{%s}' % ','.join(sorted(
+            '%s:%s' % (_scalar(k), _scalar(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return '{%s}' % ','.join(sorted(_scalar(v) for v in value))
+    if isinstance(value, (list, tuple)):
+        return '[%s]' % ','.join(map(_scalar, value))
+    if isinstance(value, datetime):
+        return 'datetime(%s)' % value.isoformat()
+    if isinstance(value, type):
+        return '%s.%s' % (value.__module__, value.__qualname__)
+    state = getattr(value, '__dict__', None)
+    if state is not None:
+        # Unset attributes are None and left out
+        return '%s(%s)' % (_canonical(type(value)), _canonical(
+            {k: v for k, v in state.items()
+             if v is not None and k not in _IGNORED_ATTRIBUTES}))
+    return repr(value)
+
+
+def fingerprint(value):
+    '''Get a digest of data like strings, numbers, dates and dictionaries,
+    lists, tuples and sets of them. Equal data has the same digest in every
+    process. The order of dictionaries and sets does not matter. Other
+    objects, e.g. extensions, are represented by their class and attributes.
+
+    :param value: The data.
+    :returns: The SHA-256 digest as bytes.
+    '''
+    return hashlib.sha256(_canonical(value).encode('utf-8')).digest()
+
+
+_RFC2822_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_RFC2822_MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul',
+                   'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
 
 
 def formatRFC2822(date):
-    '''Make sure the locale setting do not interfere with the time format.
+    '''Format a date as required by RFC 2822. The names of days and months
+    are always English and the process locale is never touched, which makes
+    this safe to use from several threads at once.
+
+    :param date: The datetime.datetime object to format.
+    :returns: The formatted date, e.g. `Wed, 01 Jan 2020 12:00:00 +0100`.
+    '''
+    offset = date.utcoffset()
+    if offset is None:
+        zone = ''
+    else:
+        sign = '+'
+        if offset.days < 0:
+            sign = '-'
+            offset = -offset
+        minutes, seconds = divmod(offset.seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        zone = '%s%02d%02d' % (sign, hours, minutes)
+        if offset.microseconds:
+            zone += '%02d.%06d' % (seconds, offset.microseconds)
+        elif seconds:
+            zone += '%02d' % seconds
+    return '%s, %02d %s %d %02d:%02d:%02d %s' % (
+            _RFC2822_DAYS[date.weekday()], date.day,
+            _RFC2822_MONTHS[date.month], date.year,
+            date.hour, date.minute, date.second, zone)
+
+
+_RFC3339 = re.compile(r'(\d{4})-(\d\d)-(\d\d)[Tt ](\d\d):(\d\d):(\d\d)'
+                      r'(?:\.(\d{1,6}))?(?:([Zz])|([+-])(\d\d):(\d\d))?\Z')
+_RFC2822 = re.compile(r'(?:(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun), )?(\d\d?) '
+                      r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) '
+                      r'(\d{4}) (\d\d):(\d\d)(?::(\d\d))? '
+                      r'(?:(GMT|UTC|Z)|([+-])(\d\d)(\d\d))\Z')
+_RFC2822_MONTH_NUMBERS = {name: number
+                          for number, name in enumerate(_RFC2822_MONTHS)}
+
+
+def _aware(naive, zone, sign, hours, minutes):
+    '''Add the timezone to a parsed date the way `dateutil` does.'''
+    if sign is not None:
+        offset = int(hours) * 3600 + int(minutes) * 60
+        if offset:
+            return naive.replace(tzinfo=dateutil.tz.tzoffset(
+                None, -offset if sign == '-' else offset))
+    elif zone is None:
+        return naive
+    # dateutil names all zero offsets UTC except for GMT and uses the local
+    # timezone if it has the same name.
+    zone = 'GMT' if zone == 'GMT' else 'UTC'
+    if zone not in time.tzname:
+        return naive.replace(tzinfo=dateutil.tz.tzutc())
+    aware = naive.replace(tzinfo=dateutil.tz.tzlocal())
+    if aware.tzname() != zone:
+        folded = dateutil.tz.enfold(aware, fold=1)
+        if folded.tzname() == zone:
+            return folded
+        return aware.replace(tzinfo=dateutil.tz.tzutc())
+    return aware
+
+
+def _parse_date(value):
+    # dateutil interprets years below 100 as two-digit years
+    match = _RFC3339.match(value)
+    if match and match.group(1) >= '0100':
+        (year, month, day, hour, minute, second, fraction,
+         zone, sign, hours, minutes) = match.groups()
+        try:
+            naive = datetime(int(year), int(month), int(day), int(hour),
+                             int(minute), int(second),
+                             int(fraction.ljust(6, '0')) if fraction else 0)
+        except ValueError:
+            pass
+        else:
+            return _aware(naive, zone, sign, hours, minutes)
+    match = _RFC2822.match(value)
+    if match and match.group(3) >= '0100':
+        (day, month, year, hour, minute, second,
+         zone, sign, hours, minutes) = match.groups()
+        try:
+            naive = datetime(int(year), _RFC2822_MONTH_NUMBERS[month],
+                             int(day), int(hour), int(minute),
+                             int(second or 0))
+        except ValueError:
+            pass
+        else:
+            return _aware(naive, zone, sign, hours, minutes)
+    return dateutil.parser.parse(value)
+
+
+_cached_parse_date = None
+
+
+def parse_date(value):
+    '''Parse a date string. Strict RFC 3339 (e.g.
+    `2020-01-01T12:00:00+01:00`) and RFC 2822 (e.g.
+    `Wed, 01 Jan 2020 12:00:00 +0100`) dates are parsed directly. All other
+    formats are passed to `dateutil.parser.parse`. The result is the same as
+    if `dateutil` parsed the string.
+
+    :param value: The date string to parse.
+    :returns: The parsed datetime.datetime object.
+    '''
+    if _cached_parse_date is not None:
+        return _cached_parse_date(value)
+    return _parse_date(value)
+
+
+def date_cache(maxsize=None):
+    '''Get or set the size of the cache for parsed dates. If enabled, the
+    result of parsing a date string is reused if the same string is parsed
+    again. This speeds up parsing data with many identical timestamps. The
+    cache is disabled by default.
+
+    :param maxsize: Maximum number of cached dates, 0 disables the cache.
+    :returns: Maximum number of cached dates.
     '''
-    old = locale.setlocale(locale.LC_ALL)
-    locale.setlocale(locale.LC_ALL, 'C')
-    date = date.strftime('%a, %d %b %Y %H:%M:%S %z')
-    locale.setlocale(locale.LC_ALL, old)
-    return date
+    global _cached_parse_date
+    if maxsize is not None:
+        _cached_parse_date = functools.lru_cache(maxsize)(_parse_date) \
+            if maxsize > 0 else None
+    if _cached_parse_date is None:
+        return 0
+    return _cached_parse_date.cache_info().maxsize
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for rendering many feeds at once
+'''
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from feedgen import batch
+
+DEFINITION = {
+    'id': 'http://example.com/feed',
+    'title': 'Batch Feed',
+    'link': {'href': 'http://example.com', 'rel': 'alternate'},
+    'description': 'A feed rendered in a batch',
+    'updated': '2020-01-01T00:00:00Z',
+    'extensions': ['podcast'],
+    'podcast': {'itunes_author': 'John Doe'},
+    'entries': [
+        {'id': 'http://example.com/1', 'title': 'First',
+         'updated': '2020-01-01T00:00:00Z',
+         'description': 'First entry',
+         'podcast': {'itunes_duration': '12:34'}},
+        {'id': 'http://example.com/2', 'title': 'Second',
+         'updated': '2020-01-01T00:00:00Z',
+         'description': 'Second entry'}]}
+
+
+def create_feed():
+    return batch.build_feed(DEFINITION)
+
+
+def fail():
+    raise ValueError('No feed')
+
+
+def crash():
+    os._exit(1)
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_buildFeed(self):
+        fg = create_feed()
+        self.assertEqual(fg.title(), 'Batch Feed')
+        self.assertEqual(fg.podcast.itunes_author(), 'John Doe')
+        self.assertEqual([fe.title() for fe in fg.entry()],
+                         ['First', 'Second'])
+        self.assertEqual(fg.entry()[0].podcast.itunes_duration(), '12:34')
+        self.assertRaises(ValueError, batch.build_feed, {'rss_file': 'x'})
+        self.assertRaises(ValueError, batch.build_feed,
+                          {'extensions': ['dc'], 'dc': {'_x': 1}})
+
+    def test_pickle(self):
+        fg = create_feed()
+        fg.incremental(True)
+        rss = fg.rss_str()
+        copy = pickle.loads(pickle.dumps(fg))
+        self.assertEqual(copy.rss_str(), rss)
+        self.assertTrue(copy.incremental())
+        fe = copy.add_entry()
+        fe.title('Third')
+        fe.podcast.itunes_duration('1:00')
+        self.assertIn(b'<itunes:duration>1:00</itunes:duration>',
+                      copy.rss_str())
+
+    def test_renderMany(self):
+        fg = create_feed()
+        filename = os.path.join(self.directory, 'feed.atom')
+        jobs = [{'feed': fg, 'name': 'snapshot'},
+                {'feed': DEFINITION, 'format': 'atom', 'filename': filename,
+                 'options': {'pretty': True}},
+                {'feed': create_feed, 'format': 'atom'},
+                {'feed': fail},
+                {'feed': fg, 'format': 'json'},
+                'no job']
+        reported = []
+        with ThreadPoolExecutor(2) as executor:
+            results = batch.render_many(jobs, callback=reported.append,
+                                        max_pending=2, executor=executor)
+        self.assertEqual(len(results), len(jobs))
+        reported = {result.name: result for result in reported}
+        self.assertEqual(reported['snapshot'].data, fg.rss_str())
+        self.assertEqual(reported[2].data, fg.atom_str())
+        self.assertIsNone(reported[1].data)
+        with open(filename, 'rb') as f:
+            self.assertEqual(f.read(), fg.atom_str(pretty=True))
+        self.assertEqual(reported[1].size, os.path.getsize(filename))
+        self.assertEqual(reported[3].error, 'ValueError: No feed')
+        self.assertTrue(reported[4].error)
+        self.assertTrue(reported[5].error)
+        for result in results:
+            self.assertIsNone(result.data)
+            self.assertTrue(batch.format_result(result))
+            if not result.error:
+                self.assertGreater(result.seconds, 0)
+
+    def test_renderManyProcesses(self):
+        jobs = [{'feed': create_feed(), 'format': fmt}
+                for fmt in batch.FORMATS]
+        jobs.append({'feed': create_feed, 'name': 'function'})
+        jobs.append({'feed': lambda: None, 'name': 'lambda'})
+        results = {r.name: r for r in batch.render_many(jobs, workers=2)}
+        self.assertEqual(results[0].data, create_feed().atom_str())
+        self.assertEqual(results[1].data, create_feed().rss_str())
+        self.assertEqual(results['function'].data, create_feed().rss_str())
+        self.assertIsNone(results['function'].error)
+        self.assertTrue(results['lambda'].error)
+
+    def test_renderManyCrash(self):
+        jobs = [{'feed': crash, 'name': 'crash'},
+                {'feed': create_feed, 'name': 'after'}]
+        results = batch.render_many(jobs, workers=1, max_pending=1)
+        results = {result.name: result for result in results}
+        self.assertIn('BrokenProcessPool', results['crash'].error)
+        self.assertIsNone(results['after'].error)
+
+    def test_main(self):
+        filename = os.path.join(self.directory, 'jobs.jsonl')
+        feed = os.path.join(self.directory, 'feed.rss')
+        with open(filename, 'w') as f:
+            f.write('{"feed": {"title": "T", "link": {"href": "http://a"}, '
+                    '"description": "D"}, "filename": "%s"}\n\n' % feed)
+        with mock.patch('sys.stdout'):
+            self.assertEqual(batch.main([filename, '-w', '1']), 0)
+        self.assertTrue(os.path.getsize(feed))
+        with open(filename, 'a') as f:
+            f.write('{"feed": {"invalid": 1}}\n')
+        with mock.patch('sys.stdout'):
+            self.assertEqual(batch.main([filename, '-w', '1']), 1)
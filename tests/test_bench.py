@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests for feedgen benchmarks
+'''
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from feedgen import bench
+
+
+class TestSequenceFunctions(unittest.TestCase):
+
+    def test_entryMemory(self):
+        self.assertGreater(bench.entry_memory(100), 0)
+        self.assertGreater(bench.entry_memory(100, ('dc',)), 0)
+
+    def test_createFeed(self):
+        fg = bench.create_feed(2, bench.EXTENSIONS)
+        self.assertEqual(len(fg.entry()), 2)
+        self.assertIn(b'<dc:creator>John Doe</dc:creator>', fg.rss_str())
+        self.assertIn(b'<georss:point>42.36 -71.05</georss:point>',
+                      fg.atom_str())
+
+    def test_entryData(self):
+        # add_entries is compared to the entries of create_feed
+        fg = bench.create_feed(2)
+        entries = fg.add_entries([bench._entry_data(i) for i in range(2)])
+        self.assertEqual([fe._digest() for fe in entries],
+                         [fe._digest() for fe in fg.entry()[2:]])
+
+    def test_run(self):
+        reported = []
+        results = bench.run(sizes=(2,), repeat=2, report=reported.append)
+        self.assertEqual(results['results'], reported)
+        self.assertEqual([r['benchmark'] for r in reported],
+                         list(bench.BENCHMARKS))
+        for result in reported:
+            self.assertEqual(result['size'], 2)
+            self.assertTrue(bench.format_result(result))
+        extensions = reported[list(bench.BENCHMARKS).index('extensions')]
+        self.assertEqual(sorted(extensions['extensions']),
+                         sorted(bench.EXTENSIONS))
+
+    def test_main(self):
+        fh, filename = tempfile.mkstemp('.json')
+        try:
+            with mock.patch('sys.stdout'):
+                bench.main(['-s', '1,2', '-r', '1', '-b', 'build',
+                            '-b', 'rss_str', '-o', filename])
+            with open(filename) as f:
+                results = json.load(f)
+        finally:
+            os.close(fh)
+            os.remove(filename)
+        self.assertEqual([(r['benchmark'], r['size'])
+                          for r in results['results']],
+                         [('build', 1), ('build', 2),
+                          ('rss_str', 1), ('rss_str', 2)])
+        self.assertIn('python', results)
@@ -6,9 +6,20 @@ Tests for a basic entry
 These are test cases for a basic entry.
 """
 
+import copy
+import io
+import pickle
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from unittest import mock
 
+from lxml import etree
+
+from feedgen.entry import FeedEntry
+from feedgen.ext.base import BaseEntryExtension
 from feedgen.feed import FeedGenerator
+from feedgen.util import call_setter, xml_cache
 
 
 class TestSequenceFunctions(unittest.TestCase):
@@ -39,6 +50,11 @@ class TestSequenceFunctions(unittest.TestCase):
         fe.title('The Third Episode')
         fe.content(u'…')
 
+        # Fixed dates result in the same output for every generation
+        fg.updated('2020-01-01T00:00:00Z')
+        for fe in fg.entry():
+            fe.updated('2020-01-01T00:00:00Z')
+
         self.fg = fg
 
     def test_setEntries(self):
@@ -56,6 +72,125 @@ class TestSequenceFunctions(unittest.TestCase):
         self.assertTrue(fe.base)
         self.assertTrue(self.fg.atom_str())
 
+    def test_lazyExtension(self):
+        class CountingEntryExtension(BaseEntryExtension):
+            created = 0
+
+            def __init__(self):
+                CountingEntryExtension.created += 1
+                self.value = None
+
+            def extend_atom(self, entry):
+                if self.value:
+                    entry.set('value', self.value)
+                return entry
+
+            extend_rss = extend_atom
+
+        fg = self.fg
+        fg.register_extension('counting', BaseEntryExtension,
+                              CountingEntryExtension)
+        fe = fg.add_entry()
+        fe.id('http://example.com/lazy')
+        fe.title('Lazy')
+        fe.content('Lazy')
+        fe.updated('2020-01-01T00:00:00Z')
+        # One instance is created to check if the extension adds anything
+        self.assertEqual(CountingEntryExtension.created, 1)
+        atom = fg.atom_str()
+        self.assertEqual(CountingEntryExtension.created, 1)
+
+        # Reading a value creates the extension but adds nothing
+        with mock.patch.object(CountingEntryExtension,
+                               'extend_atom') as extend:
+            self.assertIsNone(fe.counting.value)
+            self.assertEqual(fg.atom_str(), atom)
+            extend.assert_not_called()
+        self.assertEqual(CountingEntryExtension.created, 2)
+        self.assertIs(fe.counting, fe.counting)
+
+        fe.counting.value = 'yes'
+        self.assertEqual(fg.atom_str().count(b'value="yes"'), 1)
+        self.assertEqual(fg.rss_str().count(b'value="yes"'), 1)
+        with self.assertRaises(AttributeError):
+            fe.nonexistent
+
+    def test_constantExtension(self):
+        class ConstantEntryExtension(BaseEntryExtension):
+            def extend_atom(self, entry):
+                entry.set('constant', 'yes')
+                return entry
+
+            extend_rss = extend_atom
+
+        fg = self.fg
+        fg.register_extension('constant', BaseEntryExtension,
+                              ConstantEntryExtension)
+        self.assertEqual(fg.atom_str().count(b'constant="yes"'), 3)
+        self.assertEqual(fg.rss_str().count(b'constant="yes"'), 3)
+
+    def test_sharedFields(self):
+        fe = FeedEntry()
+        self.assertEqual(fe.guid(), {})
+        fe.guid('http://example.com/guid', permalink=True)
+        self.assertEqual(fe.id(), 'http://example.com/guid')
+        self.assertEqual(fe.guid(), {'guid': 'http://example.com/guid',
+                                     'permalink': True})
+        fe.title('Title')
+        fe.link(href='http://example.com/alternate')
+        fe.enclosure('http://example.com/file.mp3', 42, 'audio/mpeg')
+        fe.author(name='John Doe', email='jdoe@example.com')
+        fe.category(term='term', scheme='http://example.com/scheme')
+        rss = fe.rss_entry()
+        self.assertEqual(rss.findtext('link'), 'http://example.com/alternate')
+        self.assertEqual(rss.find('enclosure').get('length'), '42')
+        self.assertEqual(rss.findtext('author'), 'jdoe@example.com (John Doe)')
+        self.assertEqual(rss.findtext('category'), 'term')
+        self.assertEqual(rss.find('category').get('domain'),
+                         'http://example.com/scheme')
+        self.assertEqual(rss.find('guid').get('isPermaLink'), 'true')
+
+        # RSS uses the current links only
+        fe.link(href='http://example.com/related', rel='related',
+                replace=True)
+        self.assertIsNone(fe.enclosure())
+        rss = fe.rss_entry()
+        self.assertIsNone(rss.find('link'))
+        self.assertIsNone(rss.find('enclosure'))
+
+    def test_formattedDates(self):
+        fe = self.fg.entry()[0]
+        fe.published('2020-01-01T12:00:00+01:00')
+        with mock.patch('feedgen.entry.formatRFC2822',
+                        return_value='formatted') as formatRFC2822:
+            self.fg.rss_str()
+            self.fg.rss_str()
+            self.assertEqual(formatRFC2822.call_count, 1)
+        self.assertIn(b'<pubDate>formatted</pubDate>', self.fg.rss_str())
+        self.assertIn(b'<published>2020-01-01T12:00:00+01:00</published>',
+                      self.fg.atom_str())
+
+        fe.published('2021-01-01T12:00:00+01:00')
+        fe.updated('2021-01-02T12:00:00+01:00')
+        self.assertIn(b'<pubDate>Fri, 01 Jan 2021 12:00:00 +0100</pubDate>',
+                      self.fg.rss_str())
+        atom = self.fg.atom_str()
+        self.assertIn(b'<published>2021-01-01T12:00:00+01:00</published>',
+                      atom)
+        self.assertIn(b'<updated>2021-01-02T12:00:00+01:00</updated>', atom)
+
+    def test_compactEntry(self):
+        fe = FeedEntry()
+        fe.load_extension('dc')
+        fe.dc.dc_creator('Creator')
+        # Fields are not stored in the instance dictionary. Extensions are
+        # bound to it on first access.
+        self.assertEqual(vars(fe), {'dc': fe.dc})
+        # Arbitrary attributes can still be set
+        fe.custom = 'value'
+        self.assertEqual(fe.custom, 'value')
+        self.assertIsNone(fe.ttl())
+
     def test_checkEntryNumbers(self):
         fg = self.fg
         self.assertEqual(len(fg.entry()), 3)
@@ -178,3 +313,377 @@ class TestSequenceFunctions(unittest.TestCase):
         result = fg.atom_str()
         expected = b'<summary type="html">&lt;p&gt;summary&lt;/p&gt;</summary>'
         self.assertIn(expected, result)
+
+    def test_fragmentCache(self):
+        fg = self.fg
+        fg.load_extension('dc')
+        fe = fg.entry()[0]
+        self.assertFalse(fe.fragment_cache())
+        for entry in fg.entry():
+            entry.fragment_cache(True)
+        self.assertTrue(fe.fragment_cache())
+        atom = fg.atom_str(pretty=True)
+        rss = fg.rss_str()
+
+        # Cached fragments are reused as long as nothing changes
+        with mock.patch.object(FeedEntry, 'atom_entry') as atom_entry, \
+                mock.patch.object(FeedEntry, 'rss_entry') as rss_entry:
+            self.assertEqual(fg.atom_str(pretty=True), atom)
+            self.assertEqual(fg.rss_str(), rss)
+        atom_entry.assert_not_called()
+        rss_entry.assert_not_called()
+
+        # Setters and extension setters invalidate the cache
+        fe.title('Changed title')
+        self.assertIn(b'Changed title', fg.atom_str(pretty=True))
+        self.assertIn(b'Changed title', fg.rss_str())
+        fe.dc.dc_creator('John Doe')
+        self.assertIn(b'<dc:creator>John Doe</dc:creator>', fg.atom_str())
+        self.assertIn(b'<dc:creator>John Doe</dc:creator>', fg.rss_str())
+
+        # The result is identical to the output without cache
+        atom = fg.atom_str(pretty=True)
+        rss = fg.rss_str(pretty=True)
+        fh = io.BytesIO()
+        fg.rss_file(fh, pretty=True)
+        for entry in fg.entry():
+            entry.fragment_cache(False)
+        self.assertEqual(fg.atom_str(pretty=True), atom)
+        self.assertEqual(fg.rss_str(pretty=True), rss)
+        self.assertEqual(fh.getvalue(), rss)
+
+    def test_fragmentCacheUnicode(self):
+        fg = self.fg
+        expected = fg.atom_str(encoding='unicode', xml_declaration=False)
+        fg.entry()[0].fragment_cache(True)
+        self.assertEqual(
+                fg.atom_str(encoding='unicode', xml_declaration=False),
+                expected)
+        with self.assertRaises(ValueError):
+            fg.atom_str(encoding='unicode')
+
+    def test_entryOrder(self):
+        fg = FeedGenerator()
+        first = fg.add_entry()
+        second = fg.add_entry()
+        third = fg.add_entry(order='append')
+        self.assertEqual(fg.entry(), [second, first, third])
+        fg.entry(second)
+        self.assertEqual(fg.entry(), [first, third, second])
+        fg.entry([third], replace=True)
+        self.assertEqual(fg.entry(), [third])
+
+    def test_removeEntryById(self):
+        fg = self.fg
+        first, second, third = fg.entry()
+        second.id('http://example.com/2')
+        fg.remove_entry('http://example.com/2')
+        self.assertEqual(fg.entry(), [first, third])
+        # Entries share the same id. The first one is removed.
+        fg.remove_item('http://lernfunk.de/media/654321/1')
+        self.assertEqual(fg.entry(), [third])
+        with self.assertRaises(ValueError):
+            fg.remove_entry('http://example.com/2')
+        with self.assertRaises(ValueError):
+            fg.remove_entry(second)
+        fg.remove_entry(-1)
+        self.assertEqual(fg.entry(), [])
+
+    def test_entryIndex(self):
+        fg = FeedGenerator()
+        other = FeedGenerator()
+        first = fg.add_entry()
+        first.id('http://example.com/1')
+        second = fg.add_entry()
+        second.guid('http://example.com/2')
+        other.add_entry(second)
+        fg.entry(first)
+        second.id('http://example.com/3')
+        # The index is kept up to date. Entries are not searched.
+        with mock.patch.object(FeedEntry, 'id', side_effect=AssertionError):
+            with self.assertRaises(ValueError):
+                fg.remove_entry('http://example.com/2')
+            fg.remove_entry('http://example.com/3')
+        self.assertEqual(fg.entry(), [first])
+        self.assertEqual(other.entry(), [second])
+        first.id('http://example.com/3')
+        fg.entry([second], replace=True)
+        fg.remove_entry('http://example.com/3')
+        self.assertEqual(fg.entry(), [])
+        other.remove_entry('http://example.com/3')
+        self.assertEqual(other.entry(), [])
+
+    def test_entryList(self):
+        fg = FeedGenerator()
+        entries = [fg.add_entry(order='append') for i in range(3)]
+        for i, fe in enumerate(entries):
+            fe.title('Entry %d' % i)
+        # The list is reused until entries are added, moved or removed
+        self.assertIs(fg.entry(), fg.entry())
+        self.assertEqual(fg.entry(), entries)
+        self.assertEqual([fg.entry()[i] for i in range(3)], entries)
+
+        # Modifying the list in place is deprecated but still applied
+        with self.assertWarns(DeprecationWarning):
+            fg.entry().sort(key=lambda fe: fe.title(), reverse=True)
+        self.assertEqual(fg.entry(), entries[::-1])
+        copy = pickle.loads(pickle.dumps(fg))
+        self.assertEqual([fe.title() for fe in copy.entry()],
+                         ['Entry 2', 'Entry 1', 'Entry 0'])
+        with self.assertWarns(DeprecationWarning):
+            del fg.entry()[0]
+        self.assertEqual(fg.entry(), [entries[1], entries[0]])
+        with self.assertWarns(DeprecationWarning):
+            fg.entry().append(entries[1])
+        self.assertEqual(fg.entry(), [entries[0], entries[1]])
+        fg.remove_entry(entries[1])
+        self.assertEqual(fg.entry(), [entries[0]])
+
+        # Lists returned before the feed was modified are detached
+        old = fg.entry()
+        fg.add_entry(entries[2])
+        with self.assertWarns(DeprecationWarning):
+            old.clear()
+        self.assertEqual(fg.entry(), [entries[2], entries[0]])
+
+    def test_addEntries(self):
+        fg = FeedGenerator()
+        fg.load_extension('podcast')
+        fg.id('http://example.com')
+        fg.title('Feed')
+        fg.link(href='http://example.com')
+        fg.description('Description')
+        first = fg.add_entry()
+        first.id('http://example.com/0')
+        first.title('Zero')
+        first.content('Text')
+        entries = fg.add_entries([
+            {'id': 'http://example.com/1', 'title': 'One',
+             'link': {'href': 'http://example.com/1'},
+             'enclosure': ('http://example.com/1.mp3', 0, 'audio/mpeg'),
+             'podcast': {'itunes_duration': '12:34'}},
+            {'id': 'http://example.com/2', 'title': 'Two',
+             'content': 'Text'}])
+        self.assertEqual(fg.entry(), entries + [first])
+        self.assertEqual(entries[0].title(), 'One')
+        self.assertEqual(entries[0].link()[0]['href'], 'http://example.com/1')
+        self.assertEqual(entries[0].enclosure()['type'], 'audio/mpeg')
+        self.assertEqual(entries[0].podcast.itunes_duration(), '12:34')
+        self.assertNotIn('podcast', vars(entries[1]))
+
+        # Output matches entries created one by one
+        fg2 = FeedGenerator()
+        fg2.load_extension('podcast')
+        fg2.id('http://example.com')
+        fg2.title('Feed')
+        fg2.link(href='http://example.com')
+        fg2.description('Description')
+        fe = fg2.add_entry(order='append')
+        fe.id('http://example.com/1')
+        fe.title('One')
+        fe.link(href='http://example.com/1')
+        fe.enclosure('http://example.com/1.mp3', 0, 'audio/mpeg')
+        fe.podcast.itunes_duration('12:34')
+        fe = fg2.add_entry(order='append')
+        fe.id('http://example.com/2')
+        fe.title('Two')
+        fe.content('Text')
+        fe = fg2.add_entry(order='append')
+        fe.id('http://example.com/0')
+        fe.title('Zero')
+        fe.content('Text')
+        for feed in (fg, fg2):
+            feed.updated('2020-01-01T00:00:00Z')
+            for fe in feed.entry():
+                fe.updated('2020-01-01T00:00:00Z')
+        self.assertEqual(fg.rss_str(), fg2.rss_str())
+        self.assertEqual(fg.atom_str(), fg2.atom_str())
+
+        appended = fg.add_entries([('http://example.com/3', 'Three'),
+                                   ('http://example.com/4', 'Four')],
+                                  fields=('id', 'title'), order='append')
+        self.assertEqual([fe.title() for fe in appended], ['Three', 'Four'])
+        self.assertEqual(fg.entry(), entries + [first] + appended)
+
+    def test_addEntriesFields(self):
+        # Fields stored directly have the same result as the setters
+        rows = [
+            {'id': 'http://example.com/1', 'title': 'One', 'rights': 'R',
+             'comments': 'http://example.com/c', 'content': 'Text',
+             'updated': '2020-01-01T00:00:00Z',
+             'published': datetime(2020, 1, 1, tzinfo=timezone.utc),
+             'link': {'href': 'http://example.com/1'},
+             'author': [{'name': 'A'}, {'name': 'B', 'email': 'b@x'}],
+             'category': {'term': 'a'}, 'contributor': {'name': 'C'}},
+            {'guid': ('http://example.com/2', True),
+             'content': {'content': '<p>x</p>', 'type': 'html'},
+             'pubDate': '2020-01-01T00:00:00Z',
+             'link': {'href': 'http://example.com/2', 'rel': 'enclosure',
+                      'type': 'audio/mpeg'},
+             'enclosure': ('http://example.com/2.mp3', 0, 'audio/mpeg'),
+             'author': {'author': {'name': 'A'}, 'replace': True},
+             'category': ({'term': 'b'},)},
+            {'guid': 'http://example.com/3', 'title': None,
+             'content': {'content': '<p>x</p>', 'type': None},
+             'summary': 'Summary', 'link': {'href': 'x'}},
+        ]
+        fg = FeedGenerator()
+        for row, entry in zip(rows, fg.add_entries(rows)):
+            fe = FeedEntry()
+            for name, value in row.items():
+                call_setter(getattr(fe, name), copy.deepcopy(value))
+            self.assertEqual(entry._digest(), fe._digest())
+
+        for data in ({'link': {'rel': 'self'}}, {'author': {'nick': 'A'}},
+                     {'updated': '2020-01-01T00:00:00'},
+                     {'published': 'invalid'}, {'category': ['a']}):
+            with self.assertRaises(ValueError):
+                fg.add_entries([data])
+
+    def test_addEntriesInvalid(self):
+        fg = FeedGenerator()
+        fg.load_extension('dc')
+        before = fg.entry()
+        for data in ({'nonexistent': 1}, {'_FeedEntry__atom_id': 1},
+                     {'dc': {'_ext': 1}}, {'dc': {'nonexistent': 1}},
+                     {'link': {'href': 'x', 'rel': 'invalid'}},
+                     {'title': ('a', 'b', 'c')}):
+            with self.assertRaises(ValueError):
+                fg.add_entries([{'title': 'Valid'}, data])
+            self.assertEqual(fg.entry(), before)
+
+    def test_xmlCache(self):
+        fg = FeedGenerator()
+        fg.id('http://example.com')
+        fg.title('Feed')
+        fg.updated('2020-01-01T00:00:00Z')
+
+        def add(i):
+            fe = fg.add_entry(order='append')
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.updated('2020-01-01T00:00:00Z')
+            fe.content('<p>Entry <b>%d</b></p>' % i, type='xhtml')
+            fe.summary('<summary>%d</summary>' % i, type='text/xml')
+            return fe
+
+        fe = add(0)
+        expected = fg.atom_str()
+        fe.content('<p>Invalid', type='xhtml')
+        self.assertEqual(xml_cache(), 0)
+        try:
+            self.assertEqual(xml_cache(8), 8)
+            fe = add(0)
+            fg.remove_entry(0)
+            # Cached content is inserted as text without parsing it again
+            with mock.patch('feedgen.entry.xml_fragment') as xml_fragment:
+                self.assertEqual(fg.atom_str(), expected)
+                self.assertEqual(fg.atom_str(encoding='unicode',
+                                             xml_declaration=False),
+                                 expected.decode('utf-8').split('\n', 1)[1])
+            xml_fragment.assert_not_called()
+            self.assertEqual(fg.atom_str(), expected)
+            for type_ in ('xhtml', 'application/xml'):
+                with self.assertRaises(etree.XMLSyntaxError):
+                    fe.content('<p>Invalid', type=type_)
+                with self.assertRaises(etree.XMLSyntaxError):
+                    fe.summary('<p>Invalid', type=type_)
+            self.assertEqual(fg.atom_str(), expected)
+        finally:
+            xml_cache(0)
+        self.assertEqual(xml_cache(), 0)
+        self.assertEqual(fg.atom_str(), expected)
+
+    def test_rawContent(self):
+        fg = FeedGenerator()
+        fg.id('http://example.com')
+        fg.title('Feed')
+        fg.updated('2020-01-01T00:00:00Z')
+        fe = fg.add_entry()
+        fe.id('http://example.com/1')
+        fe.title('Entry')
+        fe.updated('2020-01-01T00:00:00Z')
+        xhtml = '<p>Entry &amp; <b>Ä</b></p>'
+        fe.content(xhtml, type='xhtml')
+        fe.summary('<summary>Text</summary>', type='text/xml')
+        expected = [fg.atom_str(), fg.atom_str(encoding='ascii')]
+
+        fe.content(xhtml.encode('utf-8'), type='xhtml', raw=True)
+        fe.summary('<summary>Text</summary>', type='text/xml', raw=True)
+        self.assertEqual(fe.content(), {'content': xhtml, 'type': 'xhtml',
+                                        'raw': True})
+        self.assertEqual([fg.atom_str(), fg.atom_str(encoding='ascii')],
+                         expected)
+        # Pre-serialized content is not indented
+        self.assertIn(xhtml.encode('utf-8'), fg.atom_str(pretty=True))
+        self.assertEqual(fe.atom_entry().find('content/{%s}div/{%s}p' % (
+            'http://www.w3.org/1999/xhtml', 'http://www.w3.org/1999/xhtml'))
+            .text, 'Entry & ')
+
+        self.assertRaises(etree.XMLSyntaxError, fe.content, '<p>', raw=True,
+                          type='xhtml')
+        self.assertRaises(ValueError, fe.content, '<p/>', raw=True)
+        self.assertRaises(ValueError, fe.summary, '<p/>', raw=True,
+                          type='html')
+        self.assertEqual(fe.content()['content'], xhtml)
+        fe.content('<p>Trusted', type='xhtml', raw=True, validate=False)
+        self.assertIn(b'<p>Trusted</div>', fg.atom_str())
+
+        # Text looking like a placeholder is not replaced
+        for title in ('feedgen-raw-marker-content', 'feedgen-raw-content'):
+            fe.title(title)
+            fe.content('<p>raw</p>', type='xhtml', raw=True)
+            entry = etree.fromstring(fg.atom_str()).find(
+                '{http://www.w3.org/2005/Atom}entry')
+            self.assertEqual(entry.findtext(
+                '{http://www.w3.org/2005/Atom}title'), title)
+            self.assertEqual(entry.findtext(
+                '{http://www.w3.org/2005/Atom}content/{%s}div/{%s}p' % (
+                    'http://www.w3.org/1999/xhtml',
+                    'http://www.w3.org/1999/xhtml')), 'raw')
+
+    def test_rawEntry(self):
+        fg = FeedGenerator()
+        fg.id('http://example.com')
+        fg.title('Feed')
+        fg.link(href='http://example.com')
+        fg.description('Description')
+        fg.updated('2020-01-01T00:00:00Z')
+        for i in range(3):
+            fe = fg.add_entry(order='append')
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.updated('2020-01-01T00:00:00Z')
+            fe.content('Content %d' % i)
+        fe = fg.entry()[1]
+        entry = etree.tostring(fe.atom_entry()).decode('utf-8')
+        item = etree.tostring(fe.rss_entry()).decode('utf-8')
+        expected = fg.render()
+        pretty = fg.render(pretty=True)
+
+        self.assertEqual(fe.raw(), {})
+        fe.raw(atom=entry.encode('utf-8'), rss=item)
+        self.assertEqual(fe.raw(), {'atom': entry, 'rss': item})
+        fe.title('Ignored')
+        self.assertEqual(fg.render(), expected)
+        self.assertEqual(fe.atom_entry().findtext(
+            '{http://www.w3.org/2005/Atom}title'), 'Entry 1')
+        self.assertEqual(fe.rss_entry().find('title').text, 'Entry 1')
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(fg.rss_str(workers=executor), expected['rss'])
+        self.assertEqual(pickle.loads(pickle.dumps(fg)).atom_str(),
+                         expected['atom'])
+        # Pre-serialized entries are not indented
+        self.assertIn(('\n    ' + item + '\n').encode('utf-8'),
+                      fg.rss_str(pretty=True))
+        self.assertNotEqual(fg.rss_str(pretty=True), pretty['rss'])
+
+        for fragment in ('<entry>', '<item/>', '<entry/><entry/>',
+                         'text<entry/>', '<entry><dc:creator/></entry>'):
+            self.assertRaises((ValueError, etree.XMLSyntaxError), fe.raw,
+                              atom=fragment)
+        fe.raw(rss='<item><title>Trusted</title>', validate=False)
+        self.assertIn(b'<title>Trusted</title>', fg.rss_str())
+        fe.raw(atom='', rss='')
+        self.assertEqual(fe.raw(), {})
+        self.assertIn(b'<title>Ignored</title>', fg.rss_str())
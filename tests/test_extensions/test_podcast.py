@@ -1,7 +1,10 @@
+import pickle
 import unittest
 
 from lxml import etree
 
+from feedgen.ext.podcast import PodcastExtension
+from feedgen.ext.podcast_entry import PodcastEntryExtension
 from feedgen.feed import FeedGenerator
 
 
@@ -104,3 +107,25 @@ class TestExtensionPodcast(unittest.TestCase):
         author = root.xpath('/rss/channel/item/itunes:author/text()',
                             namespaces=ns)
         self.assertEqual(author, ['Lars Kiesow'])
+
+    def test_podcastEntryFalsyValues(self):
+        fe = self.fg.add_item()
+        fe.title('y')
+        fe.podcast.itunes_order(0)
+        fe.podcast.itunes_block(False)
+        ns = {'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd'}
+        root = etree.fromstring(self.fg.rss_str())
+        item = '/rss/channel/item[title="y"]/'
+        self.assertEqual(root.xpath(item + 'itunes:order/text()',
+                                    namespaces=ns), ['0'])
+        self.assertEqual(root.xpath(item + 'itunes:block/text()',
+                                    namespaces=ns), ['no'])
+
+    def test_podcastExtensionClass(self):
+        fe = self.fg.add_item()
+        fe.podcast.itunes_duration('1:00')
+        self.assertIs(type(fe.podcast), PodcastEntryExtension)
+        self.assertIs(type(self.fg.podcast), PodcastExtension)
+        copy = pickle.loads(pickle.dumps(fe.podcast))
+        self.assertIs(type(copy), PodcastEntryExtension)
+        self.assertEqual(copy.itunes_duration(), '1:00')
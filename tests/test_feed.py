@@ -7,14 +7,30 @@ These are test cases for a basic feed.
 A basic feed does not contain entries so far.
 """
 
+import gzip
+import io
+import lzma
 import os
+import pickle
+import subprocess
+import sys
 import tempfile
+import time
 import unittest
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
+import dateutil.parser
+import dateutil.tz
 from lxml import etree
 
+from feedgen.entry import FeedEntry
 from feedgen.ext.dc import DcEntryExtension, DcExtension
 from feedgen.feed import FeedGenerator
+from feedgen.util import date_cache, formatRFC2822, parse_date
 
 
 class TestSequenceFunctions(unittest.TestCase):
@@ -307,6 +323,782 @@ class TestSequenceFunctions(unittest.TestCase):
         rssString = fg.rss_str(pretty=True, xml_declaration=False)
         self.checkRssString(rssString)
 
+    def addEntries(self, count=3):
+        for i in range(count):
+            fe = self.fg.add_entry()
+            fe.id('%s/%d' % (self.feedId, i))
+            fe.title(u'Entry %d – ä' % i)
+            fe.content('<p>Content %d</p>' % i, type='xhtml')
+            fe.link(href='%s/%d' % (self.linkHref, i), rel='alternate')
+            fe.updated('2017-02-05 13:26:58+01:00')
+
+    def test_atomFeedStream(self):
+        fg = self.fg
+        self.addEntries()
+        fg.load_extension('dc')
+        fg.entry()[0].dc.dc_creator('John Doe')
+        for pretty in (True, False):
+            for encoding in ('UTF-8', 'ascii'):
+                out = io.BytesIO()
+                fg.atom_stream(out, pretty=pretty, encoding=encoding)
+                self.assertEqual(out.getvalue(),
+                                 fg.atom_str(pretty=pretty, encoding=encoding))
+        out = io.BytesIO()
+        fg.atom_stream(out, extensions=False, xml_declaration=False)
+        self.assertEqual(out.getvalue(),
+                         fg.atom_str(extensions=False, xml_declaration=False))
+
+    def test_rssFeedStream(self):
+        fg = self.fg
+        self.addEntries()
+        fg.load_extension('podcast')
+        fg.podcast.itunes_author('John Doe')
+        fg.entry()[0].podcast.itunes_author('John Doe')
+        for pretty in (True, False):
+            for encoding in ('UTF-8', 'ascii'):
+                out = io.BytesIO()
+                fg.rss_stream(out, pretty=pretty, encoding=encoding)
+                self.assertEqual(out.getvalue(),
+                                 fg.rss_str(pretty=pretty, encoding=encoding))
+        out = io.BytesIO()
+        fg.rss_stream(out, extensions=False, xml_declaration=False)
+        self.assertEqual(out.getvalue(),
+                         fg.rss_str(extensions=False, xml_declaration=False))
+
+    def test_iterAtom(self):
+        fg = self.fg
+        self.addEntries(20)
+        chunks = list(fg.iter_atom(chunk_size=1024))
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks[:-1]:
+            self.assertTrue(len(chunk) >= 1024)
+        self.assertEqual(b''.join(chunks), fg.atom_str())
+        chunks = list(fg.iter_atom(chunk_size=None, pretty=True))
+        self.assertEqual(len(chunks), 22)
+        self.assertEqual(b''.join(chunks), fg.atom_str(pretty=True))
+
+    def test_iterRss(self):
+        fg = self.fg
+        self.addEntries(20)
+        chunks = list(fg.iter_rss(chunk_size=1024))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(b''.join(chunks), fg.rss_str())
+        chunks = list(fg.iter_rss(chunk_size=0, pretty=True))
+        self.assertEqual(len(chunks), 22)
+        self.assertEqual(b''.join(chunks), fg.rss_str(pretty=True))
+
+    def test_iterUnicode(self):
+        fg = self.fg
+        self.addEntries(20)
+        options = {'encoding': 'unicode', 'xml_declaration': False}
+        for iterate, generate in ((fg.iter_atom, fg.atom_str),
+                                  (fg.iter_rss, fg.rss_str)):
+            chunks = list(iterate(chunk_size=1024, **options))
+            self.assertTrue(len(chunks) > 1)
+            self.assertEqual(''.join(chunks), generate(**options))
+            chunks = list(iterate(chunk_size=None, **options))
+            self.assertEqual(''.join(chunks), generate(**options))
+
+    def test_iterRequiredFields(self):
+        fg = FeedGenerator()
+        with self.assertRaises(ValueError):
+            fg.iter_atom()
+        with self.assertRaises(ValueError):
+            fg.iter_rss()
+
+    def test_incremental(self):
+        fg = self.fg
+        fg.load_extension('podcast')
+        self.addEntries()
+        self.assertFalse(fg.incremental())
+        fg.incremental(True)
+        self.assertTrue(fg.incremental())
+        self.assertTrue(fg.entry()[0].fragment_cache())
+        fe = FeedEntry()
+        fg.entry(fe)
+        self.assertTrue(fe.fragment_cache())
+        fg.remove_entry(fe)
+        rss = fg.rss_str(pretty=True)
+
+        # Nothing is rebuilt if nothing changed
+        with mock.patch.object(FeedGenerator, '_create_rss_head') as head, \
+                mock.patch.object(FeedEntry, 'rss_entry') as rss_entry:
+            self.assertEqual(fg.rss_str(pretty=True), rss)
+        head.assert_not_called()
+        rss_entry.assert_not_called()
+
+        # Only modified parts are rebuilt
+        fg.title('New title')
+        fg.podcast.itunes_author('John Doe')
+        fe = fg.add_entry()
+        self.assertTrue(fe.fragment_cache())
+        fe.id('http://example.com/new')
+        fe.title('New entry')
+        with mock.patch.object(FeedEntry, 'rss_entry',
+                               side_effect=FeedEntry.rss_entry,
+                               autospec=True) as rss_entry:
+            rss = fg.rss_str(pretty=True)
+        rss_entry.assert_called_once_with(fe)
+        self.assertIn(b'<title>New title</title>', rss)
+        self.assertIn(b'<itunes:author>John Doe</itunes:author>', rss)
+
+        fg.incremental(False)
+        self.assertFalse(fg.entry()[0].fragment_cache())
+        self.assertEqual(fg.rss_str(pretty=True), rss)
+
+    def test_defaultDates(self):
+        fg = FeedGenerator()
+        fg.id('http://example.com')
+        fg.title('Title')
+        fg.link(href='http://example.com')
+        fg.description('Description')
+        entries = fg.add_entries([{'id': 'http://example.com/%d' % i,
+                                   'title': 'Entry %d' % i,
+                                   'content': 'Content'} for i in range(3)])
+        self.assertFalse(any(fe._has_updated() for fe in entries))
+        fixed = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        entries[1].updated(fixed)
+
+        # The feed and all entries without a date get the same timestamp
+        root = etree.fromstring(fg.atom_str())
+        now = root.findtext('{http://www.w3.org/2005/Atom}updated')
+        self.assertEqual(sorted(entry.findtext(
+            '{http://www.w3.org/2005/Atom}updated') for entry in root.findall(
+                '{http://www.w3.org/2005/Atom}entry')),
+            sorted([now, now, fixed.isoformat()]))
+
+        # Default dates are not stored but determined for every generation
+        self.assertFalse(entries[0]._has_updated())
+        later = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        with mock.patch('feedgen.feed.datetime') as clock:
+            clock.now.return_value = later
+            atom = fg.atom_str()
+            rss = fg.rss_str()
+            self.assertEqual(fg.updated(), later)
+        self.assertEqual(atom.count(later.isoformat().encode()), 3)
+        self.assertIn(formatRFC2822(later).encode(), rss)
+        self.assertEqual(entries[1].updated(), fixed)
+
+        fe = FeedEntry()
+        self.assertIsNotNone(fe.updated())
+        self.assertFalse(fe._has_updated())
+
+    def test_formatRFC2822(self):
+        for date in (datetime(2020, 2, 29, 23, 5, 9, tzinfo=timezone.utc),
+                     datetime(999, 12, 31, 1, 2, 3),
+                     datetime(2021, 7, 4, 12, 0, 0, 123456, tzinfo=timezone(
+                         timedelta(hours=-5, minutes=-30))),
+                     datetime(2022, 10, 16, tzinfo=timezone(
+                         timedelta(hours=1, seconds=7, microseconds=8)))):
+            self.assertEqual(formatRFC2822(date),
+                             date.strftime('%a, %d %b %Y %H:%M:%S %z'))
+        self.assertEqual(formatRFC2822(datetime(2020, 1, 1, tzinfo=timezone(
+                             timedelta(hours=1)))),
+                         'Wed, 01 Jan 2020 00:00:00 +0100')
+
+    def test_parseDate(self):
+        dates = ['2020-01-01T12:00:00+01:00', '2020-01-01t12:00:00.5-02:30',
+                 '2020-01-01 12:00:00Z', '2020-01-01T12:00:00.123456+00:00',
+                 '2020-01-01T12:00:00', '2020-02-30T12:00:00Z',
+                 '0050-01-01T12:00:00Z', '1 Jan 2020 12:00 GMT',
+                 'Wed, 01 Jan 2020 12:00:00 +0100', 'Wed, 01 Jan 2020 12:00 Z',
+                 'Wed, 01 Jan 2020 12:00:00 UTC', 'Wed, 31 Feb 2020 12:00 Z',
+                 'Wed, 01 Jan 2020 12:00:00 -0000', '2020-01-01 noon CET',
+                 'January 1st, 2020']
+        tznames = [('CET', 'CEST'), ('UTC', 'UTC'), ('GMT', 'BST')]
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for tzname in tznames:
+                with mock.patch.object(time, 'tzname', tzname):
+                    for date in dates:
+                        try:
+                            expected = dateutil.parser.parse(date)
+                        except ValueError:
+                            with self.assertRaises(ValueError):
+                                parse_date(date)
+                            continue
+                        parsed = parse_date(date)
+                        self.assertEqual(parsed, expected)
+                        self.assertEqual(repr(parsed), repr(expected))
+        self.assertEqual(parse_date('2020-01-01T00:00:00+02:00').tzinfo,
+                         dateutil.tz.tzoffset(None, 7200))
+
+    def test_dateCache(self):
+        self.assertEqual(date_cache(), 0)
+        try:
+            self.assertEqual(date_cache(2), 2)
+            date = parse_date('2020-01-01T12:00:00Z')
+            self.assertIs(parse_date('2020-01-01T12:00:00Z'), date)
+            self.assertEqual(date_cache(), 2)
+        finally:
+            date_cache(0)
+        self.assertEqual(date_cache(), 0)
+        self.assertIsNot(parse_date('2020-01-01T12:00:00Z'), date)
+
+    def test_rssThreadPool(self):
+        fg = self.fg
+        fg.lastBuildDate(datetime(2020, 1, 1, tzinfo=timezone.utc))
+        with mock.patch('locale.setlocale') as setlocale:
+            expected = fg.rss_str(pretty=True)
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(
+                    lambda _: fg.rss_str(pretty=True), range(32)))
+            setlocale.assert_not_called()
+        self.assertEqual(results, [expected] * 32)
+
+    def test_concurrentRendering(self):
+        def create(i):
+            fg = FeedGenerator()
+            fg.load_extension('dc')
+            fg.id('http://example.com/%d' % i)
+            fg.title('Feed %d' % i)
+            fg.link(href='http://example.com/%d' % i)
+            fg.description('Description')
+            fg.updated('2020-01-01T00:00:00Z')
+            for j in range(20):
+                fe = fg.add_entry()
+                fe.id('http://example.com/%d/%d' % (i, j))
+                fe.title('Entry %d' % j)
+                fe.content('<p>Entry <b>%d</b></p>' % j,
+                           type=('xhtml', 'text/xml', 'CDATA')[j % 3])
+                fe.dc.dc_creator('Creator %d' % j)
+                fe.updated('2020-01-01T00:00:00Z')
+            return fg
+
+        feeds = [create(i) for i in range(16)]
+        shared = create(16)
+        shared.incremental(True)
+        feeds += [shared] * 16
+
+        def render(fg):
+            return (fg.atom_str(), fg.atom_str(pretty=True),
+                    fg.rss_str(), fg.rss_str(pretty=True),
+                    b''.join(fg.iter_atom()), b''.join(fg.iter_rss()))
+
+        expected = [render(fg) for fg in feeds]
+        for fg in feeds:
+            for fe in fg.entry():
+                fe.fragment_cache(fg is shared)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for _ in range(3):
+                self.assertEqual(list(executor.map(render, feeds)), expected)
+                # Force the content to be parsed again
+                for fg in feeds[:16]:
+                    for fe in fg.entry():
+                        fe.content(fe.content()['content'],
+                                   type=fe.content()['type'])
+
+        # A copy of the feed is rendered identically
+        copy = pickle.loads(pickle.dumps(shared))
+        self.assertEqual(render(copy), expected[-1])
+
+    @mock.patch('feedgen.feed._PARALLEL_CHUNK', 7)
+    def test_pickleEntry(self):
+        # Entries are pickled without the feed, e.g. to serialize them in
+        # other processes
+        fg = self.fg
+        fg.load_extension('dc')
+        fg.incremental(True)
+        fe = fg.add_entry()
+        fe.id('http://example.com/0')
+        fe.title('Entry')
+        fe.content('Content')
+        fe.dc.dc_creator('Creator')
+        fe.updated('2020-01-01T00:00:00Z')
+        fg.atom_str()
+        size = len(pickle.dumps(fe))
+        for i in range(1, 1000):
+            other = fg.add_entry()
+            other.id('http://example.com/%d' % i)
+        self.assertEqual(len(pickle.dumps(fe)), size)
+
+        copy = pickle.loads(pickle.dumps(fe))
+        self.assertEqual(etree.tostring(copy.atom_entry()),
+                         etree.tostring(fe.atom_entry()))
+        self.assertTrue(copy.fragment_cache())
+        self.assertEqual(copy.dc.dc_creator(), ['Creator'])
+        # Extensions of the copy are tracked
+        digest = copy._digest()
+        copy.dc.dc_creator('Other', replace=True)
+        self.assertNotEqual(copy._digest(), digest)
+        self.assertEqual(fe.dc.dc_creator(), ['Creator'])
+
+        # Feeds restore the references of their entries
+        copy = pickle.loads(pickle.dumps(fg))
+        etag = copy.etag()
+        copy.remove_entry('http://example.com/0')
+        self.assertNotEqual(copy.etag(), etag)
+        self.assertEqual(len(copy.entry()), 999)
+        copy.entry()[0].title('Changed')
+        self.assertNotEqual(copy.etag(), etag)
+        self.assertEqual(len(fg.entry()), 1000)
+
+    def test_parallelSerialization(self):
+        fg = self.fg
+        fg.load_extension('dc')
+        for i in range(50):
+            fe = fg.add_entry()
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry ä %d' % i)
+            fe.content('<p>Entry <b>%d</b></p>' % i, type='xhtml')
+            fe.dc.dc_creator('Creator %d' % i)
+            fe.updated('2020-01-01T00:00:00Z')
+        for fe in fg.entry()[::3]:
+            fe.fragment_cache(True)
+        expected = [fg.atom_str(), fg.rss_str(pretty=True),
+                    fg.rss_str(encoding='ascii')]
+        # Serialize some entries to fill their cache
+        fg.atom_str()
+
+        def render(workers):
+            stream = io.BytesIO()
+            fg.atom_stream(stream, workers=workers)
+            self.assertEqual(stream.getvalue(), expected[0])
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, 'feed.xml')
+                fg.rss_file(filename, pretty=True, workers=workers)
+                with open(filename, 'rb') as f:
+                    self.assertEqual(f.read(), expected[1])
+            return [fg.atom_str(workers=workers),
+                    fg.rss_str(pretty=True, workers=workers),
+                    fg.rss_str(encoding='ascii', workers=workers)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual(render(executor), expected)
+        self.assertEqual(render(2), expected)
+
+    def test_compression(self):
+        fg = self.fg
+        for i in range(3):
+            fe = fg.add_entry()
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.content('Content %d' % i)
+            fe.updated('2020-01-01T00:00:00Z')
+        atom = fg.atom_str(pretty=True)
+        rss = fg.rss_str()
+        decompress = {'gzip': gzip.decompress, 'deflate': zlib.decompress,
+                      'xz': lzma.decompress}
+        for compression, function in decompress.items():
+            self.assertEqual(function(fg.atom_str(
+                pretty=True, compression=compression)), atom)
+            self.assertEqual(function(b''.join(fg.iter_rss(
+                chunk_size=0, compression=compression))), rss)
+        # Gzip output does not depend on the time it was generated
+        self.assertEqual(fg.rss_str(compression='gzip'),
+                         fg.rss_str(compression='gzip'))
+        self.assertRaises(ValueError, fg.rss_str, compression='zip')
+        self.assertRaises(ValueError, fg.atom_str, encoding='unicode',
+                          compression='gzip')
+
+        with tempfile.TemporaryDirectory() as directory:
+            plain = os.path.join(directory, 'feed.xml')
+            stream = io.BytesIO()
+            for workers in (None, 1):
+                fg.rss_file({plain: None, plain + '.gz': 'gzip',
+                             stream: 'xz'}, workers=workers)
+                with open(plain, 'rb') as f:
+                    self.assertEqual(f.read(), rss)
+                with gzip.open(plain + '.gz') as f:
+                    self.assertEqual(f.read(), rss)
+                self.assertEqual(lzma.decompress(stream.getvalue()), rss)
+                stream.seek(0)
+                stream.truncate()
+            fg.atom_file(plain, pretty=True, compression='deflate')
+            with open(plain, 'rb') as f:
+                self.assertEqual(zlib.decompress(f.read()), atom)
+            # Invalid compression methods do not truncate existing files
+            self.assertRaises(ValueError, fg.atom_file, {plain: 'zip'})
+            self.assertTrue(os.path.getsize(plain))
+
+    def test_publish(self):
+        fg = self.fg
+        fe = fg.add_entry()
+        fe.id('http://example.com/1')
+        fe.title('Entry')
+        fe.content('Content')
+        fe.updated('2020-01-01T00:00:00Z')
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'feed.xml')
+            sinks = {filename: None, filename + '.gz': 'gzip'}
+            self.assertTrue(fg.rss_file(sinks, publish=True))
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), fg.rss_str())
+            os.chmod(filename, 0o640)
+            before = os.stat(filename)
+            self.assertFalse(fg.rss_file(sinks, publish=True))
+            self.assertFalse(fg.rss_file(filename, publish=True, workers=1))
+            self.assertEqual(os.stat(filename).st_ino, before.st_ino)
+            self.assertEqual(os.stat(filename).st_mtime_ns,
+                             before.st_mtime_ns)
+
+            fe.title('Changed')
+            replaced = []
+
+            def replace(src, dst):
+                # The temporary file is complete and closed when renamed
+                with open(src, 'rb') as f:
+                    replaced.append(f.read())
+                if os.path.isdir('/proc/self/fd'):
+                    for fd in os.listdir('/proc/self/fd'):
+                        try:
+                            target = os.readlink('/proc/self/fd/' + fd)
+                        except OSError:
+                            continue
+                        self.assertNotEqual(target, os.path.abspath(src))
+                return os_replace(src, dst)
+
+            os_replace = os.replace
+            with mock.patch('os.replace', replace):
+                self.assertTrue(fg.atom_file(filename, publish=True))
+            self.assertEqual(replaced, [fg.atom_str()])
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), fg.atom_str())
+            self.assertEqual(os.stat(filename).st_mode & 0o777, 0o640)
+
+            # Failing serialization leaves the published file untouched
+            fg.add_entry().id('http://example.com/2')
+            with ThreadPoolExecutor(1) as executor:
+                self.assertRaises(ValueError, fg.atom_file, filename,
+                                  publish=True, workers=executor)
+            with open(filename, 'rb') as f:
+                self.assertIn(b'Changed', f.read())
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['feed.xml', 'feed.xml.gz'])
+            self.assertRaises(ValueError, fg.rss_file, io.BytesIO(),
+                              publish=True)
+
+    def test_etag(self):
+        fg = FeedGenerator()
+        fg.load_extension('dc')
+        etags = [fg.etag()]
+        self.assertIsNone(fg.last_modified())
+
+        def changed():
+            self.assertNotIn(fg.etag(), etags)
+            etags.append(fg.etag())
+
+        fg.title('Feed')
+        changed()
+        fg.id('http://example.com')
+        fg.link(href='http://example.com')
+        fg.description('Description')
+        changed()
+        fg.dc.dc_creator('Creator')
+        changed()
+        first = fg.add_entry()
+        changed()
+        second = fg.add_entry()
+        second.updated('2020-01-02T00:00:00Z')
+        changed()
+        self.assertEqual(fg.last_modified(), parse_date('2020-01-02T00:00Z'))
+        first.title('Entry')
+        changed()
+        first.id('http://example.com/1')
+        first.content('Content')
+        changed()
+        first.dc.dc_subject('Subject')
+        changed()
+        first.updated('2020-01-03T00:00:00Z')
+        changed()
+        self.assertEqual(fg.last_modified(), parse_date('2020-01-03T00:00Z'))
+        first.updated('2020-01-01T00:00:00Z')
+        self.assertEqual(fg.last_modified(), parse_date('2020-01-02T00:00Z'))
+        fg.remove_entry(second)
+        changed()
+        self.assertEqual(fg.last_modified(), parse_date('2020-01-01T00:00Z'))
+        fg.updated('2020-01-04T00:00:00Z')
+        self.assertEqual(fg.last_modified(), parse_date('2020-01-04T00:00Z'))
+
+        # Generating a feed does not modify it once all dates are set
+        etag = fg.etag()
+        fg.atom_str()
+        fg.render()
+        self.assertEqual(fg.etag(), etag)
+        self.assertEqual(pickle.loads(pickle.dumps(fg)).etag(), etag)
+
+        # Removed entries no longer affect the feed
+        second.title('Removed')
+        self.assertEqual(fg.etag(), etag)
+        fg.entry([second], replace=True)
+        changed()
+        first.title('Replaced')
+        self.assertEqual(fg.etag(), etags[-1])
+        fg.add_entries([{'title': 'Added'}])
+        changed()
+        fg.entry(first)
+        changed()
+
+        # Setting the same data again keeps the tag
+        etag = fg.etag()
+        first.title('Replaced')
+        first.dc.dc_subject('Subject', replace=True)
+        fg.title('Feed')
+        self.assertEqual(fg.etag(), etag)
+        fg.incremental(True)
+        self.assertEqual(fg.etag(), etag)
+        first.title('Incremental')
+        changed()
+        first.dc.dc_subject('Incremental', replace=True)
+        changed()
+        fg.dc.dc_creator('Incremental')
+        changed()
+
+        # Extensions of copies are tracked as well
+        copy = pickle.loads(pickle.dumps(fg))
+        self.assertEqual(copy.etag(), fg.etag())
+        copy.entry()[0].dc.dc_subject('Copy', replace=True)
+        self.assertNotEqual(copy.etag(), fg.etag())
+        self.assertEqual(fg.etag(), etags[-1])
+
+    def test_etagContent(self):
+        # Equal feeds get equal tags, also in other processes
+        code = '''if True:
+            from feedgen.feed import FeedGenerator
+            fg = FeedGenerator()
+            fg.load_extension('dc')
+            fg.title('Feed')
+            fg.skipDays(['Monday', 'Tuesday', 'Friday', 'Sunday'])
+            fg.dc.dc_creator('Creator')
+            fe = fg.add_entry()
+            fe.id('http://example.com/1')
+            fe.category([{'term': 'a'}, {'term': 'b', 'scheme': 'x'}])
+            fe.dc.dc_subject('Subject')
+            fe.updated('2020-01-01T00:00:00Z')
+            '''
+        namespace = {}
+        exec(code, namespace)
+        fg = namespace['fg']
+        self.assertEqual(FeedGenerator().etag(), FeedGenerator().etag())
+        for seed in ('1', '2'):
+            output = subprocess.check_output(
+                [sys.executable, '-c', code + 'print(fg.etag())'],
+                env=dict(os.environ, PYTHONHASHSEED=seed),
+                cwd=os.path.dirname(os.path.dirname(__file__)))
+            self.assertEqual(output.decode().strip(), fg.etag())
+        self.assertEqual(pickle.loads(pickle.dumps(fg)).etag(), fg.etag())
+        self.assertNotEqual(FeedGenerator().etag(), fg.etag())
+
+    def test_etagCost(self):
+        # Entries are visited on every call unless the feed is incremental
+        fg = FeedGenerator()
+        fg.title('Feed')
+        for i in range(3):
+            fg.add_entry().id('http://example.com/%d' % i)
+        with mock.patch.object(FeedEntry, '_digest', autospec=True,
+                               return_value=b'') as digest:
+            fg.etag()
+            fg.etag()
+            self.assertEqual(digest.call_count, 6)
+            fg.incremental(True)
+            etag = fg.etag()
+            self.assertEqual(fg.etag(), etag)
+            self.assertEqual(digest.call_count, 9)
+
+    def test_deterministic(self):
+        def create(extensions):
+            fg = FeedGenerator()
+            fg.deterministic(True)
+            fg.id('http://example.com')
+            fg.title('Feed')
+            fg.link(href='http://example.com')
+            fg.description('Description')
+            fe = fg.add_entry()
+            for extension in extensions:
+                fg.load_extension(extension)
+            fe.id('http://example.com/1')
+            fe.title('Entry')
+            fe.content('Content')
+            fe.published('2020-01-02T00:00:00Z')
+            fe.dc.dc_creator('Creator')
+            fe.geo.point('42.36 -71.05')
+            return fg
+
+        fg = create(['geo', 'dc'])
+        feeds = fg.render()
+        other = create(['dc', 'geo'])
+        self.assertEqual(other.render(), feeds)
+        self.assertEqual(other.atom_str(pretty=True), fg.atom_str(pretty=True))
+        self.assertEqual(other.rss_str(), feeds['rss'])
+        self.assertEqual(feeds['atom'].count(
+            b'<updated>2020-01-02T00:00:00+00:00</updated>'), 2)
+        self.assertFalse(fg.entry()[0]._has_updated())
+        self.assertEqual(fg.updated(), parse_date('2020-01-02T00:00:00Z'))
+        self.assertIn(b'<lastBuildDate>Thu, 02 Jan 2020 00:00:00 +0000'
+                      b'</lastBuildDate>', feeds['rss'])
+        self.assertLess(feeds['atom'].index(b'xmlns:dc'),
+                        feeds['atom'].index(b'xmlns:geo'))
+
+        # The date of the feed follows its entries until it is set
+        fe = fg.add_entry()
+        fe.id('http://example.com/2')
+        fe.title('Newer')
+        fe.content('Content')
+        fe.updated('2020-01-03T00:00:00Z')
+        self.assertIn(b'<updated>2020-01-03T00:00:00+00:00</updated>',
+                      fg.atom_str())
+        fg.remove_entry(fe)
+        self.assertEqual(fg.render(), feeds)
+
+        # Derived dates follow the data they are derived from
+        fg.entry()[0].published('2020-01-04T00:00:00Z')
+        self.assertEqual(fg.atom_str().count(
+            b'<updated>2020-01-04T00:00:00+00:00</updated>'), 2)
+        fg.entry()[0].published('2020-01-02T00:00:00Z')
+        self.assertEqual(fg.render(), feeds)
+
+        fg.updated('2020-01-05T00:00:00Z')
+        self.assertEqual(fg.updated(), parse_date('2020-01-05T00:00:00Z'))
+        fe = fg.add_entry()
+        fe.id('http://example.com/3')
+        fe.title('Undated')
+        fe.content('Content')
+        self.assertEqual(fg.atom_str().count(
+            b'<updated>2020-01-05T00:00:00+00:00</updated>'), 2)
+
+        empty = FeedGenerator()
+        empty.deterministic(True)
+        self.assertFalse(fg.deterministic(False))
+        self.assertEqual(empty.updated().year, 1970)
+
+    def test_pagedFiles(self):
+        fg = FeedGenerator()
+        fg.id('http://example.com')
+        fg.title('Feed')
+        fg.link(href='http://example.com')
+        fg.link(href='http://example.com/feed.xml', rel='self')
+        fg.description('Description')
+        for i in range(5):
+            fe = fg.add_entry()
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.content('Content')
+        atom = '{http://www.w3.org/2005/Atom}'
+        archive = '{http://purl.org/syndication/history/1.0}archive'
+
+        def parse(filename, prefix=atom):
+            root = etree.parse(filename).getroot()
+            if prefix != atom:
+                root = root.find('channel')
+            links = {link.get('rel'): link.get('href')
+                     for link in root.findall(atom + 'link')
+                     if link.get('rel')}
+            ids = [e.findtext(prefix + 'id') or e.findtext('guid')
+                   for e in root.findall(prefix + 'entry') +
+                   root.findall('item')]
+            return links, ids, root.find(archive) is not None
+
+        with tempfile.TemporaryDirectory() as directory:
+            page = os.path.join(directory, 'page{page}.xml')
+            url = 'http://example.com/page{page}.xml'
+            written = fg.paged_files(page, url, page_size=2, fmt='rss')
+            self.assertEqual(written, [page.format(page=i) for i in (1, 2, 3)])
+            links, ids, archived = parse(written[1], '')
+            self.assertEqual(links, {'self': url.format(page=2),
+                                     'first': url.format(page=1),
+                                     'last': url.format(page=3),
+                                     'previous': url.format(page=1),
+                                     'next': url.format(page=3)})
+            self.assertEqual(ids, ['http://example.com/2',
+                                   'http://example.com/1'])
+            self.assertFalse(archived)
+            self.assertEqual(fg.paged_files(page, url, page_size=2,
+                                            fmt='rss', publish=True), [])
+
+            page = os.path.join(directory, 'archive{page}.xml')
+            url = 'http://example.com/archive{page}.xml'
+            current = os.path.join(directory, 'feed.xml')
+            options = {'archive': True, 'current_filename': current,
+                       'current_url': 'http://example.com/feed.xml',
+                       'page_size': 2, 'pretty': True}
+            archives = [page.format(page=i) for i in (1, 2)]
+            self.assertEqual(fg.paged_files(page, url, **options),
+                             archives + [current])
+            links, ids, archived = parse(archives[0])
+            self.assertEqual(links, {'self': url.format(page=1),
+                                     'current': options['current_url']})
+            self.assertEqual(ids, ['http://example.com/1',
+                                   'http://example.com/0'])
+            self.assertTrue(archived)
+            links, ids, archived = parse(archives[1])
+            self.assertEqual(links['prev-archive'], url.format(page=1))
+            links, ids, archived = parse(current)
+            self.assertEqual(links, {'self': options['current_url'],
+                                     'prev-archive': url.format(page=2)})
+            self.assertEqual(ids, ['http://example.com/4'])
+            self.assertFalse(archived)
+
+            # Existing archives do not change and are skipped
+            fe = fg.add_entry()
+            fe.id('http://example.com/5')
+            fe.title('Entry 5')
+            fe.content('Content')
+            self.assertEqual(fg.paged_files(page, url, **options), [current])
+            fg.add_entries([{'id': 'http://example.com/%d' % i,
+                             'title': 'Entry', 'content': 'Content'}
+                            for i in (6, 7)])
+            self.assertEqual(fg.paged_files(page, url, **options),
+                             [page.format(page=3), current])
+            self.assertEqual(parse(current)[1], ['http://example.com/6',
+                                                 'http://example.com/7'])
+            self.assertEqual(len(fg.paged_files(page, url, compression='xz',
+                                                skip_archived=False,
+                                                **options)), 4)
+
+            self.assertRaises(ValueError, fg.paged_files, page, url,
+                              fmt='json')
+            self.assertRaises(ValueError, fg.paged_files, page, url,
+                              page_size=0)
+            self.assertRaises(ValueError, fg.paged_files, page, url,
+                              archive=True)
+
+    def test_render(self):
+        fg = self.fg
+        fg.load_extension('dc')
+        fg.load_extension('media', atom=False)
+        fg.load_extension('geo')
+        fg.dc.dc_creator('Feed Creator')
+        for i in range(5):
+            fe = fg.add_entry()
+            fe.id('http://example.com/%d' % i)
+            fe.title('Entry %d' % i)
+            fe.content('<p>Entry <b>%d</b></p>' % i, type='xhtml')
+            fe.published('2020-01-01T00:00:00Z')
+            fe.updated('2020-01-01T00:00:00Z')
+            fe.dc.dc_creator('Creator %d' % i)
+            fe.media.content(url='http://example.com/%d.mp4' % i)
+            if i % 2:
+                fe.geo.point('42.36 -71.05')
+
+        def render(**kwargs):
+            return {'atom': fg.atom_str(**kwargs), 'rss': fg.rss_str(**kwargs)}
+
+        self.assertEqual(dict(fg.render()), render())
+        self.assertEqual(dict(fg.render(pretty=True, extensions=False)),
+                         render(pretty=True, extensions=False))
+        self.assertEqual(list(fg.render(('rss',)).items()),
+                         [('rss', fg.rss_str())])
+        self.assertIn(b'<media:content', fg.render()['rss'])
+        self.assertNotIn(b'<media:content', fg.render()['atom'])
+
+        atom = io.BytesIO()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'feed.rss')
+            self.assertIsNone(fg.render({'atom': atom, 'rss': filename}))
+            with open(filename, 'rb') as f:
+                self.assertEqual(f.read(), fg.rss_str())
+        self.assertEqual(atom.getvalue(), fg.atom_str())
+
+        fg.incremental(True)
+        self.assertEqual(dict(fg.render(pretty=True)), render(pretty=True))
+        atom = io.BytesIO()
+        rss = io.BytesIO()
+        fg.render({'atom': atom, 'rss': rss})
+        self.assertEqual({'atom': atom.getvalue(), 'rss': rss.getvalue()},
+                         render())
+
+        self.assertRaises(ValueError, fg.render, ('atom', 'json'))
+
     def test_loadPodcastExtension(self):
         fg = self.fg
         fg.add_entry()